@@ -0,0 +1,278 @@
+import json
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from scipy.sparse import coo_array, csc_array, csr_array
+
+from stats.simple import first_component
+
+# Name of the community algorithm of files that only have a `component` field.
+DEFAULT_ALGORITHM = "component"
+
+
+def _load(path: Path) -> Tuple[str, List[str], Dict[str, List[Any]]]:
+    """
+    Loads an annotated project and returns its name, the label of each file and the component of each file for each
+    community algorithm. The components are read from the component index of the project if it was exported with one
+    (the first component of files in several), otherwise from its JSON file, whose files either have a single
+    `component` or a `components` mapping algorithm -> component.
+    """
+    index_path = path.with_name(f"{path.stem}.index.npz")
+    if index_path.exists():
+        with np.load(index_path) as arrays:
+            names = np.array(arrays["labels"].tolist() + ["None"], dtype=object)
+            labels = names[arrays["file_label"]].tolist()
+            components = {}
+            for key in arrays.files:
+                prefix, _, rest = key.partition(":")
+                if prefix == "components" and rest.endswith(":labels"):
+                    algorithm = rest.rpartition(":")[0]
+                    first = first_component(arrays[key], arrays.get(f"components:{algorithm}:offsets"), len(labels))
+                    components[algorithm] = [None if c < 0 else c for c in first.tolist()]
+        return path.stem, labels, components
+
+    with open(path, "rb") as f:
+        project = json.load(f)
+
+    labels = [str(file["label"]) for file in project.values()]
+    components: Dict[str, List[Any]] = {}
+    for i, file in enumerate(project.values()):
+        per_algorithm = file.get("components") or {DEFAULT_ALGORITHM: file.get("component")}
+        for algorithm, component in per_algorithm.items():
+            components.setdefault(algorithm, [None] * len(labels))[i] = component
+    return path.stem, labels, components
+
+
+class CorpusIndex:
+    """
+    Columnar index of the annotated files of a corpus of projects, built once so that corpus-level aggregations do not
+    re-scan the annotated JSON files.
+    Each file is a row with the index of its project and the code of its label. For each community algorithm, the
+    component of each file is mapped to a corpus-wide component id, with the project of each component kept in a table.
+    From these arrays the index precomputes the components x labels count matrix of each algorithm, from which the
+    label -> components and project -> components lookups, component sizes and purities are derived.
+    The index has no graph edges, so it does not compute the modularity of the components: it needs the dependency
+    graph of each project (e.g. `cdlib.evaluation.newman_girvan_modularity` on the exported graph).
+    """
+
+    def __init__(self, projects: List[str], labels: List[str], file_project: np.ndarray, file_label: np.ndarray,
+                 file_component: Dict[str, np.ndarray], component_project: Dict[str, np.ndarray]):
+        """
+        Args:
+            projects: The name of each project.
+            labels: The name of each label.
+            file_project: The project index of each file.
+            file_label: The label code of each file.
+            file_component: For each algorithm, the corpus-wide component id of each file (-1 if in no component).
+            component_project: For each algorithm, the project index of each component.
+        """
+        self.projects = projects
+        self.labels = labels
+        self.file_project = file_project
+        self.file_label = file_label
+        self.file_component = file_component
+        self.component_project = component_project
+        self._project_index = {name: i for i, name in enumerate(projects)}
+        self._label_index = {name: i for i, name in enumerate(labels)}
+        self._counts: Dict[str, csr_array] = {}
+        self._by_label: Dict[str, csc_array] = {}
+
+    @property
+    def algorithms(self) -> List[str]:
+        return list(self.file_component)
+
+    @classmethod
+    def build(cls, projects_dir, workers: Optional[int] = None, chunksize: int = 16) -> 'CorpusIndex':
+        """
+        Builds the index from a directory of annotated projects, loading them in a process pool.
+        """
+        paths = sorted(p for p in Path(projects_dir).iterdir() if p.is_file() and p.suffix == ".json")
+        if workers == 1 or len(paths) < 2:
+            loaded = [_load(path) for path in paths]
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                loaded = list(pool.map(_load, paths, chunksize=chunksize))
+        return cls.from_projects(loaded)
+
+    @classmethod
+    def from_projects(cls, loaded: List[Tuple[str, List[str], Dict[str, List[Any]]]]) -> 'CorpusIndex':
+        """
+        Builds the index from (name, file labels, file components by algorithm) tuples.
+        """
+        projects = [name for name, _, _ in loaded]
+        sizes = np.array([len(labels) for _, labels, _ in loaded], dtype=np.int64)
+        file_project = np.repeat(np.arange(len(projects), dtype=np.int32), sizes)
+        file_labels = pd.Series([label for _, labels, _ in loaded for label in labels], dtype=object)
+        label_codes, labels = pd.factorize(file_labels, sort=True)
+        algorithms = sorted({a for _, _, components in loaded for a in components})
+
+        file_component, component_project = {}, {}
+        for algorithm in algorithms:
+            # Components are local to their project, they are renumbered corpus-wide by (project, component).
+            local = pd.Series([c for (_, ls, components) in loaded
+                               for c in components.get(algorithm, [None] * len(ls))], dtype=object)
+            present = local.notna().to_numpy()
+            codes = np.full(len(local), -1, dtype=np.int64)
+            codes[present], uniques = pd.factorize(pd.MultiIndex.from_arrays([file_project[present],
+                                                                             local[present]]))
+            file_component[algorithm] = codes
+            owner = np.empty(len(uniques), dtype=np.int32)
+            owner[codes[present]] = file_project[present]
+            component_project[algorithm] = owner
+
+        return cls(projects, list(labels), file_project, label_codes.astype(np.int32), file_component,
+                   component_project)
+
+    def save(self, path):
+        arrays = {"projects": np.array(self.projects, dtype=str), "labels": np.array(self.labels, dtype=str),
+                  "file_project": self.file_project, "file_label": self.file_label}
+        for algorithm in self.algorithms:
+            arrays[f"file_component:{algorithm}"] = self.file_component[algorithm]
+            arrays[f"component_project:{algorithm}"] = self.component_project[algorithm]
+        np.savez_compressed(path, **arrays)
+
+    @classmethod
+    def load(cls, path) -> 'CorpusIndex':
+        with np.load(path) as arrays:
+            algorithms = [key.partition(":")[2] for key in arrays.files if key.startswith("file_component:")]
+            return cls(arrays["projects"].tolist(), arrays["labels"].tolist(), arrays["file_project"],
+                       arrays["file_label"], {a: arrays[f"file_component:{a}"] for a in algorithms},
+                       {a: arrays[f"component_project:{a}"] for a in algorithms})
+
+    def label_counts(self, algorithm: str = DEFAULT_ALGORITHM) -> csr_array:
+        """
+        Returns the sparse components x labels matrix of the number of files of each label in each component.
+        """
+        if algorithm not in self._counts:
+            components = self.file_component[algorithm]
+            keep = components >= 0
+            self._counts[algorithm] = coo_array(
+                (np.ones(int(keep.sum()), dtype=np.int64), (components[keep], self.file_label[keep])),
+                shape=(len(self.component_project[algorithm]), len(self.labels))).tocsr()
+        return self._counts[algorithm]
+
+    def component_sizes(self, algorithm: str = DEFAULT_ALGORITHM) -> np.ndarray:
+        return np.asarray(self.label_counts(algorithm).sum(axis=1)).ravel()
+
+    def size_histogram(self, algorithm: str = DEFAULT_ALGORITHM, bins=None) -> pd.Series:
+        """
+        Returns the number of components of each size (or of each size bin if `bins` is given).
+        """
+        sizes = pd.Series(self.component_sizes(algorithm))
+        if bins is None:
+            return sizes.value_counts().sort_index()
+        return pd.cut(sizes, bins).value_counts().sort_index()
+
+    def label_distribution(self, algorithm: str = DEFAULT_ALGORITHM, normalize: bool = True) -> pd.DataFrame:
+        """
+        Returns the label distribution of each component, with its project and component id as index.
+        """
+        counts = self.label_counts(algorithm).toarray().astype(np.float64)
+        if normalize:
+            totals = counts.sum(axis=1, keepdims=True)
+            counts = np.divide(counts, totals, out=np.zeros_like(counts), where=totals > 0)
+        index = pd.MultiIndex.from_arrays([np.array(self.projects, dtype=object)[self.component_project[algorithm]],
+                                           np.arange(counts.shape[0])], names=["project", "component"])
+        return pd.DataFrame(counts, index=index, columns=self.labels)
+
+    def purity(self, algorithm: str = DEFAULT_ALGORITHM) -> np.ndarray:
+        """
+        Returns the purity of each component: the share of its files that have its most frequent label.
+        """
+        counts = self.label_counts(algorithm)
+        sizes = self.component_sizes(algorithm)
+        top = counts.max(axis=1).toarray().ravel() if counts.nnz else np.zeros(counts.shape[0])
+        return np.divide(top, sizes, out=np.zeros(len(sizes)), where=sizes > 0)
+
+    def corpus_purity(self, algorithm: str = DEFAULT_ALGORITHM) -> float:
+        """
+        Returns the purity of all the components of the algorithm, weighted by their size.
+        """
+        sizes = self.component_sizes(algorithm)
+        return float((self.purity(algorithm) * sizes).sum() / max(sizes.sum(), 1))
+
+    def components_with_label(self, label: str, algorithm: str = DEFAULT_ALGORITHM,
+                              min_share: float = 0.0) -> pd.DataFrame:
+        """
+        Returns the components containing files of the label, with the number and share of those files.
+        """
+        if algorithm not in self._by_label:
+            self._by_label[algorithm] = self.label_counts(algorithm).tocsc()
+        by_label = self._by_label[algorithm]
+        code = self._label_index[label]
+        rows = slice(by_label.indptr[code], by_label.indptr[code + 1])
+        components, files = by_label.indices[rows], by_label.data[rows]
+
+        share = files / self.component_sizes(algorithm)[components]
+        keep = share >= min_share
+        components = components[keep]
+        projects = np.array(self.projects, dtype=object)[self.component_project[algorithm][components]]
+        return pd.DataFrame({"project": projects, "component": components, "files": files[keep],
+                             "share": share[keep]})
+
+    def project_components(self, project: str, algorithm: str = DEFAULT_ALGORITHM) -> np.ndarray:
+        """
+        Returns the corpus-wide ids of the components of a project.
+        """
+        # Components are numbered in file order, and files are grouped by project, so the components of a project
+        # are contiguous.
+        owners = self.component_project[algorithm]
+        p = self._project_index[project]
+        return np.arange(np.searchsorted(owners, p, "left"), np.searchsorted(owners, p, "right"))
+
+    def compare(self, algorithm_a: str, algorithm_b: str) -> pd.DataFrame:
+        """
+        Compares the components found by two algorithms in each project with the adjusted Rand index and the
+        normalized mutual information, together with their number of components (`components_a` and `components_b`).
+        Only the files in a component of both algorithms are compared.
+        """
+        a, b = self.file_component[algorithm_a], self.file_component[algorithm_b]
+        keep = (a >= 0) & (b >= 0)
+        projects, a, b = self.file_project[keep], a[keep], b[keep]
+
+        rows = []
+        order = np.argsort(projects, kind="stable")
+        bounds = np.searchsorted(projects[order], np.arange(len(self.projects) + 1))
+        for p in range(len(self.projects)):
+            members = order[bounds[p]:bounds[p + 1]]
+            if len(members) == 0:
+                continue
+            _, ca = np.unique(a[members], return_inverse=True)
+            _, cb = np.unique(b[members], return_inverse=True)
+            contingency = coo_array((np.ones(len(members)), (ca, cb))).tocsr()
+            rows.append({"project": self.projects[p], "files": len(members),
+                         "components_a": contingency.shape[0], "components_b": contingency.shape[1],
+                         "ari": _adjusted_rand(contingency), "nmi": _nmi(contingency)})
+        return pd.DataFrame(rows)
+
+
+def _comb2(x: np.ndarray) -> float:
+    return float((x * (x - 1) / 2).sum())
+
+
+def _adjusted_rand(contingency: csr_array) -> float:
+    n = contingency.sum()
+    index = _comb2(contingency.data)
+    rows = _comb2(np.asarray(contingency.sum(axis=1)).ravel())
+    cols = _comb2(np.asarray(contingency.sum(axis=0)).ravel())
+    expected = rows * cols / (n * (n - 1) / 2) if n > 1 else 0.0
+    maximum = (rows + cols) / 2
+    return 1.0 if maximum == expected else (index - expected) / (maximum - expected)
+
+
+def _nmi(contingency: csr_array) -> float:
+    n = contingency.sum()
+    pa = np.asarray(contingency.sum(axis=1)).ravel() / n
+    pb = np.asarray(contingency.sum(axis=0)).ravel() / n
+    coo = contingency.tocoo()
+    pab = coo.data / n
+    mi = float((pab * np.log(pab / (pa[coo.row] * pb[coo.col]))).sum())
+    ha, hb = float(-(pa * np.log(pa)).sum()), float(-(pb * np.log(pb)).sum())
+    if ha == 0 and hb == 0:
+        return 1.0
+    if ha == 0 or hb == 0:
+        return 0.0
+    return mi / np.sqrt(ha * hb)
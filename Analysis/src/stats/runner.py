@@ -0,0 +1,114 @@
+import json
+import os
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from stats.simple import SimpleStats
+
+# Columns identifying the version of the project file and of its component index (-1 without index) the statistics
+# were computed on.
+STAMP = ["mtime_ns", "size", "index_mtime_ns", "index_size"]
+
+
+def index_path(path: Path) -> Path:
+    return path.with_name(f"{path.stem}.index.npz")
+
+
+def stamp(path: Path) -> Dict[str, int]:
+    """
+    Returns the modification time and size of the project file and of its component index.
+    """
+    stat = path.stat()
+    index = index_path(path)
+    index_stat = index.stat() if index.exists() else None
+    return {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size,
+            "index_mtime_ns": index_stat.st_mtime_ns if index_stat else -1,
+            "index_size": index_stat.st_size if index_stat else -1}
+
+
+def project_stats(path: Path, algorithm: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Computes the statistics of an annotated project, from its component index if it was exported with one, otherwise
+    from its JSON file.
+    """
+    stamped = stamp(path)
+    if stamped["index_size"] >= 0:
+        with np.load(index_path(path)) as arrays:
+            stats = SimpleStats.index_stats(arrays, algorithm)
+    else:
+        with open(path, "rb") as f:
+            stats = SimpleStats.stats(json.load(f))
+    return {**stats, "project": path.stem, **stamped}
+
+
+class StatsRunner:
+    """
+    Computes the SimpleStats of all the annotated projects of a directory in a process pool and writes them to a CSV
+    file. The CSV keeps the modification time and size of each project file and of its component index, so that a later
+    run only processes the new or changed projects (including the ones whose index was added or rewritten), reuses the
+    statistics of the others and drops the projects that were removed.
+    """
+
+    def __init__(self, projects_dir, out_path="simple_stats.csv", workers: Optional[int] = None,
+                 chunksize: int = 16, algorithm: Optional[str] = None):
+        """
+        Args:
+            projects_dir: The directory containing the annotated projects, one JSON file per project.
+            out_path: The CSV file of the statistics.
+            workers: The number of processes, the number of CPUs if None.
+            chunksize: The number of projects sent to a process at once.
+            algorithm: The community algorithm of the components of the projects exported with a component index, the
+                first one of each index if None.
+        """
+        self.projects_dir = Path(projects_dir)
+        self.out_path = Path(out_path)
+        self.workers = workers
+        self.chunksize = chunksize
+        self.algorithm = algorithm
+
+    def run(self) -> pd.DataFrame:
+        paths = sorted(p for p in self.projects_dir.iterdir() if p.is_file() and p.suffix == ".json")
+        previous = self._previous()
+
+        todo: List[Path] = []
+        reused = []
+        for path in paths:
+            row = previous.get(path.stem)
+            stamped = stamp(path)
+            if row is not None and all(row[column] == stamped[column] for column in STAMP):
+                reused.append(row)
+            else:
+                todo.append(path)
+
+        stats = partial(project_stats, algorithm=self.algorithm)
+        if self.workers == 1 or len(todo) < 2:
+            computed = [stats(path) for path in todo]
+        else:
+            with ProcessPoolExecutor(max_workers=self.workers) as pool:
+                computed = list(pool.map(stats, todo, chunksize=self.chunksize))
+        print(f"Computed the statistics of {len(computed)} projects, reused {len(reused)}")
+
+        df = pd.DataFrame(reused + computed)
+        if not df.empty:
+            df = df.sort_values("project", ignore_index=True)
+        tmp = self.out_path.with_suffix(".tmp")
+        df.to_csv(tmp, index=False)
+        os.replace(tmp, self.out_path)
+        return df
+
+    def _previous(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Returns the statistics of the previous run by project, if they were written with their file stamps.
+        """
+        if not self.out_path.exists():
+            return {}
+        df = pd.read_csv(self.out_path)
+        if df.empty or not set(STAMP + ["project"]) <= set(df.columns):
+            return {}
+        df["project"] = df["project"].astype(str)
+        return {row["project"]: row for row in df.to_dict("records")}
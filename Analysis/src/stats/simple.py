@@ -1,23 +1,85 @@
-from collections import Counter
+from operator import itemgetter
+from typing import Optional
 
 import numpy as np
 
 
+def first_component(labels: np.ndarray, offsets: Optional[np.ndarray], num_files: int) -> np.ndarray:
+    """
+    Returns the first component of each file of a file-level membership of a component index, -1 if in none.
+    """
+    labels = labels.astype(np.int64)
+    if offsets is None:
+        return labels
+    counts = np.diff(offsets)
+    first = np.full(num_files, -1, dtype=np.int64)
+    first[counts > 0] = labels[offsets[:-1][counts > 0]]
+    return first
+
+
+def _project_stats(components: np.ndarray, num_packages: int, distinct_labels: int):
+    """
+    Returns the statistics of a project from the component of each file, so that both sources of SimpleStats compute
+    them in the same way: `num_components` is the largest component id, and the files per component are counted for
+    each distinct component value (files in no component, -1, form a group of their own). Packages and labels count
+    a missing value as one more distinct value.
+    """
+    if len(components) == 0:
+        return {"num_files": 0, "num_components": np.nan, "num_packages": 0, "distinct_labels": 0,
+                "avg_file_component": np.nan, "std_file_component": np.nan}
+
+    if components.min() >= 0:
+        files_per_component = np.bincount(components)
+        files_per_component = files_per_component[files_per_component > 0]
+    else:
+        _, files_per_component = np.unique(components, return_counts=True)
+
+    return {
+        "num_files": len(components),
+        "num_components": components.max(),
+        "num_packages": num_packages,
+        "distinct_labels": distinct_labels,
+        "avg_file_component": files_per_component.mean(),
+        "std_file_component": files_per_component.std(),
+    }
+
+
 class SimpleStats:
     @staticmethod
     def stats(project: dict):
         """
+        Computes the statistics of a project. Each field of the files is extracted once with C-level iterators and the
+        number of files per component is counted with numpy.
+
         Args:
             project (dict): The project dictionary.
         """
-        stats = {
-            "num_files": len(project),
-            "num_components": max([project[file]["component"] for file in project]),
-            "num_packages": len(({project[file]["package"] for file in project})),
-            "distinct_labels": len({project[file]["label"] for file in project})
-        }
+        files = project.values()
+        components = np.fromiter(map(itemgetter("component"), files), dtype=np.int64, count=len(project))
+        return _project_stats(components, len(set(map(itemgetter("package"), files))),
+                              len(set(map(itemgetter("label"), files))))
+
+    @staticmethod
+    def index_stats(arrays, algorithm: Optional[str] = None):
+        """
+        Computes the same statistics as `stats` from the component index of a project (the `<name>.index.npz` file
+        written by the ComponentIndexExporter), with array operations only. Each file is counted in its first component
+        (see `ComponentIndex.file_components`), as the JSON files hold a single component per file.
 
+        Args:
+            arrays: The arrays of the index, e.g. the loaded npz file.
+            algorithm: The community algorithm of the components, the first one of the index if None.
+        """
+        num_files = len(arrays["paths"])
+        algorithms = sorted(key.split(":")[1] for key in arrays if key.startswith("components:")
+                            and key.endswith(":labels"))
+        algorithm = algorithm or (algorithms[0] if algorithms else None)
+        if algorithm is None:
+            components = np.full(num_files, -1, dtype=np.int64)
+        else:
+            components = first_component(arrays[f"components:{algorithm}:labels"],
+                                         arrays.get(f"components:{algorithm}:offsets"), num_files)
 
-        stats["avg_file_component"] = np.mean(list(Counter([project[file]["component"] for file in project]).values()))
-        stats["std_file_component"] = np.std(list(Counter([project[file]["component"] for file in project]).values()))
-        return stats
+        file_package = arrays["file_package"]
+        num_packages = len(arrays["packages"]) + int((file_package < 0).any())
+        return _project_stats(components, num_packages, len(np.unique(arrays["file_label"])))
@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+
+from stats.corpus import CorpusIndex
+
+# Components are local to their project: both projects have a component 0, and `b` has a file in no component.
+PROJECTS = [
+    ("a", ["ui", "ui", "db", "db"], {"x": [0, 0, 1, 1], "y": [0, 0, 0, 1]}),
+    ("b", ["db", "net", "net"], {"x": [5, None, 0], "y": [0, 0, 0]}),
+]
+
+
+@pytest.fixture
+def index() -> CorpusIndex:
+    return CorpusIndex.from_projects(PROJECTS)
+
+
+def test_components_are_renumbered_by_project(index):
+    assert index.labels == ["db", "net", "ui"]
+    assert index.file_component["x"].tolist() == [0, 0, 1, 1, 2, -1, 3]
+    assert index.component_project["x"].tolist() == [0, 0, 1, 1]
+    assert index.file_component["y"].tolist() == [0, 0, 0, 1, 2, 2, 2]
+    assert index.component_sizes("x").tolist() == [2, 2, 1, 1]
+    assert index.purity("y").tolist() == pytest.approx([2 / 3, 1, 2 / 3])
+
+
+def test_project_components_are_contiguous(index):
+    assert index.project_components("a", "x").tolist() == [0, 1]
+    assert index.project_components("b", "x").tolist() == [2, 3]
+    assert index.project_components("b", "y").tolist() == [2]
+
+
+def test_compare(index):
+    same = index.compare("x", "x")
+    assert same[["ari", "nmi"]].to_numpy().tolist() == [[1.0, 1.0], [1.0, 1.0]]
+    assert same[["components_a", "components_b"]].to_numpy().tolist() == [[2, 2], [2, 2]]
+
+    other = index.compare("x", "y").set_index("project")
+    # In `a`, x splits {0, 1} {2, 3} and y {0, 1, 2} {3}: 1 pair together in both for 1 expected, ARI = 0.
+    assert other.loc["a", "ari"] == pytest.approx(0.0)
+    h_x, h_y = np.log(2), -(0.75 * np.log(0.75) + 0.25 * np.log(0.25))
+    mi = 0.5 * np.log(0.5 / (0.5 * 0.75)) + 0.25 * np.log(0.25 / (0.5 * 0.75)) + 0.25 * np.log(0.25 / (0.5 * 0.25))
+    assert other.loc["a", "nmi"] == pytest.approx(mi / np.sqrt(h_x * h_y))
+    # In `b` the file in no component of x is left out, y puts the two others together.
+    assert other.loc["b", "files"] == 2
+    assert other.loc["b", ["components_a", "components_b"]].tolist() == [2, 1]
+    assert other.loc["b", ["ari", "nmi"]].tolist() == [0.0, 0.0]
@@ -0,0 +1,63 @@
+-- Schema of the database written by exporter.database.DatabaseProjectExporter.
+-- Executed by the db_pipeline service of docker-compose.yaml when the database is created.
+
+CREATE TABLE projects
+(
+    id               SERIAL    PRIMARY KEY,
+    name             VARCHAR   NOT NULL UNIQUE,
+    remote           VARCHAR   NOT NULL,
+    description      TEXT,
+    stargazers_count INT,
+    language         VARCHAR,
+    archived         BOOLEAN,
+    pushed_at        VARCHAR,
+    taxonomy         JSON,
+    exported_at      TIMESTAMP NOT NULL
+);
+
+-- Annotated files, with their most probable label and its probability.
+CREATE TABLE files
+(
+    project_id   INT     NOT NULL REFERENCES projects (id) ON DELETE CASCADE,
+    path         VARCHAR NOT NULL,
+    language     VARCHAR,
+    package      VARCHAR,
+    label        VARCHAR,
+    confidence   FLOAT,
+    distribution JSON,
+    content      TEXT,
+    identifiers  JSON,
+    PRIMARY KEY (project_id, path)
+);
+
+-- Nodes and edges of the dependency graph, edges reference nodes by index.
+CREATE TABLE nodes
+(
+    project_id INT     NOT NULL REFERENCES projects (id) ON DELETE CASCADE,
+    idx        INT     NOT NULL,
+    node       VARCHAR NOT NULL,
+    attrs      JSON,
+    PRIMARY KEY (project_id, idx)
+);
+
+CREATE TABLE edges
+(
+    project_id INT NOT NULL REFERENCES projects (id) ON DELETE CASCADE,
+    src        INT NOT NULL,
+    dst        INT NOT NULL,
+    attrs      JSON
+);
+
+CREATE INDEX edges_project ON edges (project_id);
+
+-- Communities of each algorithm, one row per (node, community) pair.
+CREATE TABLE memberships
+(
+    project_id INT     NOT NULL REFERENCES projects (id) ON DELETE CASCADE,
+    algorithm  VARCHAR NOT NULL,
+    node_idx   INT     NOT NULL,
+    community  INT     NOT NULL,
+    PRIMARY KEY (project_id, algorithm, node_idx, community)
+);
+
+CREATE INDEX memberships_community ON memberships (project_id, algorithm, community);
@@ -1,2 +1,14 @@
-from .interface import Annotator
-from .autofl import AutoFLAnnotator
+from typing import TYPE_CHECKING
+
+from lazy import attach
+
+__getattr__, __dir__, __all__ = attach(__name__, {
+    "Annotator": ".interface",
+    "AutoFLAnnotator": ".autofl",
+    "AsyncAutoFLAnnotator": ".asyncautofl",
+})
+
+if TYPE_CHECKING:
+    from .interface import Annotator
+    from .autofl import AutoFLAnnotator
+    from .asyncautofl import AsyncAutoFLAnnotator
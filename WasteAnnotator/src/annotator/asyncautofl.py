@@ -0,0 +1,273 @@
+import asyncio
+import json
+import threading
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple, Union
+
+import requests
+from loguru import logger
+
+from annotator.autofl import AutoFLAnnotator
+from annotator.cache import AnnotationCache, AutoFLResult
+from entities import Project
+from filestore import FileStore
+from httpclient import HTTPClient
+
+_Outcome = Union[AutoFLResult, Exception]
+
+
+def _settle(future: asyncio.Future, outcome: _Outcome):
+    if future.done():
+        return
+    if isinstance(outcome, Exception):
+        future.set_exception(outcome)
+    else:
+        future.set_result(outcome)
+
+
+class AsyncAutoFLAnnotator(AutoFLAnnotator):
+    """
+    AutoFL annotator that keeps several projects in flight. The requests are scheduled on a background event loop
+    shared by all the callers (e.g. the annotation workers of the ConcurrentPipeline), which bounds the number of
+    concurrent requests to AutoFL and applies a timeout to each project.
+    If AutoFL exposes a batch endpoint, the projects requested within `batch_wait` seconds are sent in a single
+    request. The batch endpoint answers with one JSON object per line (`{"name": ..., "result": ...}` or
+    `{"name": ..., "error": ...}`), so each project is parsed and returned as soon as its line is received.
+    """
+    # Attributes left out of the fingerprint of the annotation stage, as they do not change the annotations.
+    fingerprint_exclude = frozenset({"batch_endpoint", "max_concurrency", "batch_size", "batch_wait", "timeout"})
+
+    def __init__(self, endpoint: str = "http://auto-fl:8000/label/files", batch_endpoint: Optional[str] = None,
+                 max_concurrency: int = 8, batch_size: int = 8, batch_wait: float = 0.5,
+                 timeout: Optional[float] = 3600, client: Optional[HTTPClient] = None,
+                 cache: Optional[AnnotationCache] = None, file_store: Optional[FileStore] = None):
+        """
+        Initializes the AsyncAutoFLAnnotator instance.
+
+        Args:
+            endpoint: The endpoint annotating a single project.
+            batch_endpoint: The endpoint annotating several projects at once, if AutoFL provides one. If it answers
+                with 404, 405 or 501 the annotator falls back to single requests.
+            max_concurrency: Maximum number of requests sent to AutoFL at once.
+            batch_size: Maximum number of projects in a batch request.
+            batch_wait: Seconds to wait for other projects before sending an incomplete batch.
+            timeout: Seconds after which the annotation of a project is abandoned, never if None.
+            client: The client used for the requests. Defaults to a client keeping `max_concurrency` connections.
+            cache: Cache of the annotated files, consulted before requesting AutoFL.
+            file_store: Store keeping the contents and identifiers of the files out of memory, kept in the files if None.
+        """
+        super().__init__(endpoint, client or HTTPClient(read_timeout=1800, max_retries=2, pool_size=max_concurrency),
+                         cache, file_store)
+        self.batch_endpoint = batch_endpoint
+        self.max_concurrency = max_concurrency
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+        self.timeout = timeout
+        self._setup()
+
+    def _setup(self):
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._batch: List[Tuple[Project, asyncio.Future]] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._tasks: Set[asyncio.Task] = set()
+        self._batch_supported = True
+
+    def __getstate__(self):
+        # The event loop and its threads cannot be sent to worker processes, each process starts its own.
+        state = self.__dict__.copy()
+        for key in ["_lock", "_loop", "_executor", "_semaphore", "_batch", "_flush_handle", "_tasks",
+                    "_batch_supported"]:
+            del state[key]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._setup()
+
+    def _event_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                # The blocking requests run in this pool, one thread per request allowed in flight.
+                self._executor = ThreadPoolExecutor(self.max_concurrency, thread_name_prefix="autofl")
+                self._loop.set_default_executor(self._executor)
+                self._semaphore = asyncio.Semaphore(self.max_concurrency)
+                threading.Thread(target=self._loop.run_forever, name="autofl-loop", daemon=True).start()
+            return self._loop
+
+    def close(self):
+        """
+        Stops the event loop and its threads.
+        """
+        with self._lock:
+            if self._loop is None:
+                return
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._executor.shutdown(wait=False)
+            self._loop = None
+
+    def annotate_project(self, project: Project) -> Project:
+        """
+        Annotate the components of a project with semantic labels, blocking until the annotation is done. Calls from
+        different threads are served concurrently.
+
+        Args:
+            project: The project to annotate.
+
+        Returns:
+            Project: The annotated project
+        """
+        return self.submit(project).result()
+
+    def submit(self, project: Project) -> Future:
+        """
+        Schedules the annotation of a project and returns the future of the annotated project.
+        """
+        return asyncio.run_coroutine_threadsafe(self.annotate(project), self._event_loop())
+
+    def annotate_projects(self, projects: Iterable[Project]) -> Iterator[Project]:
+        """
+        Annotates several projects, keeping enough of them in flight to fill the concurrent (and batch) requests.
+        Projects are yielded as soon as they are annotated, projects whose annotation failed are logged and skipped.
+
+        Args:
+            projects: The projects to annotate.
+
+        Returns:
+            Iterator[Project]: The annotated projects.
+        """
+        in_flight = self.max_concurrency * (self.batch_size if self.batch_endpoint else 1)
+        projects = iter(projects)
+        running: Dict[Future, Project] = {}
+        exhausted = False
+        while running or not exhausted:
+            while not exhausted and len(running) < in_flight:
+                project = next(projects, None)
+                if project is None:
+                    exhausted = True
+                else:
+                    running[self.submit(project)] = project
+
+            if not running:
+                break
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                project = running.pop(future)
+                try:
+                    yield future.result()
+                except Exception as exc:
+                    logger.error(f"Failed to annotate project `{project.name}`: {exc!r}")
+
+    async def annotate(self, project: Project) -> Project:
+        """
+        Coroutine annotating a project, run on the event loop of the annotator.
+
+        Raises:
+            RuntimeError: If AutoFL failed to annotate the project or did not answer in time.
+        """
+        logger.info(f"Retrieving and annotating components of project `{project.name}`")
+        loop = asyncio.get_running_loop()
+        key, result = await loop.run_in_executor(None, self._lookup, project)
+        if result is not None:
+            return await loop.run_in_executor(None, self._assign, project, result)
+
+        if self.batch_endpoint and self._batch_supported:
+            request = self._request_batched(project)
+        else:
+            request = self._request(project)
+
+        try:
+            result = await asyncio.wait_for(request, self.timeout)
+        except asyncio.TimeoutError:
+            # The blocking request cannot be interrupted, its result is discarded when it completes.
+            raise RuntimeError(f"AutoFL did not annotate project {project.name} within {self.timeout}s.") from None
+
+        if not result.files:
+            raise RuntimeError(f"AutoFL failed to annotate project {project.name}.")
+
+        await loop.run_in_executor(None, self._remember, key, result)
+        return await loop.run_in_executor(None, self._assign, project, result)
+
+    async def _request(self, project: Project) -> AutoFLResult:
+        async with self._semaphore:
+            return await asyncio.get_running_loop().run_in_executor(None, self._annotate_file, project.name,
+                                                                    project.remote, project.language)
+
+    async def _request_batched(self, project: Project) -> AutoFLResult:
+        future = asyncio.get_running_loop().create_future()
+        self._batch.append((project, future))
+        if len(self._batch) >= self.batch_size:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = self._loop.call_later(self.batch_wait, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        batch, self._batch = self._batch, []
+        if batch:
+            self._spawn(self._send_batch(batch))
+
+    def _spawn(self, coro):
+        # The loop only keeps weak references to its tasks.
+        task = self._loop.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _send_batch(self, batch: List[Tuple[Project, asyncio.Future]]):
+        loop = asyncio.get_running_loop()
+        async with self._semaphore:
+            try:
+                await loop.run_in_executor(None, self._post_batch, batch, loop)
+            except (RuntimeError, requests.RequestException, ValueError) as exc:
+                logger.warning(f"AutoFL batch request failed ({exc}), requesting the projects one by one")
+
+        # Projects missing from the answer are requested one by one.
+        for project, future in batch:
+            if not future.done():
+                self._spawn(self._resolve(future, project))
+
+    async def _resolve(self, future: asyncio.Future, project: Project):
+        try:
+            outcome = await self._request(project)
+        except Exception as exc:
+            # Any failure, e.g. a malformed answer, must settle the future, otherwise `annotate` waits until timeout.
+            outcome = exc
+        _settle(future, outcome)
+
+    def _post_batch(self, batch: List[Tuple[Project, asyncio.Future]], loop: asyncio.AbstractEventLoop):
+        """
+        Sends a batch request and settles the future of each project as soon as its line of the answer is parsed.
+        Runs in the executor of the event loop.
+        """
+        futures = {project.name: future for project, future in batch}
+        payload: Dict[str, Any] = {
+            "projects": [self._analysis(project.name, project.remote, project.language) for project, _ in batch]
+        }
+        with self.client.post(self.batch_endpoint, json=payload, stream=True) as res:
+            if res.status_code in (404, 405, 501):
+                self._batch_supported = False
+                raise RuntimeError(f"AutoFL does not support batch requests (status {res.status_code})")
+            if res.status_code != 200:
+                raise RuntimeError(f"AutoFL returned status {res.status_code} for a batch of {len(batch)} projects.")
+
+            for line in res.iter_lines():
+                if not line:
+                    continue
+                item = json.loads(line)
+                future = futures.get(item.get("name"))
+                if future is None:
+                    continue
+                if "error" in item:
+                    outcome = RuntimeError(f"AutoFL failed to annotate project {item['name']}: {item['error']}")
+                else:
+                    try:
+                        outcome = self._parse(item["result"])
+                    except (KeyError, IndexError, TypeError, ValueError) as exc:
+                        outcome = RuntimeError(f"Invalid AutoFL result for project {item['name']}: {exc}")
+                loop.call_soon_threadsafe(_settle, future, outcome)
@@ -1,12 +1,14 @@
-from typing import Dict
+from typing import Any, Dict, Optional, Tuple
 
 import numpy as np
-import pandas as pd
 import requests
 from loguru import logger
 
+from annotator.cache import AnnotationCache, AutoFLResult
 from annotator.interface import Annotator
 from entities import File, Project
+from filestore import FileStore
+from httpclient import HTTPClient
 
 
 def get_label(distribution, taxonomy):
@@ -29,14 +31,22 @@ class AutoFLAnnotator(Annotator):
     provides multi-granular (file, package, project) domain application labels.
     """
 
-    def __init__(self, endpoint: str = "http://auto-fl:8000/label/files"):
+    def __init__(self, endpoint: str = "http://auto-fl:8000/label/files", client: Optional[HTTPClient] = None,
+                 cache: Optional[AnnotationCache] = None, file_store: Optional[FileStore] = None):
         """
 
         Args:
             endpoint:
+            client: The client used for the requests. Defaults to a client that waits up to 30 minutes for the
+                labels, as AutoFL clones and analyses the whole repository before answering.
+            cache: Cache of the annotated files, consulted before requesting AutoFL.
+            file_store: Store keeping the contents and identifiers of the files out of memory, kept in the files if None.
         """
         super().__init__()
         self.endpoint = endpoint
+        self.client = client or HTTPClient(read_timeout=1800, max_retries=2)
+        self.cache = cache
+        self.file_store = file_store
 
         logger.info(f"Initialized AutoFL annotator")
 
@@ -51,16 +61,44 @@ class AutoFLAnnotator(Annotator):
         """
         logger.info(f"Retrieving and annotating components of project `{project.name}`")
 
-        file_annot = self._annotate_file(project.name, project.remote,
-                                         project.language)  # Failed? Then this returns empty DataFrame.
+        key, file_annot = self._lookup(project)
+        if file_annot is None:
+            file_annot = self._annotate_file(project.name, project.remote,
+                                             project.language)  # Failed? Then this returns no files.
 
-        if not file_annot:
-            raise RuntimeError(f"AutoFL failed to annotate project {project.name}.")
+            if not file_annot.files:
+                raise RuntimeError(f"AutoFL failed to annotate project {project.name}.")
+            self._remember(key, file_annot)
 
-        project.files = file_annot
+        return self._assign(project, file_annot)
+
+    def _assign(self, project: Project, result: AutoFLResult) -> Project:
+        """
+        Sets the annotated files and the taxonomy of the project, moving the contents of the files to the file store.
+        """
+        files = result.files
+        if self.file_store is not None:
+            files = self.file_store.offload(project.name, files)
+        project.files = files
+        project.taxonomy = result.taxonomy
         return project
 
-    def _annotate_file(self, project_name: str, remote: str, language: str) -> Dict[str, File]:
+    def _lookup(self, project: Project) -> Tuple[Optional[str], Optional[AutoFLResult]]:
+        """
+        Returns the cache key of the annotations of the project and the cached annotations, if any.
+        The key is computed once, before the request, so that the files are stored under the revision they were
+        looked up with.
+        """
+        if self.cache is None:
+            return None, None
+        key = self.cache.key(project, {"endpoint": self.endpoint, "language": project.language})
+        return key, self.cache.load(project.name, key)
+
+    def _remember(self, key: Optional[str], result: AutoFLResult):
+        if self.cache is not None:
+            self.cache.store(key, result)
+
+    def _annotate_file(self, project_name: str, remote: str, language: str) -> AutoFLResult:
         """
         Request to auto-fl to annotate a GitHub project.
 
@@ -69,21 +107,43 @@ class AutoFLAnnotator(Annotator):
             remote: HTML URL of the GitHub project.
 
         Returns:
-            pd.DataFrame: A pandas DataFrame containing information about annotated files.
+            AutoFLResult: The annotated files and the taxonomy of their labels.
+
+        Raises:
+            RuntimeError: If the request failed or AutoFL did not answer with a result.
 
         Notes:
             - Only Java projects are fully supported and tested with the auto-fl annotator.
         """
-        analysis = {
+        analysis = self._analysis(project_name, remote, language)
+
+        try:
+            res = self.client.post(self.endpoint, json=analysis)
+        except requests.RequestException as exc:
+            raise RuntimeError(f"AutoFL request failed for project {project_name}: {exc}")
+        if res.status_code != 200:
+            raise RuntimeError(f"AutoFL returned status {res.status_code} for project {project_name}.")
+
+        try:
+            return self._parse(res.json()['result'])
+        except (KeyError, IndexError, TypeError, ValueError) as exc:
+            raise RuntimeError(f"AutoFL returned a malformed answer for project {project_name}: {exc!r}") from exc
+
+    @staticmethod
+    def _analysis(project_name: str, remote: str, language: str) -> Dict[str, Any]:
+        """
+        Returns the payload of the AutoFL request for a project.
+        """
+        return {
             "name": project_name,  # "Waikato|weka-3.8",
             "remote": remote,  # "https://github.com/Waikato/weka-3.8",
             "languages": [language]  # ["java"]
         }
 
-        res = requests.post(self.endpoint, json=analysis)
-        res = res.json()['result']
-        taxonomy = res['taxonomy']
-        fs = res['versions'][0]['files']
-        files: Dict[str, File] = {key: File(**fs[key]) for key in fs}
-
-        return files
+    @staticmethod
+    def _parse(result: Dict[str, Any]) -> AutoFLResult:
+        """
+        Returns the annotated files and the taxonomy of an AutoFL result.
+        """
+        fs = result['versions'][0]['files']
+        return AutoFLResult({key: File(**fs[key]) for key in fs}, result.get('taxonomy'))
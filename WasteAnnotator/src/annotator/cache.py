@@ -0,0 +1,113 @@
+import hashlib
+import json
+import os
+import zlib
+from typing import Any, Dict, NamedTuple, Optional
+
+import git
+from loguru import logger
+
+from cache import DiskCache
+from entities import File, Project
+
+# Bumped whenever the layout of the cached annotations changes, so that old entries are not read.
+CACHE_FORMAT = 2
+
+
+class AutoFLResult(NamedTuple):
+    """
+    The files of a project annotated by AutoFL and the label of each column of their distributions.
+    """
+    files: Dict[str, File]
+    taxonomy: Optional[Dict[str, str]] = None
+
+
+def encode_result(result: AutoFLResult) -> bytes:
+    """
+    Serializes an AutoFL result as compressed JSON, leaving out the unset fields of the files.
+    """
+    data = {"taxonomy": result.taxonomy,
+            "files": {path: file.model_dump(exclude_none=True) for path, file in result.files.items()}}
+    return zlib.compress(json.dumps(data, separators=(",", ":")).encode(), 6)
+
+
+def decode_result(data: bytes) -> AutoFLResult:
+    data = json.loads(zlib.decompress(data))
+    return AutoFLResult({path: File(**file) for path, file in data["files"].items()}, data["taxonomy"])
+
+
+class AnnotationCache:
+    """
+    Persistent cache of the files annotated by AutoFL, so that re-runs do not request the labels of a repository
+    again. Entries are keyed by the remote of the project, its revision and the configuration of the annotator.
+    The revision is the commit checked out in the repository directory (e.g. by Arcan), otherwise the HEAD of the remote
+    if `resolve_remote` is set, otherwise the date of the last push. Projects without a known revision are not cached.
+    """
+
+    def __init__(self, directory: str, max_size_mb: Optional[float] = 512, ttl: Optional[float] = None,
+                 repository_path: Optional[str] = None, resolve_remote: bool = False,
+                 taxonomy: Optional[str] = None):
+        """
+        Initializes the AnnotationCache instance.
+
+        Args:
+            directory: The directory containing the cached annotations.
+            max_size_mb: Maximum size of the cache in MB, least recently used annotations are evicted first.
+            ttl: Seconds after which an annotation that was not used is considered expired, never if None.
+            repository_path: The directory containing the local checkouts of the projects.
+            resolve_remote: Query the HEAD commit of the remote when there is no local checkout.
+            taxonomy: Name or version of the AutoFL taxonomy. Changing it invalidates the cached annotations.
+        """
+        self.cache = DiskCache(directory, max_size_mb, ttl, suffix=".json.z")
+        self.repository_path = repository_path
+        self.resolve_remote = resolve_remote
+        self.taxonomy = taxonomy
+
+    def revision(self, project: Project) -> Optional[str]:
+        """
+        Returns the revision of the project the annotations refer to, or None if it is unknown.
+        """
+        if self.repository_path:
+            checkout = os.path.join(self.repository_path, project.name)
+            if os.path.isdir(os.path.join(checkout, ".git")):
+                try:
+                    return git.Repo(checkout).head.commit.hexsha
+                except (git.GitError, ValueError) as exc:
+                    logger.warning(f"Cannot read the revision of {checkout}: {exc}")
+
+        if self.resolve_remote and project.remote:
+            try:
+                head = git.cmd.Git().ls_remote(project.remote, "HEAD")
+                if head:
+                    return head.split()[0]
+            except git.GitCommandError as exc:
+                logger.warning(f"Cannot resolve the HEAD of {project.remote}: {exc}")
+
+        return f"pushed:{project.pushed_at}" if project.pushed_at else None
+
+    def key(self, project: Project, config: Dict[str, Any]) -> Optional[str]:
+        """
+        Returns the key of the annotations of the project, or None if its revision is unknown.
+
+        Args:
+            project: The project.
+            config: The configuration of the annotator the files are annotated with.
+        """
+        revision = self.revision(project)
+        if revision is None:
+            return None
+        config = hashlib.sha1(json.dumps([self.taxonomy, config], sort_keys=True).encode()).hexdigest()
+        return f"{CACHE_FORMAT}:{project.remote}:{revision}:{config}"
+
+    def load(self, name: str, key: Optional[str]) -> Optional[AutoFLResult]:
+        data = self.cache.get(key) if key else None
+        if data is None:
+            logger.info(f"Annotation cache miss for {name} ({self.cache})")
+            return None
+
+        logger.info(f"Annotation cache hit for {name} ({self.cache})")
+        return decode_result(data)
+
+    def store(self, key: Optional[str], result: AutoFLResult):
+        if key:
+            self.cache.set(key, encode_result(result))
@@ -1,5 +1,7 @@
 #!/bin/bash
+set -o pipefail
 
+# Remote of the project, or "-" to analyse the repository already cloned in REPOSITORY_PATH
 PROJECT=$1
 PROJECT_NAME=$2
 PROG_LANG=$3
@@ -9,13 +11,17 @@ REPOSITORY_PATH=$5
 OUT_PATH=$6
 LOGS_PATH=$7
 
-# /$PROJECT_NAME removed from REPOSITORY_PATH for n
- # -v before this originally
+REMOTE_ARGS=()
+if [ "$PROJECT" != "-" ]; then
+  REMOTE_ARGS=(--remote "$PROJECT")
+fi
 
-/waste-annotator/src/arcan/arcan.sh analyze \
-              -i $REPOSITORY_PATH/$PROJECT_NAME -p $PROJECT_NAME \
-              --remote $PROJECT \
-              -o $OUT_PATH -l $PROG_LANG -f $ARCAN_PATH/filters.yaml \
+# The maximum heap of the JVM can be set with the JAVA_MEMORY environment variable
+
+"$ARCAN_PATH"/arcan.sh analyze \
+              -i "$REPOSITORY_PATH/$PROJECT_NAME" -p "$PROJECT_NAME" \
+              "${REMOTE_ARGS[@]}" \
+              -o "$OUT_PATH" -l "$PROG_LANG" -f "$ARCAN_PATH"/filters.yaml \
               output.writeDependencyGraph=true \
               output.writeAffected=false \
               output.writeComponentMetrics=False \
@@ -24,4 +30,4 @@ LOGS_PATH=$7
               metrics.smellCharacteristics=none \
               metrics.indexCalculators=none \
               detectors.smellDetectors=none \
-              2>&1 |& tee outfile $LOGS_PATH/$PROJECT_NAME.log
\ No newline at end of file
+              2>&1 | tee "$LOGS_PATH/$PROJECT_NAME.log"
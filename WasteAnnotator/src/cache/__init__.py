@@ -0,0 +1 @@
+from .disk import DiskCache
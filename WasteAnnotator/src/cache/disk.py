@@ -0,0 +1,101 @@
+import hashlib
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import Optional
+
+from loguru import logger
+
+
+class DiskCache:
+    """
+    Size-bounded key-value cache stored as one file per entry in a directory.
+    Reading an entry refreshes its modification time, so that when the cache grows over its maximum size the least
+    recently used entries are evicted first. Entries are written atomically, so the same directory can be shared by
+    several processes.
+    """
+
+    def __init__(self, directory: str, max_size_mb: Optional[float] = 1024, ttl: Optional[float] = None,
+                 suffix: str = ".bin"):
+        """
+        Initializes the DiskCache instance.
+
+        Args:
+            directory: The directory containing the entries.
+            max_size_mb: Maximum size of the cache in MB, unbounded if None.
+            ttl: Seconds after which an entry that was not used is considered expired, never if None.
+            suffix: Extension of the entry files.
+        """
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_size = max_size_mb * 1024 * 1024 if max_size_mb is not None else None
+        self.ttl = ttl
+        self.suffix = suffix
+        self.hits = 0
+        self.misses = 0
+
+    def path(self, key: str) -> Path:
+        return self.directory / (hashlib.sha1(key.encode()).hexdigest() + self.suffix)
+
+    def get(self, key: str) -> Optional[bytes]:
+        """
+        Returns the content of an entry, or None if it is missing or expired.
+
+        Args:
+            key: The key of the entry.
+        """
+        path = self.path(key)
+        try:
+            if self.ttl is not None and time.time() - path.stat().st_mtime > self.ttl:
+                path.unlink(missing_ok=True)
+                raise FileNotFoundError(path)
+            data = path.read_bytes()
+            os.utime(path)
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return data
+
+    def set(self, key: str, data: bytes):
+        """
+        Stores an entry, evicting the least recently used entries if the cache exceeds its maximum size.
+
+        Args:
+            key: The key of the entry.
+            data: The content of the entry.
+        """
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, self.path(key))
+        self._evict()
+
+    def delete(self, key: str):
+        self.path(key).unlink(missing_ok=True)
+
+    def _evict(self):
+        if self.max_size is None:
+            return
+
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(self.suffix):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        size = sum(e[1] for e in entries)
+        for _, entry_size, entry_path in sorted(entries):
+            if size <= self.max_size:
+                break
+            try:
+                os.remove(entry_path)
+                logger.debug(f"Evicted {entry_path} from cache")
+            except FileNotFoundError:
+                pass
+            size -= entry_size
+
+    def __str__(self):
+        return f"{self.hits} hits, {self.misses} misses"
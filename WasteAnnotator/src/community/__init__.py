@@ -1 +0,0 @@
-from .communityextractor import CommunityExtractor
\ No newline at end of file
@@ -0,0 +1,10 @@
+from typing import TYPE_CHECKING
+
+from lazy import attach
+
+__getattr__, __dir__, __all__ = attach(__name__, {
+    "CommunityExtractor": ".communityextractor",
+})
+
+if TYPE_CHECKING:
+    from .communityextractor import CommunityExtractor
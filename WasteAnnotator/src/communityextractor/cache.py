@@ -0,0 +1,110 @@
+import hashlib
+import io
+import json
+from typing import Any, Dict, List, NamedTuple, Optional
+
+import numpy as np
+
+from cache import DiskCache
+from entities import Membership
+
+# Bumped whenever the layout of the cached memberships changes, so that old entries are not read.
+CACHE_FORMAT = 2
+
+
+def _config(fn: str, kwargs: Dict[str, Any]) -> str:
+    return hashlib.sha1(json.dumps([fn, kwargs], sort_keys=True, default=str).encode()).hexdigest()
+
+
+class Previous(NamedTuple):
+    """
+    The last communities found for a project: the community of each node of the current graph (-1 for nodes that were
+    not in the graph they were found on), the fingerprint of that graph and the partition the run started from.
+    """
+    labels: np.ndarray
+    fingerprint: str
+    start: Optional[str]
+
+
+class CommunityCache:
+    """
+    Persistent cache of the communities found by the detection algorithms, so that re-runs and parameter sweeps do not
+    run an algorithm again on the same graph with the same arguments. Entries are keyed by the fingerprint of the graph,
+    the algorithm, its arguments and, for warm-started runs, the partition the algorithm started from (see `start`), so
+    that runs from scratch never get the communities of a warm-started run.
+    The last communities found for each project, algorithm and arguments are also kept with the ids of their nodes, so
+    that when the graph of a project changes the algorithms supporting it can start from the previous partition.
+    """
+
+    def __init__(self, directory: str, max_size_mb: Optional[float] = 512):
+        """
+        Initializes the CommunityCache instance.
+
+        Args:
+            directory: The directory containing the cached communities.
+            max_size_mb: Maximum size of the cache in MB, least recently used entries are evicted first.
+        """
+        self.cache = DiskCache(directory, max_size_mb, suffix=".npz")
+
+    @staticmethod
+    def key(graph_fingerprint: str, fn: str, kwargs: Dict[str, Any], start: Optional[str] = None) -> str:
+        """
+        Returns the key of the communities found on a graph, from scratch if `start` is None, otherwise from the
+        partition identified by `start`.
+        """
+        key = f"{CACHE_FORMAT}:{graph_fingerprint}:{_config(fn, kwargs)}"
+        return key if start is None else f"{key}:warm:{start}"
+
+    @staticmethod
+    def start(initial: Optional[np.ndarray]) -> Optional[str]:
+        """
+        Returns the identifier of the partition a run starts from (the community of each node), None from scratch.
+        """
+        if initial is None:
+            return None
+        return hashlib.sha1(np.ascontiguousarray(initial, dtype=np.int32).tobytes()).hexdigest()
+
+    def load(self, key: str) -> Optional[Membership]:
+        data = self.cache.get(key)
+        if data is None:
+            return None
+        with np.load(io.BytesIO(data)) as arrays:
+            return Membership(labels=arrays["labels"], offsets=arrays["offsets"] if "offsets" in arrays else None)
+
+    def store(self, key: str, membership: Membership):
+        arrays = {"labels": membership.labels}
+        if membership.offsets is not None:
+            arrays["offsets"] = membership.offsets
+        self.cache.set(key, self._encode(arrays))
+
+    def previous(self, name: str, fn: str, kwargs: Dict[str, Any], nodes: List[Any]) -> Optional[Previous]:
+        """
+        Returns the last communities found for the project with the same algorithm and arguments, mapped to the given
+        nodes by node id, or None if there are none.
+        """
+        data = self.cache.get(f"{CACHE_FORMAT}:previous:{name}:{_config(fn, kwargs)}")
+        if data is None:
+            return None
+        with np.load(io.BytesIO(data)) as arrays:
+            index = dict(zip(arrays["nodes"].tolist(), arrays["labels"].tolist()))
+            fingerprint, start = str(arrays["fingerprint"]), str(arrays["start"]) or None
+        return Previous(np.array([index.get(str(node), -1) for node in nodes], dtype=np.int32), fingerprint, start)
+
+    def remember(self, name: str, fn: str, kwargs: Dict[str, Any], nodes: List[Any], membership: Membership,
+                 graph_fingerprint: str, start: Optional[str]):
+        """
+        Keeps the communities found for the project as starting point of the next runs, with the fingerprint of the
+        graph and the partition they started from. Overlapping communities are not kept, as no algorithm starts from
+        them.
+        """
+        if membership.overlapping:
+            return
+        arrays = {"nodes": np.array([str(node) for node in nodes], dtype=str), "labels": membership.labels,
+                  "fingerprint": np.array(graph_fingerprint), "start": np.array(start or "")}
+        self.cache.set(f"{CACHE_FORMAT}:previous:{name}:{_config(fn, kwargs)}", self._encode(arrays))
+
+    @staticmethod
+    def _encode(arrays: Dict[str, np.ndarray]) -> bytes:
+        buffer = io.BytesIO()
+        np.savez_compressed(buffer, **arrays)
+        return buffer.getvalue()
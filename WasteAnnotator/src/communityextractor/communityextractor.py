@@ -0,0 +1,248 @@
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+import numpy as np
+from hydra.utils import get_method
+from loguru import logger
+
+from communityextractor.cache import CommunityCache
+from communityextractor.reduction import GraphReducer
+from entities import Project, GraphModel, Membership
+
+# Graphs and node ids shared with the worker processes, set once per worker by the pool initializer. Only the worker
+# processes use them: in-process runs are given the graphs of their project, as several projects may be extracted
+# concurrently in threads.
+_graphs: Dict[str, Any] = {}
+_nodes: List[Any] = []
+
+
+def _init_worker(graphs: Dict[str, Any], nodes: List[Any]):
+    global _graphs, _nodes
+    _graphs = graphs
+    _nodes = nodes
+
+
+# Algorithms that can start from a partition: the argument receiving it and its conversion from the community id of
+# each node. Louvain accepts a partition too, but python-louvain only merges from it and gets stuck in the communities
+# of the previous resolution, while Leiden refines them.
+WARM_STARTS: Dict[str, Tuple[str, Callable[[np.ndarray, Any], Any]]] = {
+    "cdlib.algorithms.leiden": ("initial_membership", lambda labels, graph: labels.tolist()),
+}
+
+
+def _detect(graphs: Dict[str, Any], nodes: List[Any], fn: str, graph_format: str, kwargs: Dict,
+            initial: Optional[np.ndarray] = None) -> Membership:
+    """
+    Runs an algorithm on the graph in `graph_format`, whose node ids are `nodes`, starting from the `initial` community of each node (-1 if none) when the
+    algorithm supports it.
+    """
+    if initial is not None and fn in WARM_STARTS:
+        # Nodes without a previous community start in a community of their own.
+        initial = initial.copy()
+        missing = initial < 0
+        initial[missing] = initial.max(initial=-1) + 1 + np.arange(missing.sum())
+        argument, convert = WARM_STARTS[fn]
+        kwargs = {**kwargs, argument: convert(initial, graphs[graph_format])}
+    # The clustering is converted in the worker, so that only the compact membership is sent back.
+    clustering = get_method(fn)(graphs[graph_format], **kwargs)
+    return Membership.from_communities(clustering.communities, nodes)
+
+
+def _sweep(graphs: Dict[str, Any], nodes: List[Any], fn: str, graph_format: str, kwargs: Dict,
+           runs: List[Dict[str, Any]], initial: Optional[np.ndarray] = None,
+           warm_start: bool = False) -> List[Membership]:
+    """
+    Runs an algorithm once per set of parameters on the graph in `graph_format`. With `warm_start`, each run starts from the
+    communities found by the previous one when the algorithm supports it.
+    """
+    memberships = []
+    for params in runs:
+        membership = _detect(graphs, nodes, fn, graph_format, {**kwargs, **params}, initial)
+        memberships.append(membership)
+        if warm_start and not membership.overlapping:
+            initial = membership.labels
+    return memberships
+
+
+def _shared_sweep(*job) -> List[Membership]:
+    """
+    Runs a `_sweep` job in a worker process, on the graphs shared by the pool initializer.
+    """
+    return _sweep(_graphs, _nodes, *job)
+
+
+class CommunityExtractor:
+    """
+    The CommunityExtractor class is responsible for extracting communities from the dependency graph.
+    """
+    # Attributes left out of the fingerprint of the community stage, as they do not change the communities found.
+    fingerprint_exclude = frozenset({"force_run", "workers"})
+
+    def __init__(self, algorithms: Dict[str, Dict[str, Union[Callable, Dict]]] = None,
+                 force_run: bool = False, workers: int = 1, reducer: Optional[GraphReducer] = None,
+                 cache: Optional[CommunityCache] = None, warm_start: bool = False):
+        """
+        Initializes the CommunityExtractor instance.
+        Args:
+            algorithms: List of algorithms to extract communities from the dependency graph. Each algorithm has a
+                `function`, optional `kwargs` and an optional `graph` format it is given, either `networkx` (default)
+                or `igraph`. An algorithm with a `sweep` (a `parameter` and its `values`) runs once per value in a
+                single job, its communities are stored as `<algorithm>@<parameter>=<value>`.
+            force_run: Run the algorithms even if the project already has their communities.
+            workers: Number of processes running the algorithms of a project concurrently, 1 to run them in turn.
+            reducer: Reduces the dependency graph before running the algorithms, whose communities are then mapped back
+                to the nodes of the dependency graph (removed nodes are in no community). The full graph is used if None.
+            cache: Cache of the communities found on each graph, reused instead of running an algorithm again with the
+                same arguments.
+            warm_start: Start the algorithms that support it (see WARM_STARTS) from the communities of the previous
+                value of the sweep, or from the last communities found for the project if its graph changed.
+        """
+        if not algorithms:
+            logging.warning("No community detection algorithms provided. Using default Louvain algorithm.")
+            algorithms = {'louvain': {'function': 'cdlib.algorithms.louvain'}}
+        self.algorithms = algorithms
+        self.force_run = force_run
+        self.workers = workers
+        self.reducer = reducer
+        self.cache = cache
+        self.warm_start = warm_start
+
+        logger.debug(f"Community detection algorithms: {self.algorithms}")
+
+        logger.info("Initialized CommunityExtractor")
+
+    def extract(self, project: Project) -> Project:
+        # Extract components/communities from the dependency graph.
+        if project.communities is None:
+            project.communities = {}
+
+        todo = []
+        for algo in self.algorithms:
+            if all(name in project.communities for name, _ in self._runs(algo)) and not self.force_run:
+                logging.info(f"Communities already extracted using {algo} algorithm. Skipping.")
+                continue
+            todo.append(algo)
+
+        if not todo:
+            return project
+
+        graph = project.dep_graph
+        reduction = self.reducer.reduce(graph, project.name) if self.reducer is not None else None
+        if reduction is not None:
+            graph = reduction.graph
+
+        fingerprint = graph.fingerprint() if self.cache is not None else None
+        found, jobs = self._cached(project.name, graph, fingerprint, todo)
+        if jobs:
+            # The graph is converted once per format and shared by all the algorithms.
+            graphs = {fmt: self._convert(graph, fmt) for fmt in {self._format(algo) for algo in jobs}}
+
+            if self.workers > 1 and len(jobs) > 1:
+                with ProcessPoolExecutor(max_workers=min(self.workers, len(jobs)), initializer=_init_worker,
+                                         initargs=(graphs, graph.nodes)) as pool:
+                    futures = {algo: pool.submit(_shared_sweep, *job) for algo, (_, job) in jobs.items()}
+                    for algo, future in futures.items():
+                        logging.info(f"Extracting communities using {algo} algorithm")
+                        found.update(self._store(project.name, graph, fingerprint, jobs[algo], future.result()))
+            else:
+                for algo, (_, job) in jobs.items():
+                    logging.info(f"Extracting communities using {algo} algorithm")
+                    memberships = _sweep(graphs, graph.nodes, *job)
+                    found.update(self._store(project.name, graph, fingerprint, jobs[algo], memberships))
+
+        for algo in todo:
+            for name, _ in self._runs(algo):
+                project.communities[name] = reduction.expand(found[name]) if reduction is not None else found[name]
+        return project
+
+    def _runs(self, algo: str) -> List[Tuple[str, Dict[str, Any]]]:
+        """
+        Returns the runs of an algorithm as (name of the communities, parameters set by the sweep) pairs.
+        """
+        sweep = self.algorithms[algo].get('sweep')
+        if not sweep:
+            return [(algo, {})]
+        return [(f"{algo}@{sweep['parameter']}={value}", {sweep['parameter']: value}) for value in sweep['values']]
+
+    def _cached(self, name: str, graph: GraphModel, fingerprint: Optional[str],
+                todo: List[str]) -> Tuple[Dict[str, Membership], Dict[str, Tuple[List[Tuple[str, Dict]], Tuple]]]:
+        """
+        Returns the communities of the runs found in the cache and, for each algorithm with runs left, these runs and
+        the arguments of the `_sweep` job computing them.
+        Warm-started runs are cached with the partition they started from. As each run of a warm sweep starts from the
+        previous one, the runs after the first one missing from the cache are computed again.
+        """
+        found: Dict[str, Membership] = {}
+        jobs: Dict[str, Tuple[List[Tuple[str, Dict]], Tuple]] = {}
+        for algo in todo:
+            fn, fmt, kwargs = self._task(algo)
+            runs = self._runs(algo)
+            warm = self.warm_start and fn in WARM_STARTS
+            initial, start = None, None
+            previous = self.cache.previous(name, fn, {**kwargs, **runs[0][1]}, graph.nodes) \
+                if warm and self.cache is not None else None
+            if previous is not None and previous.fingerprint == fingerprint:
+                # The graph did not change, the first run was cached with the partition it started from then.
+                start = previous.start
+            elif previous is not None:
+                initial = previous.labels
+                start = self.cache.start(initial)
+
+            missing: List[Tuple[str, Dict[str, Any]]] = []
+            for i, (run, params) in enumerate(runs):
+                cached = self.cache.load(self.cache.key(fingerprint, fn, {**kwargs, **params}, start)) \
+                    if self.cache else None
+                if cached is None and warm:
+                    # The next runs start from this one.
+                    missing = runs[i:]
+                    break
+                if cached is None:
+                    missing.append((run, params))
+                    continue
+                found[run] = cached
+                if warm and not cached.overlapping:
+                    initial = cached.labels
+                    start = self.cache.start(initial)
+
+            if not missing:
+                logging.info(f"Communities of {algo} algorithm found in the cache")
+                continue
+            if previous is not None and initial is previous.labels:
+                logger.info(f"Starting {fn} of {name} from the previous communities of "
+                            f"{int((initial >= 0).sum())}/{len(initial)} nodes")
+            jobs[algo] = (missing, (fn, fmt, kwargs, [params for _, params in missing], initial, warm))
+        return found, jobs
+
+    def _store(self, name: str, graph: GraphModel, fingerprint: Optional[str],
+               job: Tuple[List[Tuple[str, Dict]], Tuple], memberships: List[Membership]) -> Dict[str, Membership]:
+        """
+        Caches the communities computed by the job of an algorithm and returns them by name.
+        """
+        runs, (fn, _, kwargs, _, initial, warm) = job
+        if self.cache is not None:
+            for (_, params), membership in zip(runs, memberships):
+                start = self.cache.start(initial)
+                self.cache.store(self.cache.key(fingerprint, fn, {**kwargs, **params}, start), membership)
+                self.cache.remember(name, fn, {**kwargs, **params}, graph.nodes, membership, fingerprint, start)
+                # The next run starts from this one, as in `_sweep`.
+                if warm and not membership.overlapping:
+                    initial = membership.labels
+        return {run: membership for (run, _), membership in zip(runs, memberships)}
+
+    def _format(self, algo: str) -> str:
+        return self.algorithms[algo].get('graph', 'networkx')
+
+    def _task(self, algo: str):
+        f = self.algorithms[algo]
+        fn = f['function']
+        kwargs = dict(f['kwargs']) if 'kwargs' in f else {}
+        return fn, self._format(algo), kwargs
+
+    @staticmethod
+    def _convert(graph: GraphModel, graph_format: str) -> Any:
+        if graph_format == 'networkx':
+            return graph.to_graph()
+        if graph_format == 'igraph':
+            return graph.to_igraph()
+        raise ValueError(f"Unknown graph format {graph_format}")
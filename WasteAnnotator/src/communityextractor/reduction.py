@@ -0,0 +1,193 @@
+import hashlib
+import io
+import json
+from typing import Iterable, NamedTuple, Optional
+
+import numpy as np
+from loguru import logger
+
+from cache import DiskCache
+from entities import Column, GraphModel, Membership
+
+# Bumped whenever the reduction or the layout of the cached arrays changes, so that old entries are not read.
+CACHE_FORMAT = 1
+
+
+class Reduction(NamedTuple):
+    """
+    A reduced dependency graph, with the node of the reduced graph each node of the original graph was mapped to.
+    """
+    graph: GraphModel
+    # Index of the reduced node of each original node, -1 if the node was removed.
+    node_map: np.ndarray
+
+    def expand(self, membership: Membership) -> Membership:
+        """
+        Maps the communities found on the reduced graph back to the nodes of the original graph: each node gets the
+        communities of its reduced node, removed nodes are in no community.
+        """
+        kept = self.node_map >= 0
+        reduced = np.where(kept, self.node_map, 0)
+        if membership.offsets is None:
+            return Membership(labels=np.where(kept, membership.labels[reduced], -1))
+
+        lengths = np.where(kept, np.diff(membership.offsets)[reduced], 0)
+        offsets = np.concatenate(([0], np.cumsum(lengths)))
+        # Position of each expanded entry in the labels of the reduced graph.
+        positions = np.repeat(membership.offsets[reduced] - offsets[:-1], lengths) + np.arange(offsets[-1])
+        return Membership(labels=membership.labels[positions], offsets=offsets)
+
+    def to_bytes(self) -> bytes:
+        buffer = io.BytesIO()
+        np.savez_compressed(buffer, **self.graph.to_arrays(), node_map=self.node_map)
+        return buffer.getvalue()
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'Reduction':
+        with np.load(io.BytesIO(data)) as arrays:
+            arrays = {key: arrays[key] for key in arrays.files}
+        return cls(GraphModel.from_arrays(arrays), arrays["node_map"])
+
+
+def _matching(column: Optional[Column], types: Iterable[str]) -> Optional[np.ndarray]:
+    """
+    Returns the mask of the rows of a string column whose value is one of the types (ignoring case), None if there is
+    no such column.
+    """
+    if column is None or column.kind != "str":
+        return None
+    wanted = {t.lower() for t in types}
+    codes = np.array([i for i, level in enumerate(column.levels) if level.lower() in wanted], dtype=np.int32)
+    return np.isin(column.values, codes)
+
+
+class GraphReducer:
+    """
+    Reduces the dependency graph extracted by Arcan before community detection, so that the algorithms run on a
+    smaller graph made only of the nodes the annotations refer to:
+    nodes and edges are filtered by type (e.g. keeping the `unit` nodes and the `dependsOn` edges), nodes with the same
+    value of an attribute (e.g. the classes of the same file) are collapsed into one node, parallel and reciprocal
+    edges are merged into a single undirected edge whose weight is the sum of their weights, self loops and isolated
+    nodes are dropped.
+    The reduction of each graph is cached in memory on the graph and, if a directory is given, on disk, keyed by the
+    fingerprint of the graph and by the configuration of the reducer.
+    """
+
+    def __init__(self, node_types: Optional[Iterable[str]] = None, edge_types: Optional[Iterable[str]] = None,
+                 node_type_key: str = "labelV", edge_type_key: str = "labelE", collapse_key: Optional[str] = None,
+                 weight_key: Optional[str] = "weight", drop_isolated: bool = True, cache_dir: Optional[str] = None,
+                 cache_size_mb: Optional[float] = 512):
+        """
+        Initializes the GraphReducer instance.
+
+        Args:
+            node_types: Values of the node type attribute of the nodes to keep, all the nodes if None.
+            edge_types: Values of the edge type attribute of the edges to keep, all the edges if None.
+            node_type_key: The node attribute holding the type of the nodes.
+            edge_type_key: The edge attribute holding the type of the edges.
+            collapse_key: Node attribute by which nodes are collapsed (e.g. their file path), no collapsing if None.
+                Nodes without the attribute are kept as they are.
+            weight_key: Numeric edge attribute summed when merging edges, edges count 1 if None or missing.
+            drop_isolated: Drop the nodes left without edges.
+            cache_dir: Directory where the reduced graphs are cached, only in memory if None.
+            cache_size_mb: Maximum size of the cache in MB.
+        """
+        self.node_types = list(node_types) if node_types is not None else None
+        self.edge_types = list(edge_types) if edge_types is not None else None
+        self.node_type_key = node_type_key
+        self.edge_type_key = edge_type_key
+        self.collapse_key = collapse_key
+        self.weight_key = weight_key
+        self.drop_isolated = drop_isolated
+        self.cache = DiskCache(cache_dir, cache_size_mb, suffix=".npz") if cache_dir else None
+
+    def config(self) -> str:
+        return json.dumps([self.node_types, self.edge_types, self.node_type_key, self.edge_type_key,
+                           self.collapse_key, self.weight_key, self.drop_isolated])
+
+    def reduce(self, graph: GraphModel, name: str = "") -> Reduction:
+        """
+        Returns the reduction of the graph, from the cache if it was already computed.
+
+        Args:
+            graph: The dependency graph.
+            name: The name of the project, logged and used in the cache key.
+        """
+        return graph.view(("reduction", self.config()), lambda: self._load_or_reduce(graph, name))
+
+    def _load_or_reduce(self, graph: GraphModel, name: str) -> Reduction:
+        key = None
+        if self.cache is not None:
+            config = hashlib.sha1(self.config().encode()).hexdigest()
+            key = f"{CACHE_FORMAT}:{name}:{graph.fingerprint()}:{config}"
+            data = self.cache.get(key)
+            if data is not None:
+                logger.info(f"Reduced graph cache hit for {name} ({self.cache})")
+                return Reduction.from_bytes(data)
+
+        reduction = self._reduce(graph)
+        logger.info(f"Reduced the graph of {name} from {graph.num_nodes} nodes and {graph.num_edges} edges to "
+                    f"{reduction.graph.num_nodes} nodes and {reduction.graph.num_edges} edges")
+        if key is not None:
+            self.cache.set(key, reduction.to_bytes())
+        return reduction
+
+    def _reduce(self, graph: GraphModel) -> Reduction:
+        keep_nodes = np.ones(graph.num_nodes, dtype=bool)
+        if self.node_types is not None:
+            mask = _matching(graph.node_attrs.get(self.node_type_key), self.node_types)
+            if mask is None:
+                logger.warning(f"The graph has no `{self.node_type_key}` node attribute, nodes are not filtered")
+            else:
+                keep_nodes = mask
+
+        keep_edges = keep_nodes[graph.src] & keep_nodes[graph.dst]
+        if self.edge_types is not None:
+            mask = _matching(graph.edge_attrs.get(self.edge_type_key), self.edge_types)
+            if mask is None:
+                logger.warning(f"The graph has no `{self.edge_type_key}` edge attribute, edges are not filtered")
+            else:
+                keep_edges &= mask
+
+        # Group of each node: the code of its collapse attribute, or a group of its own if it has none.
+        groups = np.arange(graph.num_nodes, dtype=np.int64)
+        collapse = graph.node_attrs.get(self.collapse_key) if self.collapse_key else None
+        if collapse is not None:
+            codes = collapse.values.astype(np.int64)
+            groups = np.where(codes >= 0, codes, len(collapse.levels or []) + groups)
+        elif self.collapse_key:
+            logger.warning(f"The graph has no `{self.collapse_key}` node attribute, nodes are not collapsed")
+
+        src, dst = groups[graph.src[keep_edges]], groups[graph.dst[keep_edges]]
+        weights = graph.weights(self.weight_key)[keep_edges]
+        loops = src == dst
+        src, dst, weights = src[~loops], dst[~loops], weights[~loops]
+        # Edges are merged regardless of their direction, as the algorithms run on the undirected graph.
+        src, dst = np.minimum(src, dst), np.maximum(src, dst)
+
+        present = np.unique(np.concatenate((src, dst))) if self.drop_isolated else np.unique(groups[keep_nodes])
+        new_src, new_dst = np.searchsorted(present, src), np.searchsorted(present, dst)
+        pairs, inverse = np.unique(new_src * len(present) + new_dst, return_inverse=True)
+        merged = np.bincount(inverse.ravel(), weights=weights, minlength=len(pairs))
+
+        node_map = np.full(graph.num_nodes, -1, dtype=np.int64)
+        kept = keep_nodes & np.isin(groups, present)
+        node_map[kept] = np.searchsorted(present, groups[kept])
+        # Each reduced node is represented by its first original node.
+        representative = np.full(len(present), -1, dtype=np.int64)
+        kept_idx = np.flatnonzero(kept)
+        representative[node_map[kept_idx[::-1]]] = kept_idx[::-1]
+
+        nodes = [graph.nodes[i] for i in representative.tolist()]
+        if collapse is not None:
+            paths = collapse.to_list()
+            nodes = [paths[i] if paths[i] is not None else node for i, node in zip(representative.tolist(), nodes)]
+
+        reduced = GraphModel(
+            nodes=nodes,
+            src=(pairs // len(present)).astype(np.int32) if len(present) else pairs.astype(np.int32),
+            dst=(pairs % len(present)).astype(np.int32) if len(present) else pairs.astype(np.int32),
+            edge_attrs={"weight": Column(kind="float", values=merged)},
+            node_attrs={name: col.take(representative) for name, col in graph.node_attrs.items()},
+        )
+        return Reduction(reduced, node_map)
@@ -1,4 +1,10 @@
 from .entities import Project
 from .entities import Annotation
 from .entities import File
-from .entities import GraphModel
\ No newline at end of file
+from .entities import FileRef
+from .entities import Column
+from .entities import GraphModel
+from .entities import Membership
+from .entities import LabelMatrix
+from .entities import ComponentIndex
+from .entities import normalize_path
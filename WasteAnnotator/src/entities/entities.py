@@ -1,7 +1,31 @@
-from typing import Optional, List, Dict, Any, Tuple
+import hashlib
+import mmap
+import os
+import posixpath
+from functools import lru_cache
+from typing import TYPE_CHECKING, Optional, List, Dict, Any, Tuple, Iterator, Iterable, Callable
 
-import networkx as nx
-from pydantic import BaseModel
+import numpy as np
+from pydantic import BaseModel, ConfigDict, BeforeValidator, PlainSerializer, PrivateAttr, model_validator
+from typing_extensions import Annotated
+
+if TYPE_CHECKING:
+    import networkx as nx
+
+# Numpy array stored in the models, serialized to JSON as a (nested) list.
+NDArray = Annotated[np.ndarray,
+                    BeforeValidator(lambda v: v if isinstance(v, np.ndarray) else np.asarray(v)),
+                    PlainSerializer(lambda a: a.tolist(), return_type=list, when_used='json')]
+
+
+def normalize_path(path: str) -> str:
+    """
+    Returns the path relative to the root of the repository in a single form, so that the paths of the files returned
+    by AutoFL and the paths of the nodes of the Arcan graph can be joined: forward slashes, no `.` or `..` segments and
+    no leading or trailing slash.
+    """
+    path = posixpath.normpath(path.replace("\\", "/")).lstrip("/")
+    return "" if path == "." else path
 
 
 class Annotation(BaseModel):
@@ -12,9 +36,47 @@ class Annotation(BaseModel):
     unannotated: bool
 
 
+@lru_cache(maxsize=32)
+def _mapped(path: str, mtime_ns: int, size: int) -> mmap.mmap:
+    # Keyed by modification time and size, so that a rewritten file is mapped again.
+    with open(path, "rb") as f:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+class FileRef(BaseModel):
+    """
+    Class defining where the content of a file is stored outside of the project: a whole file (e.g. in the checked-out
+    repository) or a range of bytes of a packed blob. The bytes are read through a memory map when they are needed.
+    References to files that can change (e.g. a checkout pulled again) keep the SHA-1 of the bytes, which is checked
+    when they are read.
+    """
+    path: str
+    offset: int = 0
+    length: Optional[int] = None
+    sha1: Optional[str] = None
+
+    def read(self) -> bytes:
+        """
+        Returns the referenced bytes.
+
+        Raises:
+            ValueError: If the file is shorter than the range, or its bytes no longer have the SHA-1 of the reference.
+        """
+        stat = os.stat(self.path)
+        end = stat.st_size if self.length is None else self.offset + self.length
+        if end > stat.st_size:
+            raise ValueError(f"{self.path} is shorter than the referenced range, it changed since it was referenced")
+        data = _mapped(self.path, stat.st_mtime_ns, stat.st_size)[self.offset:end] if end > self.offset else b""
+        if self.sha1 is not None and hashlib.sha1(data).hexdigest() != self.sha1:
+            raise ValueError(f"{self.path} changed since it was referenced")
+        return data
+
+
 class File(BaseModel):
     """
     Class defining a file. Each file has a path, a language, a content, a list of identifiers and a package.
+    The content and identifiers can be kept out of memory, in which case `content_ref` and `identifiers_ref` point to
+    them (see `filestore.FileStore`) and they are read with `read_content` and `read_identifiers`.
     """
     path: str
     language: str
@@ -22,38 +84,786 @@ class File(BaseModel):
     identifiers: Optional[List[str]] = None
     package: Optional[str] = None
     annotation: Optional[Annotation] = None
+    content_ref: Optional[FileRef] = None
+    identifiers_ref: Optional[FileRef] = None
+
+    def read_content(self) -> Optional[str]:
+        """
+        Returns the content of the file, read from its reference if it is not in memory.
+        """
+        if self.content is None and self.content_ref is not None:
+            return self.content_ref.read().decode("utf-8")
+        return self.content
+
+    def read_identifiers(self) -> Optional[List[str]]:
+        """
+        Returns the identifiers of the file, read from their reference if they are not in memory.
+        """
+        if self.identifiers is None and self.identifiers_ref is not None:
+            data = self.identifiers_ref.read().decode("utf-8")
+            return data.split("\n") if data else []
+        return self.identifiers
+
+    def loaded(self) -> 'File':
+        """
+        Returns the file with its content and identifiers in memory instead of their references.
+        """
+        if self.content_ref is None and self.identifiers_ref is None:
+            return self
+        return self.model_copy(update={"content": self.read_content(), "identifiers": self.read_identifiers(),
+                                       "content_ref": None, "identifiers_ref": None})
+
+
+class Column(BaseModel):
+    """
+    Class defining a column of node or edge attributes, stored as a typed array.
+    Integers without missing values are stored as int64, other numbers as float64 (NaN when missing), booleans as int8
+    (-1 when missing) and anything else as int32 codes (-1 when missing) into a table of distinct string levels.
+    """
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    kind: str
+    values: NDArray
+    levels: Optional[List[str]] = None
+
+    @model_validator(mode='after')
+    def _coerce(self) -> 'Column':
+        dtype = {"int": np.int64, "float": np.float64, "bool": np.int8, "str": np.int32}[self.kind]
+        if self.values.dtype != dtype:
+            # Values loaded from JSON lose their dtype, and missing floats are serialized as null.
+            self.values = np.array(self.values.tolist(), dtype=dtype)
+        return self
+
+    @classmethod
+    def from_values(cls, values: List[Any]) -> 'Column':
+        present = [v for v in values if v is not None]
+        if present and all(isinstance(v, (bool, np.bool_)) for v in present):
+            return cls(kind="bool", values=np.array([-1 if v is None else int(v) for v in values], dtype=np.int8))
+        if present and all(isinstance(v, (int, float, np.number)) and not isinstance(v, (bool, np.bool_))
+                           for v in present):
+            if len(present) == len(values) and all(isinstance(v, (int, np.integer)) for v in present):
+                return cls(kind="int", values=np.array(values, dtype=np.int64))
+            return cls(kind="float", values=np.array([np.nan if v is None else v for v in values], dtype=np.float64))
+
+        levels: Dict[str, int] = {}
+        codes = np.array([-1 if v is None else levels.setdefault(str(v), len(levels)) for v in values],
+                         dtype=np.int32)
+        return cls(kind="str", values=codes, levels=list(levels))
+
+    def to_list(self) -> List[Any]:
+        """
+        Returns the values of the column as Python objects, None when missing.
+        """
+        values = self.values.tolist()
+        if self.kind == "bool":
+            return [None if v < 0 else bool(v) for v in values]
+        if self.kind == "float":
+            return [None if v != v else v for v in values]
+        if self.kind == "str":
+            return [None if c < 0 else self.levels[c] for c in values]
+        return values
+
+    def codes_of(self, values: Iterable[str]) -> np.ndarray:
+        """
+        Returns the codes of the given string values, ignoring the ones that never occur in the column.
+        """
+        index = {level: i for i, level in enumerate(self.levels or [])}
+        return np.array([index[v] for v in values if v in index], dtype=np.int32)
+
+    def take(self, indices: np.ndarray) -> 'Column':
+        return Column(kind=self.kind, values=self.values[indices], levels=self.levels)
 
 
 class GraphModel(BaseModel):
     """
-    Class defining a graph. Each graph has a list of nodes and a list of edges.
-    It is used to represent the dependency graph of a project in a format that can be serialized.
+    Class defining a graph. It is used to represent the dependency graph of a project in a compact format that can be
+    serialized: the node ids are stored once in a table, edges are two arrays of node indices and the attributes of
+    nodes and edges are stored as typed columns.
+    Graphs in the old format, with a list of nodes and a list of (u, v, data) edges, are converted when loaded.
     """
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
     nodes: List[Any]
-    edges: List[Tuple[Any, Any, Dict[str, Any]]]
+    src: NDArray
+    dst: NDArray
+    edge_attrs: Dict[str, Column] = {}
+    node_attrs: Dict[str, Column] = {}
+
+    # Conversions to other graph libraries and other views of the graph (see `view`), built once and shared.
+    _views: Dict[Tuple, Any] = PrivateAttr(default_factory=dict)
 
+    def __getstate__(self) -> Dict[Any, Any]:
+        # The conversions are rebuilt on demand instead of being sent to other processes.
+        state = super().__getstate__()
+        return {**state, "__pydantic_private__": {"_views": {}}}
+
+    @model_validator(mode='before')
     @classmethod
-    def from_graph(cls, graph: nx.Graph) -> 'GraphModel':
-        edges_with_data = [(u, v, data) for u, v, data in graph.edges(data=True)]
-        return cls(
-            nodes=list(graph.nodes),
-            edges=edges_with_data
-        )
-
-    def to_graph(self) -> nx.Graph:
-        graph = nx.Graph()
-        graph.add_nodes_from(self.nodes)
-        # Add edges along with their attributes
-        for u, v, data in self.edges:
-            graph.add_edge(u, v, **data)
-        return graph
+    def _from_edge_list(cls, data: Any) -> Any:
+        if isinstance(data, dict) and "edges" in data:
+            data = dict(data)
+            nodes = list(data["nodes"])
+            edges = data.pop("edges")
+            index = {node: i for i, node in enumerate(nodes)}
+            data["src"] = np.array([index[e[0]] for e in edges], dtype=np.int32)
+            data["dst"] = np.array([index[e[1]] for e in edges], dtype=np.int32)
+            keys = sorted({k for e in edges for k in e[2]})
+            data["edge_attrs"] = {k: Column.from_values([e[2].get(k) for e in edges]) for k in keys}
+        return data
+
+    @model_validator(mode='after')
+    def _coerce_indices(self) -> 'GraphModel':
+        self.src = self.src.astype(np.int32, copy=False)
+        self.dst = self.dst.astype(np.int32, copy=False)
+        return self
+
+    @classmethod
+    def from_graph(cls, graph: 'nx.Graph', node_keys: Optional[List[str]] = None,
+                   edge_keys: Optional[List[str]] = None) -> 'GraphModel':
+        """
+        Converts a networkx graph.
+
+        Args:
+            graph: The graph to convert.
+            node_keys: Node attributes to keep, all of them if None.
+            edge_keys: Edge attributes to keep, all of them if None.
+        """
+        nodes = list(graph.nodes)
+        index = {node: i for i, node in enumerate(nodes)}
+        num_edges = graph.number_of_edges()
+        src = np.fromiter((index[u] for u, _ in graph.edges()), dtype=np.int32, count=num_edges)
+        dst = np.fromiter((index[v] for _, v in graph.edges()), dtype=np.int32, count=num_edges)
+
+        if node_keys is None:
+            node_keys = sorted({k for _, data in graph.nodes(data=True) for k in data})
+        if edge_keys is None:
+            edge_keys = sorted({k for _, _, data in graph.edges(data=True) for k in data})
+        node_attrs = {k: Column.from_values([data.get(k) for _, data in graph.nodes(data=True)]) for k in node_keys}
+        edge_attrs = {k: Column.from_values([data.get(k) for _, _, data in graph.edges(data=True)])
+                      for k in edge_keys}
+
+        return cls(nodes=nodes, src=src, dst=dst, edge_attrs=edge_attrs, node_attrs=node_attrs)
+
+    @property
+    def num_nodes(self) -> int:
+        return len(self.nodes)
+
+    @property
+    def num_edges(self) -> int:
+        return len(self.src)
+
+    @property
+    def edges(self) -> List[Tuple[Any, Any, Dict[str, Any]]]:
+        """
+        The edges as a list of (u, v, data) tuples. Built on every access, prefer the arrays.
+        """
+        return list(self.iter_edges())
+
+    def iter_edges(self) -> Iterator[Tuple[Any, Any, Dict[str, Any]]]:
+        columns = {k: col.to_list() for k, col in self.edge_attrs.items()}
+        for i, (u, v) in enumerate(zip(self.src.tolist(), self.dst.tolist())):
+            yield self.nodes[u], self.nodes[v], {k: col[i] for k, col in columns.items() if col[i] is not None}
+
+    def fingerprint(self) -> str:
+        """
+        Returns a hash of the nodes, edges and attributes of the graph.
+        """
+        digest = hashlib.sha1()
+        digest.update("\0".join(map(str, self.nodes)).encode())
+        digest.update(self.src.tobytes())
+        digest.update(self.dst.tobytes())
+        for prefix, columns in [("edge", self.edge_attrs), ("node", self.node_attrs)]:
+            for name in sorted(columns):
+                digest.update(f"{prefix}:{columns[name].kind}:{name}:{columns[name].levels}".encode())
+                digest.update(np.ascontiguousarray(columns[name].values).tobytes())
+        return digest.hexdigest()
+
+    def weights(self, key: Optional[str] = None) -> np.ndarray:
+        """
+        Returns the weight of each edge, read from the given numeric attribute or 1 if None.
+        """
+        if key is None or key not in self.edge_attrs:
+            return np.ones(self.num_edges, dtype=np.float64)
+        return np.nan_to_num(self.edge_attrs[key].values.astype(np.float64, copy=False), nan=1.0)
+
+    def view(self, key: Tuple, factory: Callable[[], Any]) -> Any:
+        """
+        Returns a value derived from the graph (e.g. a conversion to another library or a reduction), built with
+        `factory` on the first call with the key and returned by later calls with the same key. The graph must not be
+        modified once views are built.
+
+        Args:
+            key: Identifies the view, its first element names the kind of view (e.g. `("igraph", directed, weight)`).
+            factory: Builds the view.
+        """
+        if key not in self._views:
+            self._views[key] = factory()
+        return self._views[key]
+
+    def to_graph(self) -> 'nx.Graph':
+        """
+        Returns the graph as an undirected networkx graph. The graph is built on the first call and the same instance
+        is returned afterwards, so it must not be modified.
+        """
+        import networkx as nx
+
+        def build() -> 'nx.Graph':
+            graph = nx.Graph()
+            graph.add_nodes_from(self.nodes)
+            # Add edges along with their attributes
+            graph.add_edges_from(self.iter_edges())
+            return graph
+
+        return self.view(("networkx",), build)
+
+    def to_scipy(self, weight: Optional[str] = None):
+        """
+        Returns the (directed) adjacency matrix of the graph as a scipy sparse COO array, built on the index arrays
+        without copying them.
+
+        Args:
+            weight: The numeric edge attribute used as value of the entries, 1 if None.
+        """
+        from scipy.sparse import coo_array
+
+        return coo_array((self.weights(weight), (self.src, self.dst)), shape=(self.num_nodes, self.num_nodes))
+
+    def to_igraph(self, directed: bool = False, weight: Optional[str] = None):
+        """
+        Returns the graph as an igraph Graph, with the node ids in the `name` vertex attribute.
+        As for `to_graph`, the same instance is returned by later calls with the same arguments.
+
+        Args:
+            directed: Whether the graph is directed.
+            weight: The numeric edge attribute copied to the `weight` edge attribute, none if None.
+        """
+        import igraph as ig
+
+        def build() -> 'ig.Graph':
+            graph = ig.Graph(n=self.num_nodes, edges=np.column_stack((self.src, self.dst)), directed=directed)
+            graph.vs["name"] = self.nodes
+            if weight is not None:
+                graph.es["weight"] = self.weights(weight)
+            return graph
+
+        return self.view(("igraph", directed, weight), build)
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        """
+        Returns the graph as a flat dictionary of arrays, e.g. to be saved with `np.savez`.
+        """
+        arrays = {"nodes": np.array([str(n) for n in self.nodes], dtype=str), "src": self.src, "dst": self.dst}
+        for prefix, columns in [("edge", self.edge_attrs), ("node", self.node_attrs)]:
+            for name, col in columns.items():
+                arrays[f"{prefix}:{col.kind}:{name}"] = col.values
+                if col.levels is not None:
+                    arrays[f"{prefix}-levels:{name}"] = np.array(col.levels, dtype=str)
+        return arrays
+
+    @classmethod
+    def from_arrays(cls, arrays) -> 'GraphModel':
+        """
+        Builds the graph from the arrays returned by `to_arrays` (or a loaded npz file).
+        """
+        columns = {"edge": {}, "node": {}}
+        for key in arrays:
+            prefix, _, rest = key.partition(":")
+            if prefix in columns:
+                kind, _, name = rest.partition(":")
+                levels = arrays[f"{prefix}-levels:{name}"].tolist() if kind == "str" else None
+                columns[prefix][name] = Column(kind=kind, values=arrays[key], levels=levels)
+
+        return cls(nodes=arrays["nodes"].tolist(), src=arrays["src"], dst=arrays["dst"],
+                   edge_attrs=columns["edge"], node_attrs=columns["node"])
+
+
+class Membership(BaseModel):
+    """
+    Class defining the communities found by an algorithm, as the community ids of each node of the dependency graph
+    (by node index).
+    Without overlaps, `labels` holds one community id per node (-1 if the node is in no community). With overlapping
+    communities it is stored in CSR layout: the communities of node i are labels[offsets[i]:offsets[i + 1]].
+    """
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    labels: NDArray
+    offsets: Optional[NDArray] = None
+
+    @model_validator(mode='after')
+    def _coerce(self) -> 'Membership':
+        self.labels = self.labels.astype(np.int32, copy=False)
+        if self.offsets is not None:
+            self.offsets = self.offsets.astype(np.int64, copy=False)
+        return self
+
+    @classmethod
+    def from_communities(cls, communities: Iterable[Iterable[Any]], nodes: List[Any]) -> 'Membership':
+        """
+        Builds the membership from a list of communities, each a list of node ids (or of node indices, as returned
+        by algorithms working on igraph graphs).
+
+        Args:
+            communities: The communities, e.g. the `communities` of a cdlib NodeClustering.
+            nodes: The node ids of the graph, in index order.
+        """
+        index = {node: i for i, node in enumerate(nodes)}
+        node_idx, com_idx = [], []
+        for c, community in enumerate(communities):
+            for member in community:
+                node_idx.append(index[member] if member in index else int(member))
+                com_idx.append(c)
+        return cls.from_pairs(np.array(node_idx, dtype=np.int64), np.array(com_idx, dtype=np.int32), len(nodes))
+
+    @classmethod
+    def from_pairs(cls, node_idx: np.ndarray, com_idx: np.ndarray, num_nodes: int) -> 'Membership':
+        """
+        Builds the membership from two aligned arrays of (distinct) node index and community id pairs.
+        """
+        node_idx = np.asarray(node_idx, dtype=np.int64)
+        com_idx = np.asarray(com_idx, dtype=np.int32)
+        counts = np.bincount(node_idx, minlength=num_nodes)
+        if counts.max(initial=0) <= 1:
+            labels = np.full(num_nodes, -1, dtype=np.int32)
+            labels[node_idx] = com_idx
+            return cls(labels=labels)
+
+        order = np.lexsort((com_idx, node_idx))
+        offsets = np.concatenate(([0], np.cumsum(counts)))
+        return cls(labels=com_idx[order], offsets=offsets)
+
+    @property
+    def overlapping(self) -> bool:
+        return self.offsets is not None
+
+    @property
+    def num_nodes(self) -> int:
+        return len(self.labels) if self.offsets is None else len(self.offsets) - 1
+
+    @property
+    def num_communities(self) -> int:
+        return int(self.labels.max(initial=-1)) + 1
+
+    def communities_of(self, node: int) -> np.ndarray:
+        """
+        Returns the ids of the communities the node with the given index belongs to.
+        """
+        if self.offsets is None:
+            return self.labels[node:node + 1][self.labels[node:node + 1] >= 0]
+        return self.labels[self.offsets[node]:self.offsets[node + 1]]
+
+    def pairs(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Returns the memberships as two aligned arrays of node indices and community ids.
+        """
+        if self.offsets is None:
+            nodes = np.flatnonzero(self.labels >= 0)
+            return nodes, self.labels[nodes]
+        return np.repeat(np.arange(self.num_nodes), np.diff(self.offsets)), self.labels
+
+    def sizes(self) -> np.ndarray:
+        """
+        Returns the number of nodes of each community.
+        """
+        return np.bincount(self.pairs()[1], minlength=self.num_communities)
+
+
+class LabelMatrix(BaseModel):
+    """
+    Class defining the label distributions of the files of a project as a single files x labels float32 matrix, so
+    that label resolution and aggregation are done with array operations. Row i holds the distribution of the file
+    `paths[i]`, rows of files that were not annotated are zero and flagged in `annotated`.
+    """
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    paths: List[str]
+    labels: List[str]
+    values: NDArray
+    annotated: NDArray
+
+    _index: Optional[Dict[str, int]] = PrivateAttr(default=None)
+
+    @model_validator(mode='after')
+    def _coerce(self) -> 'LabelMatrix':
+        self.values = self.values.astype(np.float32, copy=False).reshape(len(self.paths), len(self.labels))
+        self.annotated = self.annotated.astype(bool, copy=False)
+        return self
+
+    @classmethod
+    def from_files(cls, files: Dict[str, File], taxonomy: Optional[Dict[str, str]] = None) -> 'LabelMatrix':
+        """
+        Builds the matrix from the annotated files of a project.
+
+        Args:
+            files: The files of the project, by path.
+            taxonomy: The label of each column, keyed by column index as returned by AutoFL. Columns are named by
+                their index if None.
+        """
+        paths = list(files)
+        annotations = [files[path].annotation for path in paths]
+        annotated = np.array([a is not None and not a.unannotated and len(a.distribution) > 0 for a in annotations],
+                             dtype=bool)
+        width = max((len(a.distribution) for a, ok in zip(annotations, annotated) if ok), default=0)
+        if taxonomy:
+            width = max(width, max(int(k) for k in taxonomy) + 1)
+
+        values = np.zeros((len(paths), width), dtype=np.float32)
+        rows = np.flatnonzero(annotated)
+        if len(rows):
+            lengths = {len(annotations[i].distribution) for i in rows}
+            if lengths == {width}:
+                values[rows] = np.array([annotations[i].distribution for i in rows], dtype=np.float32)
+            else:
+                for i in rows:
+                    values[i, :len(annotations[i].distribution)] = annotations[i].distribution
+
+        labels = [(taxonomy or {}).get(str(i), str(i)) for i in range(width)]
+        return cls(paths=paths, labels=labels, values=values, annotated=annotated)
+
+    @property
+    def num_files(self) -> int:
+        return len(self.paths)
+
+    def rows_of(self, paths: Iterable[str]) -> np.ndarray:
+        """
+        Returns the row index of each path, -1 for the paths that are not in the matrix.
+        """
+        if self._index is None:
+            self._index = {path: i for i, path in enumerate(self.paths)}
+        index = self._index
+        return np.fromiter((index.get(path, -1) for path in paths), dtype=np.int64)
+
+    def argmax(self) -> np.ndarray:
+        """
+        Returns the column of the most probable label of each file, -1 for the files that were not annotated.
+        """
+        if not self.labels:
+            return np.full(self.num_files, -1, dtype=np.int64)
+        return np.where(self.annotated, self.values.argmax(axis=1), -1)
+
+    def top_labels(self) -> List[Optional[str]]:
+        """
+        Returns the most probable label of each file, None for the files that were not annotated.
+        """
+        names = np.array(self.labels + [None], dtype=object)
+        return names[self.argmax()].tolist()
+
+    def top_k(self, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Returns the columns of the k most probable labels of each file and their probabilities, in decreasing order.
+        """
+        k = min(k, len(self.labels))
+        columns = np.argpartition(-self.values, k - 1, axis=1)[:, :k] if k else np.empty((self.num_files, 0), int)
+        scores = np.take_along_axis(self.values, columns, axis=1)
+        order = np.argsort(-scores, axis=1, kind="stable")
+        return np.take_along_axis(columns, order, axis=1), np.take_along_axis(scores, order, axis=1)
+
+    def confidence(self) -> np.ndarray:
+        """
+        Returns the probability of the most probable label of each file, 0 for the files that were not annotated.
+        """
+        return self.values.max(axis=1, initial=0)
+
+    def entropy(self, normalized: bool = True) -> np.ndarray:
+        """
+        Returns the entropy of the distribution of each file, divided by its maximum (log of the number of labels)
+        if normalized. Files that were not annotated have the maximum entropy.
+        """
+        totals = self.values.sum(axis=1, keepdims=True)
+        p = np.divide(self.values, totals, out=np.zeros_like(self.values), where=totals > 0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            h = -np.sum(np.where(p > 0, p * np.log(p), 0), axis=1)
+        h_max = np.log(len(self.labels)) if len(self.labels) > 1 else 1.0
+        h = np.where(self.annotated, h, h_max)
+        return h / h_max if normalized else h
+
+    def confident(self, min_confidence: Optional[float] = None, max_entropy: Optional[float] = None) -> np.ndarray:
+        """
+        Returns the mask of the annotated files whose most probable label has at least the given probability and whose
+        normalized entropy is at most the given value.
+        """
+        mask = self.annotated.copy()
+        if min_confidence is not None:
+            mask &= self.confidence() >= min_confidence
+        if max_entropy is not None:
+            mask &= self.entropy() <= max_entropy
+        return mask
+
+    def aggregate(self, groups: np.ndarray, num_groups: Optional[int] = None,
+                  mask: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Sums the distributions of the files of each group, e.g. of each component.
+
+        Args:
+            groups: The group of each file (-1 for none), or two aligned arrays of rows and groups when files belong to
+                several groups.
+            num_groups: The number of groups, inferred from `groups` if None.
+            mask: The files to consider, e.g. the confident ones. Defaults to the annotated files.
+
+        Returns:
+            np.ndarray: The groups x labels matrix of the summed distributions.
+        """
+        from scipy.sparse import coo_array
+
+        if isinstance(groups, tuple):
+            rows, groups = (np.asarray(a) for a in groups)
+        else:
+            groups = np.asarray(groups)
+            rows = np.arange(len(groups))
+        if num_groups is None:
+            num_groups = int(groups.max(initial=-1)) + 1
+
+        mask = self.annotated if mask is None else mask
+        keep = (rows >= 0) & (groups >= 0)
+        keep[keep] &= mask[rows[keep]]
+        rows, groups = rows[keep], groups[keep]
+        membership = coo_array((np.ones(len(rows), dtype=np.float32), (groups, rows)),
+                               shape=(num_groups, self.num_files)).tocsr()
+        return np.asarray(membership @ self.values, dtype=np.float32)
+
+    def aggregate_communities(self, membership: 'Membership', node_paths: List[Optional[str]],
+                              mask: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Sums the distributions of the files of each community.
+
+        Args:
+            membership: The communities of the dependency graph.
+            node_paths: The file path of each node of the graph (by node index), None for nodes without file.
+            mask: The files to consider. Defaults to the annotated files.
+
+        Returns:
+            np.ndarray: The communities x labels matrix of the summed distributions.
+        """
+        nodes, communities = membership.pairs()
+        node_rows = self.rows_of(node_paths)
+        return self.aggregate((node_rows[nodes], communities), membership.num_communities, mask)
+
+
+class ComponentIndex(BaseModel):
+    """
+    Class defining the join between the files, the nodes of the dependency graph and the communities of a project,
+    built once so that component-level queries are array lookups instead of loops over the files and the nodes.
+    Files are rows in the order of the LabelMatrix, with their normalized path (see `normalize_path`), the code of their
+    most probable label and of their package. `node_file` holds the file row of each node of the graph (-1 for nodes
+    without file). For each community algorithm, `communities` is the node-level Membership of the project and
+    `components` the file-level one (each file is in the communities of its nodes, once), and `distributions` holds the
+    components x labels sums of the label distributions of the annotated files of each component.
+    """
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    paths: List[str]
+    labels: List[str]
+    file_label: NDArray
+    packages: List[str]
+    file_package: NDArray
+    node_file: NDArray
+    communities: Dict[str, Membership] = {}
+    components: Dict[str, Membership] = {}
+    distributions: Dict[str, NDArray] = {}
+
+    _index: Optional[Dict[str, int]] = PrivateAttr(default=None)
+    # Nodes of each file and files of each component, in CSR layout.
+    _file_nodes: Optional[Tuple[np.ndarray, np.ndarray]] = PrivateAttr(default=None)
+    _component_files: Dict[str, Tuple[np.ndarray, np.ndarray]] = PrivateAttr(default_factory=dict)
+
+    @model_validator(mode='after')
+    def _coerce(self) -> 'ComponentIndex':
+        self.file_label = self.file_label.astype(np.int32, copy=False)
+        self.file_package = self.file_package.astype(np.int32, copy=False)
+        self.node_file = self.node_file.astype(np.int64, copy=False)
+        self.distributions = {algorithm: values.astype(np.float32, copy=False).reshape(-1, len(self.labels))
+                              for algorithm, values in self.distributions.items()}
+        return self
+
+    @classmethod
+    def build(cls, project: 'Project', path_key: str = "filePathRelative") -> 'ComponentIndex':
+        """
+        Builds the index of an annotated project.
+
+        Args:
+            project: The project, with its files and, if available, its dependency graph and communities.
+            path_key: The node attribute of the graph holding the path of the file of each node.
+        """
+        matrix = project.label_matrix() or LabelMatrix(paths=[], labels=[], values=np.zeros((0, 0)),
+                                                       annotated=np.zeros(0, dtype=bool))
+        paths = [normalize_path(path) for path in matrix.paths]
+        index = {path: i for i, path in enumerate(paths)}
+
+        packages: Dict[str, int] = {}
+        file_package = np.array([-1 if project.files[path].package is None
+                                 else packages.setdefault(project.files[path].package, len(packages))
+                                 for path in matrix.paths], dtype=np.int32)
+
+        graph = project.dep_graph
+        node_file = np.full(graph.num_nodes if graph is not None else 0, -1, dtype=np.int64)
+        column = graph.node_attrs.get(path_key) if graph is not None else None
+        if column is not None and column.kind == "str":
+            # Paths are normalized once per distinct value, the trailing -1 is the row of the missing values.
+            level_rows = np.array([index.get(normalize_path(level), -1) for level in column.levels] + [-1],
+                                  dtype=np.int64)
+            node_file = level_rows[column.values]
+        elif column is not None:
+            node_file = np.array([-1 if v is None else index.get(normalize_path(str(v)), -1)
+                                  for v in column.to_list()], dtype=np.int64)
+
+        components, distributions = {}, {}
+        for algorithm, membership in (project.communities or {}).items():
+            nodes, communities = membership.pairs()
+            rows = node_file[nodes]
+            keep = rows >= 0
+            num_communities = membership.num_communities
+            pairs = np.unique(rows[keep] * max(num_communities, 1) + communities[keep])
+            rows, communities = pairs // max(num_communities, 1), pairs % max(num_communities, 1)
+            components[algorithm] = Membership.from_pairs(rows, communities, len(paths))
+            distributions[algorithm] = matrix.aggregate((rows, communities), num_communities)
+
+        return cls(paths=paths, labels=matrix.labels, file_label=matrix.argmax(), packages=list(packages),
+                   file_package=file_package, node_file=node_file, communities=dict(project.communities or {}),
+                   components=components, distributions=distributions)
+
+    @property
+    def num_files(self) -> int:
+        return len(self.paths)
+
+    @property
+    def algorithms(self) -> List[str]:
+        return list(self.components)
+
+    def num_components(self, algorithm: str) -> int:
+        return self.distributions[algorithm].shape[0]
+
+    def row_of(self, path: str) -> int:
+        """
+        Returns the row of the file with the given path (normalized first), -1 if the project has no such file.
+        """
+        if self._index is None:
+            self._index = {path: i for i, path in enumerate(self.paths)}
+        return self._index.get(normalize_path(path), -1)
+
+    def rows_of(self, paths: Iterable[str]) -> np.ndarray:
+        """
+        Returns the row of each path, -1 for the paths that are not files of the project.
+        """
+        return np.fromiter((self.row_of(path) for path in paths), dtype=np.int64)
+
+    def nodes_of(self, path: str) -> np.ndarray:
+        """
+        Returns the indices of the nodes of the file with the given path.
+        """
+        if self._file_nodes is None:
+            self._file_nodes = _group(self.node_file, self.num_files)
+        row = self.row_of(path)
+        if row < 0:
+            return np.empty(0, dtype=np.int64)
+        members, offsets = self._file_nodes
+        return members[offsets[row]:offsets[row + 1]]
+
+    def components_of(self, path: str, algorithm: str) -> np.ndarray:
+        """
+        Returns the ids of the communities of the algorithm the file with the given path belongs to.
+        """
+        row = self.row_of(path)
+        if row < 0:
+            return np.empty(0, dtype=np.int32)
+        return self.components[algorithm].communities_of(row)
+
+    def file_components(self, algorithm: str) -> np.ndarray:
+        """
+        Returns the community of each file (the first one for files in several communities), -1 if in none.
+        """
+        membership = self.components[algorithm]
+        if not membership.overlapping:
+            return membership.labels
+        counts = np.diff(membership.offsets)
+        first = np.full(self.num_files, -1, dtype=np.int32)
+        first[counts > 0] = membership.labels[membership.offsets[:-1][counts > 0]]
+        return first
+
+    def files_of(self, algorithm: str, component: int) -> np.ndarray:
+        """
+        Returns the rows of the files of a community of the algorithm.
+        """
+        if algorithm not in self._component_files:
+            rows, communities = self.components[algorithm].pairs()
+            order, offsets = _group(communities, self.num_components(algorithm))
+            self._component_files[algorithm] = (rows[order], offsets)
+        members, offsets = self._component_files[algorithm]
+        if not 0 <= component < len(offsets) - 1:
+            return np.empty(0, dtype=np.int64)
+        return members[offsets[component]:offsets[component + 1]]
+
+    def component_labels(self, algorithm: str) -> np.ndarray:
+        """
+        Returns the code of the most probable label of each community, from the summed distributions of its files,
+        -1 for the communities without annotated files.
+        """
+        values = self.distributions[algorithm]
+        if not self.labels:
+            return np.full(values.shape[0], -1, dtype=np.int64)
+        return np.where(values.sum(axis=1) > 0, values.argmax(axis=1), -1)
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        """
+        Returns the index as a flat dictionary of arrays, e.g. to be saved with `np.savez`.
+        """
+        arrays = {"paths": np.array(self.paths, dtype=str), "labels": np.array(self.labels, dtype=str),
+                  "file_label": self.file_label, "packages": np.array(self.packages, dtype=str),
+                  "file_package": self.file_package, "node_file": self.node_file}
+        for prefix, memberships in [("communities", self.communities), ("components", self.components)]:
+            for algorithm, membership in memberships.items():
+                arrays[f"{prefix}:{algorithm}:labels"] = membership.labels
+                if membership.offsets is not None:
+                    arrays[f"{prefix}:{algorithm}:offsets"] = membership.offsets
+        for algorithm, values in self.distributions.items():
+            arrays[f"distributions:{algorithm}"] = values
+        return arrays
+
+    @classmethod
+    def from_arrays(cls, arrays) -> 'ComponentIndex':
+        """
+        Builds the index from the arrays returned by `to_arrays` (or a loaded npz file).
+        """
+        memberships = {"communities": {}, "components": {}}
+        distributions = {}
+        for key in arrays:
+            prefix, _, rest = key.partition(":")
+            if prefix == "distributions":
+                distributions[rest] = arrays[key]
+            elif prefix in memberships and rest.endswith(":labels"):
+                algorithm = rest.rpartition(":")[0]
+                offsets = f"{prefix}:{algorithm}:offsets"
+                memberships[prefix][algorithm] = Membership(
+                    labels=arrays[key], offsets=arrays[offsets] if offsets in arrays else None)
+
+        return cls(paths=arrays["paths"].tolist(), labels=arrays["labels"].tolist(), file_label=arrays["file_label"],
+                   packages=arrays["packages"].tolist(), file_package=arrays["file_package"],
+                   node_file=arrays["node_file"], communities=memberships["communities"],
+                   components=memberships["components"], distributions=distributions)
+
+
+def _group(keys: np.ndarray, num_keys: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Groups the positions of an array of keys (-1 for none) by key: returns the positions sorted by key and the offsets
+    of each key in them.
+    """
+    present = np.flatnonzero(keys >= 0)
+    order = present[np.argsort(keys[present], kind="stable")]
+    offsets = np.concatenate(([0], np.cumsum(np.bincount(keys[present], minlength=num_keys))))
+    return order, offsets
+
+
+def _unchanged(cached: Optional[Tuple[Any, ...]], inputs: Tuple[Any, ...]) -> bool:
+    """
+    Returns whether a value derived from the project (cached with the objects it was built from) is still valid: the
+    inputs must be the very same objects. Holding them in the cache also keeps their ids from being reused.
+    """
+    return cached is not None and len(cached[0]) == len(inputs) and all(a is b for a, b in zip(cached[0], inputs))
 
 
 class Project(BaseModel):
     """
     Class defining a project. Each project has a name, a remote, a description, a number of stargazers, a language,
-    a flag indicating if it is archived, a date of last push, a list of files, a dependency graph and a list of
-    communities.
+    a flag indicating if it is archived, a date of last push, a list of files, a dependency graph, a list of
+    communities and the taxonomy of the labels of the files.
     """
     name: str
     remote: str
@@ -64,4 +874,57 @@ class Project(BaseModel):
     pushed_at: Optional[str] = None
     files: Optional[Dict[str, File]] = None
     dep_graph: Optional[GraphModel] = None
-    communities: Optional[Dict[str, Dict[str, int]]] = None
+    communities: Optional[Dict[str, Membership]] = None
+    taxonomy: Optional[Dict[str, str]] = None
+
+    # Label matrix of the files with the objects it was built from, built on first use and rebuilt when the files,
+    # their annotations or the taxonomy are replaced, also in place.
+    _labels: Optional[Tuple[Tuple[Any, ...], LabelMatrix]] = PrivateAttr(default=None)
+    # Component index with the objects it was built from, built on first use and rebuilt when the files, the graph or
+    # the communities are replaced, also in place.
+    _component_index: Optional[Tuple[Tuple[Any, ...], ComponentIndex, str]] = PrivateAttr(default=None)
+
+    def __getstate__(self) -> Dict[Any, Any]:
+        # The label matrix and the component index are rebuilt on demand instead of being sent to other processes.
+        state = super().__getstate__()
+        return {**state, "__pydantic_private__": {"_labels": None, "_component_index": None}}
+
+    def label_matrix(self) -> Optional[LabelMatrix]:
+        """
+        Returns the label distributions of the files as a LabelMatrix, or None if the project has no files.
+        """
+        if self.files is None:
+            return None
+        inputs = self._label_inputs()
+        if not _unchanged(self._labels, inputs):
+            self._labels = (inputs, LabelMatrix.from_files(self.files, self.taxonomy))
+        return self._labels[1]
+
+    def _label_inputs(self) -> Tuple[Any, ...]:
+        # Flat tuple of the objects the label matrix is built from. Checking it is linear in the number of files, but
+        # much cheaper than building the matrix.
+        inputs = [self.files, self.taxonomy]
+        for path, file in self.files.items():
+            inputs += [path, file, file.annotation]
+        for key, label in (self.taxonomy or {}).items():
+            inputs += [key, label]
+        return tuple(inputs)
+
+    def component_index(self, path_key: str = "filePathRelative") -> Optional[ComponentIndex]:
+        """
+        Returns the ComponentIndex of the project, or None if the project has no files.
+
+        Args:
+            path_key: The node attribute of the graph holding the path of the file of each node.
+        """
+        if self.files is None:
+            return None
+        graph = self.dep_graph
+        inputs = [*self._label_inputs(), *(file.package for file in self.files.values()), graph,
+                  graph.node_attrs.get(path_key) if graph is not None else None, self.communities]
+        for algorithm, membership in (self.communities or {}).items():
+            inputs += [algorithm, membership]
+        inputs = tuple(inputs)
+        if not _unchanged(self._component_index, inputs) or self._component_index[2] != path_key:
+            self._component_index = (inputs, ComponentIndex.build(self, path_key), path_key)
+        return self._component_index[1]
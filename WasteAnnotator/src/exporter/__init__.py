@@ -1,2 +1,18 @@
-from .interface import ProjectExporter
-from .json import JSONProjectExporter
\ No newline at end of file
+from typing import TYPE_CHECKING
+
+from lazy import attach
+
+__getattr__, __dir__, __all__ = attach(__name__, {
+    "ProjectExporter": ".interface",
+    "JSONProjectExporter": ".json",
+    "JSONLinesProjectExporter": ".jsonl",
+    "DatabaseProjectExporter": ".database",
+    "ComponentIndexExporter": ".index",
+})
+
+if TYPE_CHECKING:
+    from .interface import ProjectExporter
+    from .json import JSONProjectExporter
+    from .jsonl import JSONLinesProjectExporter
+    from .database import DatabaseProjectExporter
+    from .index import ComponentIndexExporter
@@ -0,0 +1,217 @@
+import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+import numpy as np
+import sqlalchemy as sa
+from loguru import logger
+
+from entities import Project
+from exporter.interface import ProjectExporter
+
+metadata = sa.MetaData()
+
+projects = sa.Table(
+    "projects", metadata,
+    sa.Column("id", sa.Integer, primary_key=True, autoincrement=True),
+    sa.Column("name", sa.String, nullable=False, unique=True),
+    sa.Column("remote", sa.String, nullable=False),
+    sa.Column("description", sa.Text),
+    sa.Column("stargazers_count", sa.Integer),
+    sa.Column("language", sa.String),
+    sa.Column("archived", sa.Boolean),
+    sa.Column("pushed_at", sa.String),
+    sa.Column("taxonomy", sa.JSON),
+    sa.Column("exported_at", sa.DateTime, nullable=False),
+)
+
+files = sa.Table(
+    "files", metadata,
+    sa.Column("project_id", sa.Integer, sa.ForeignKey("projects.id", ondelete="CASCADE"), primary_key=True),
+    sa.Column("path", sa.String, primary_key=True),
+    sa.Column("language", sa.String),
+    sa.Column("package", sa.String),
+    sa.Column("label", sa.String),
+    sa.Column("confidence", sa.Float),
+    sa.Column("distribution", sa.JSON),
+    sa.Column("content", sa.Text),
+    sa.Column("identifiers", sa.JSON),
+)
+
+nodes = sa.Table(
+    "nodes", metadata,
+    sa.Column("project_id", sa.Integer, sa.ForeignKey("projects.id", ondelete="CASCADE"), primary_key=True),
+    sa.Column("idx", sa.Integer, primary_key=True),
+    sa.Column("node", sa.String, nullable=False),
+    sa.Column("attrs", sa.JSON),
+)
+
+edges = sa.Table(
+    "edges", metadata,
+    sa.Column("project_id", sa.Integer, sa.ForeignKey("projects.id", ondelete="CASCADE"), nullable=False),
+    sa.Column("src", sa.Integer, nullable=False),
+    sa.Column("dst", sa.Integer, nullable=False),
+    sa.Column("attrs", sa.JSON),
+    sa.Index("edges_project", "project_id"),
+)
+
+memberships = sa.Table(
+    "memberships", metadata,
+    sa.Column("project_id", sa.Integer, sa.ForeignKey("projects.id", ondelete="CASCADE"), primary_key=True),
+    sa.Column("algorithm", sa.String, primary_key=True),
+    sa.Column("node_idx", sa.Integer, primary_key=True),
+    sa.Column("community", sa.Integer, primary_key=True),
+    sa.Index("memberships_community", "project_id", "algorithm", "community"),
+)
+
+
+def _batches(rows: Iterable[Dict[str, Any]], size: int) -> Iterator[List[Dict[str, Any]]]:
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class DatabaseProjectExporter(ProjectExporter):
+    """
+    The DatabaseProjectExporter exports annotated projects to a relational database (PostgreSQL, or SQLite as a local
+    stand-in), so that files, dependencies and components can be queried across projects without loading the exported
+    files. The schema is defined in `docker/sql/01_pipeline.sql` and mirrored by the tables of this module.
+    Exports are idempotent: the project is upserted by name and its files, nodes, edges and memberships are replaced, all
+    in one transaction. Rows are inserted in batches (with COPY on PostgreSQL through psycopg 3) over a pool of
+    connections.
+    """
+    # Attributes left out of the fingerprint of the export stage, as they do not change the rows exported.
+    fingerprint_exclude = frozenset({"batch_size", "pool_size", "create_tables"})
+
+    def __init__(self, url: str, batch_size: int = 10_000, include_content: bool = False, pool_size: int = 5,
+                 create_tables: bool = True):
+        """
+        Initializes the DatabaseProjectExporter instance.
+        Args:
+            url: The SQLAlchemy URL of the database, e.g. `postgresql+psycopg://user:pw@host/db` or `sqlite:///x.db`.
+            batch_size: Number of rows inserted per statement.
+            include_content: Store the content and identifiers of the files, read from the file store if they were
+                offloaded.
+            pool_size: Number of connections kept open.
+            create_tables: Create the missing tables when the exporter connects.
+        """
+        super().__init__()
+        self.url = url
+        self.batch_size = batch_size
+        self.include_content = include_content
+        self.pool_size = pool_size
+        self.create_tables = create_tables
+        self._engine: Optional[sa.Engine] = None
+
+    def __getstate__(self):
+        # Engines and their connections cannot be sent to worker processes, each process creates its own.
+        return {**self.__dict__, "_engine": None}
+
+    @property
+    def engine(self) -> sa.Engine:
+        if self._engine is None:
+            if self.url.startswith("sqlite"):
+                engine = sa.create_engine(self.url)
+                sa.event.listen(engine, "connect", lambda conn, _: conn.execute("PRAGMA foreign_keys=ON"))
+            else:
+                engine = sa.create_engine(self.url, pool_size=self.pool_size, pool_pre_ping=True)
+            if self.create_tables:
+                metadata.create_all(engine)
+            self._engine = engine
+        return self._engine
+
+    def export(self, project: Project):
+        logger.info(f"Exporting project `{project.name}` to {self.engine.url.render_as_string(hide_password=True)}")
+        with self.engine.begin() as conn:
+            project_id = self._upsert_project(conn, project)
+            for table in [files, nodes, edges, memberships]:
+                conn.execute(table.delete().where(table.c.project_id == project_id))
+
+            if project.files:
+                self._insert(conn, files, self._file_rows(project_id, project))
+            if project.dep_graph is not None:
+                self._insert(conn, nodes, self._node_rows(project_id, project))
+                self._insert(conn, edges, self._edge_rows(project_id, project))
+            for algorithm, membership in (project.communities or {}).items():
+                node_idx, community = membership.pairs()
+                rows = ({"project_id": project_id, "algorithm": algorithm, "node_idx": n, "community": c}
+                        for n, c in zip(node_idx.tolist(), community.tolist()))
+                self._insert(conn, memberships, rows)
+
+    def _upsert_project(self, conn: sa.Connection, project: Project) -> int:
+        row = project.model_dump(include={c.name for c in projects.columns})
+        row["exported_at"] = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+        stmt = self._dialect_insert(projects).values(row)
+        stmt = stmt.on_conflict_do_update(index_elements=["name"],
+                                          set_={k: stmt.excluded[k] for k in row if k != "name"})
+        return conn.execute(stmt.returning(projects.c.id)).scalar_one()
+
+    def _dialect_insert(self, table: sa.Table):
+        if self.engine.dialect.name == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert
+        elif self.engine.dialect.name == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            raise ValueError(f"Upserts are not supported on {self.engine.dialect.name}")
+        return insert(table)
+
+    def _insert(self, conn: sa.Connection, table: sa.Table, rows: Iterable[Dict[str, Any]]):
+        """
+        Inserts the rows in batches, or streams them with COPY on PostgreSQL through psycopg 3.
+        """
+        if conn.dialect.name == "postgresql" and conn.dialect.driver == "psycopg":
+            self._copy(conn, table, rows)
+            return
+
+        for batch in _batches(rows, self.batch_size):
+            conn.execute(table.insert(), batch)
+
+    @staticmethod
+    def _copy(conn: sa.Connection, table: sa.Table, rows: Iterable[Dict[str, Any]]):
+        from psycopg.types.json import Json
+
+        columns = [c.name for c in table.columns]
+        json_columns = {c.name for c in table.columns if isinstance(c.type, sa.JSON)}
+        cursor = conn.connection.driver_connection.cursor()
+        with cursor.copy(f"COPY {table.name} ({', '.join(columns)}) FROM STDIN") as copy:
+            for row in rows:
+                copy.write_row([Json(row.get(c)) if c in json_columns and row.get(c) is not None else row.get(c)
+                                for c in columns])
+
+    def _file_rows(self, project_id: int, project: Project) -> Iterator[Dict[str, Any]]:
+        matrix = project.label_matrix()
+        top = matrix.top_labels()
+        confidence = np.where(matrix.annotated, matrix.confidence(), np.nan).tolist()
+        for i, path in enumerate(matrix.paths):
+            file = project.files[path]
+            yield {
+                "project_id": project_id,
+                "path": path,
+                "language": file.language,
+                "package": file.package,
+                "label": top[i],
+                "confidence": None if confidence[i] != confidence[i] else confidence[i],
+                "distribution": file.annotation.distribution if file.annotation else None,
+                "content": file.read_content() if self.include_content else None,
+                "identifiers": file.read_identifiers() if self.include_content else None,
+            }
+
+    @staticmethod
+    def _node_rows(project_id: int, project: Project) -> Iterator[Dict[str, Any]]:
+        graph = project.dep_graph
+        columns = {name: col.to_list() for name, col in graph.node_attrs.items()}
+        for i, node in enumerate(graph.nodes):
+            yield {"project_id": project_id, "idx": i, "node": str(node),
+                   "attrs": {name: values[i] for name, values in columns.items() if values[i] is not None} or None}
+
+    @staticmethod
+    def _edge_rows(project_id: int, project: Project) -> Iterator[Dict[str, Any]]:
+        graph = project.dep_graph
+        columns = {name: col.to_list() for name, col in graph.edge_attrs.items()}
+        for i, (u, v) in enumerate(zip(graph.src.tolist(), graph.dst.tolist())):
+            yield {"project_id": project_id, "src": u, "dst": v,
+                   "attrs": {name: values[i] for name, values in columns.items() if values[i] is not None} or None}
@@ -0,0 +1,34 @@
+from pathlib import Path
+
+import numpy as np
+
+from entities import Project
+from exporter.interface import ProjectExporter
+
+
+class ComponentIndexExporter(ProjectExporter):
+    """
+    The ComponentIndexExporter class writes the ComponentIndex of annotated projects next to their JSON export, as a
+    `<name>.index.npz` file of arrays, so that component-level queries do not have to join the files, the nodes and the
+    communities again. Load it with `ComponentIndex.from_arrays(np.load(path))`.
+    """
+    def __init__(self, out_dir, path_key: str = "filePathRelative", compressed: bool = True):
+        """
+        Initializes the ComponentIndexExporter instance.
+        Args:
+            out_dir: Output directory to save the index file.
+            path_key: The node attribute of the graph holding the path of the file of each node.
+            compressed: Compress the arrays of the file.
+        """
+        super().__init__()
+        self.file_extension = "index.npz"
+        self.out_dir = Path(out_dir)
+        self.path_key = path_key
+        self.compressed = compressed
+
+    def export(self, project: Project):
+        index = project.component_index(self.path_key)
+        if index is None:
+            return
+        save = np.savez_compressed if self.compressed else np.savez
+        save(self.out_dir / f'{project.name}.{self.file_extension}', **index.to_arrays())
@@ -9,12 +9,14 @@ class JSONProjectExporter(ProjectExporter):
     The JSONProjectExporter class is responsible for exporting annotated projects to a JSON format.
     Uses the pydantic model_dump_json method to dump the project to a JSON string.
     """
-    def __init__(self, out_dir, exclude_keys=None):
+    def __init__(self, out_dir, exclude_keys=None, embed_contents: bool = True):
         """
         Initializes the JSONProjectExporter instance.
         Args:
             out_dir: Output directory to save the JSON file.
             exclude_keys: List of keys to exclude from the JSON dump.
+            embed_contents: Write the contents and identifiers of the files offloaded to a file store, instead of their
+                references.
         """
         super().__init__()
         self.file_extension = "json"
@@ -22,8 +24,10 @@ class JSONProjectExporter(ProjectExporter):
         if exclude_keys is None:
             exclude_keys = {}
         self.exclude_keys = exclude_keys
-
+        self.embed_contents = embed_contents
 
     def export(self, project: Project):
+        if self.embed_contents and project.files:
+            project = project.model_copy(update={"files": {path: file.loaded() for path, file in project.files.items()}})
         with open(self.out_dir / f'{project.name}.{self.file_extension}', 'w') as file:
             file.write(project.model_dump_json(exclude=self.exclude_keys))
\ No newline at end of file
@@ -0,0 +1,220 @@
+import gzip
+import json
+import os
+import tempfile
+from pathlib import Path
+from typing import IO, Any, Dict, Iterable, Iterator, List, Optional
+
+import numpy as np
+
+from entities import Column, File, GraphModel, Membership, Project
+from exporter.interface import ProjectExporter
+
+# Bumped whenever the layout of the records changes.
+FORMAT = 1
+
+SUFFIXES = {None: "", "gzip": ".gz", "zstd": ".zst"}
+
+
+def open_text(path: Path, mode: str, compression: Optional[str] = None, level: Optional[int] = None) -> IO[str]:
+    """
+    Opens a text stream on a file, compressed with gzip or zstd (which requires the optional zstandard package).
+
+    Args:
+        path: The path of the file.
+        mode: "r" or "w".
+        compression: None, "gzip" or "zstd".
+        level: The compression level. Defaults to the fast levels (1 for gzip, 3 for zstd), as the exports are
+            written once per run.
+    """
+    if compression is None:
+        return open(path, mode + "t", encoding="utf-8")
+    if compression == "gzip":
+        return gzip.open(path, mode + "t", compresslevel=level if level is not None else 1, encoding="utf-8")
+    if compression == "zstd":
+        try:
+            import zstandard
+        except ImportError:
+            raise ValueError("zstd compression requires the zstandard package") from None
+        cctx = zstandard.ZstdCompressor(level=level if level is not None else 3) if mode == "w" else None
+        return zstandard.open(path, mode + "t", cctx=cctx, encoding="utf-8")
+    raise ValueError(f"Unknown compression {compression}")
+
+
+def compression_of(path: Path) -> Optional[str]:
+    suffix = Path(path).suffix
+    return next((c for c, s in SUFFIXES.items() if s and s == suffix), None)
+
+
+def _values(column: Column, rows: slice) -> List[Any]:
+    values = column.values[rows]
+    if column.kind == "float":
+        # NaN is not valid JSON, missing floats are written as null.
+        return [None if v != v else v for v in values.tolist()]
+    return values.tolist()
+
+
+class JSONLinesProjectExporter(ProjectExporter):
+    """
+    The JSONLinesProjectExporter exports annotated projects as (compressed) JSON Lines, writing the project
+    incrementally instead of building the whole document in memory:
+    a `project` record with the metadata, one `file` record per file, a `graph` record with the node table and the
+    attribute columns, `edges` records with chunks of the edge arrays and one `communities` record per algorithm with
+    its membership arrays. Graph and communities are stored column-wise, so they can be loaded as arrays with
+    `load_project`.
+    """
+    # Attributes left out of the fingerprint of the export stage, as they do not change the records exported.
+    fingerprint_exclude = frozenset({"level"})
+
+    def __init__(self, out_dir, compression: Optional[str] = "gzip", level: Optional[int] = None,
+                 exclude_keys: Optional[Iterable[str]] = None, exclude_file_keys: Optional[Iterable[str]] = None,
+                 edge_chunk: int = 100_000, embed_contents: bool = True):
+        """
+        Initializes the JSONLinesProjectExporter instance.
+        Args:
+            out_dir: Output directory to save the files.
+            compression: None, "gzip" or "zstd".
+            level: The compression level, the fast level of the codec if None.
+            exclude_keys: Fields of the project to leave out, e.g. `dep_graph`.
+            exclude_file_keys: Fields of the files to leave out, e.g. `content`.
+            edge_chunk: Number of edges per `edges` record.
+            embed_contents: Write the contents and identifiers of the files offloaded to a file store, instead of their
+                references. They are read one file at a time.
+        """
+        super().__init__()
+        if compression not in SUFFIXES:
+            raise ValueError(f"Unknown compression {compression}")
+        self.file_extension = "jsonl" + SUFFIXES[compression]
+        self.out_dir = Path(out_dir)
+        self.compression = compression
+        self.level = level
+        self.exclude_keys = set(exclude_keys or [])
+        self.exclude_file_keys = set(exclude_file_keys or [])
+        self.edge_chunk = edge_chunk
+        self.embed_contents = embed_contents
+
+    def path(self, name: str) -> Path:
+        return self.out_dir / f'{name}.{self.file_extension}'
+
+    def export(self, project: Project):
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        path = self.path(project.name)
+        # Written to a temporary file first, so that readers never see a partial export.
+        fd, tmp = tempfile.mkstemp(dir=self.out_dir, suffix=".tmp")
+        os.close(fd)
+        try:
+            with open_text(Path(tmp), "w", self.compression, self.level) as out:
+                for record in self.records(project):
+                    out.write(record)
+                    out.write("\n")
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+    def records(self, project: Project) -> Iterator[str]:
+        """
+        Yields the JSON Lines records of the project, one at a time.
+        """
+        header = project.model_dump(mode="json",
+                                    exclude={"files", "dep_graph", "communities", *self.exclude_keys})
+        yield json.dumps({"record": "project", "format": FORMAT, **header})
+
+        if project.files and "files" not in self.exclude_keys:
+            prefix = '{"record":"file",'
+            for file in project.files.values():
+                if self.embed_contents:
+                    file = file.loaded()
+                yield prefix + file.model_dump_json(exclude=self.exclude_file_keys, exclude_none=True)[1:]
+
+        graph = project.dep_graph
+        if graph is not None and "dep_graph" not in self.exclude_keys:
+            yield json.dumps({
+                "record": "graph",
+                "nodes": graph.nodes,
+                "num_edges": graph.num_edges,
+                "node_attrs": {name: col.model_dump(mode="json") for name, col in graph.node_attrs.items()},
+                "edge_attrs": {name: {"kind": col.kind, "levels": col.levels}
+                               for name, col in graph.edge_attrs.items()},
+            }, default=str)
+            for start in range(0, graph.num_edges, self.edge_chunk):
+                rows = slice(start, start + self.edge_chunk)
+                yield json.dumps({
+                    "record": "edges",
+                    "src": graph.src[rows].tolist(),
+                    "dst": graph.dst[rows].tolist(),
+                    "attrs": {name: _values(col, rows) for name, col in graph.edge_attrs.items()},
+                })
+
+        if project.communities and "communities" not in self.exclude_keys:
+            for algorithm, membership in project.communities.items():
+                yield json.dumps({"record": "communities", "algorithm": algorithm,
+                                  **membership.model_dump(mode="json")})
+
+
+def iter_records(path) -> Iterator[Dict[str, Any]]:
+    """
+    Yields the records of a file written by the JSONLinesProjectExporter, decompressing it on the fly.
+    """
+    path = Path(path)
+    with open_text(path, "r", compression_of(path)) as stream:
+        for line in stream:
+            if line.strip():
+                yield json.loads(line)
+
+
+def iter_files(path) -> Iterator[File]:
+    """
+    Yields the files of an exported project, without loading the rest of it.
+    """
+    for record in iter_records(path):
+        if record.pop("record") == "file":
+            yield File(**record)
+
+
+def load_project(path) -> Project:
+    """
+    Loads a project written by the JSONLinesProjectExporter.
+    """
+    project: Dict[str, Any] = {}
+    files: Dict[str, File] = {}
+    communities: Dict[str, Membership] = {}
+    graph: Optional[Dict[str, Any]] = None
+    src: List[np.ndarray] = []
+    dst: List[np.ndarray] = []
+    edge_values: Dict[str, List[Any]] = {}
+
+    for record in iter_records(path):
+        kind = record.pop("record")
+        if kind == "project":
+            if record.pop("format") > FORMAT:
+                raise ValueError(f"{path} was written by a newer version of the exporter")
+            project = record
+        elif kind == "file":
+            files[record["path"]] = File(**record)
+        elif kind == "graph":
+            graph = record
+            edge_values = {name: [] for name in record["edge_attrs"]}
+        elif kind == "edges":
+            src.append(np.asarray(record["src"], dtype=np.int32))
+            dst.append(np.asarray(record["dst"], dtype=np.int32))
+            for name, values in record["attrs"].items():
+                edge_values[name].extend(values)
+        elif kind == "communities":
+            communities[record.pop("algorithm")] = Membership(**record)
+
+    if files:
+        project["files"] = files
+    if communities:
+        project["communities"] = communities
+    if graph is not None:
+        empty = np.empty(0, dtype=np.int32)
+        project["dep_graph"] = GraphModel(
+            nodes=graph["nodes"],
+            src=np.concatenate(src) if src else empty,
+            dst=np.concatenate(dst) if dst else empty,
+            node_attrs={name: Column(**col) for name, col in graph["node_attrs"].items()},
+            edge_attrs={name: Column(kind=col["kind"], levels=col["levels"], values=edge_values[name])
+                        for name, col in graph["edge_attrs"].items()},
+        )
+    return Project(**project)
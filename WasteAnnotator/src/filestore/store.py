@@ -0,0 +1,105 @@
+import hashlib
+import os
+import tempfile
+from pathlib import Path
+from typing import Dict, Optional
+
+from loguru import logger
+
+from entities import File, FileRef
+
+
+class FileStore:
+    """
+    Keeps the contents and identifiers of the files of the projects out of memory, so that a project only holds
+    references to them through the stages of the pipeline. A content identical to the file checked out in the
+    repository directory (e.g. by Arcan) is referenced there, the other contents and the identifiers are packed in one
+    blob per project. Blobs are named by the hash of their content and never rewritten, so the references saved in the
+    state store or in the exports stay valid across runs. References to the checkout keep the length and hash of the
+    content, so reading a file that changed since (e.g. pulled again) raises instead of returning the new content.
+    Empty contents and identifiers stay in the files, there is nothing to offload.
+    """
+
+    def __init__(self, directory: str, repository_path: Optional[str] = None):
+        """
+        Initializes the FileStore instance.
+
+        Args:
+            directory: The directory containing the packed blobs.
+            repository_path: The directory containing the local checkouts of the projects, contents are always packed
+                if None.
+        """
+        self.directory = Path(directory)
+        self.repository_path = Path(repository_path) if repository_path else None
+
+    def offload(self, name: str, files: Dict[str, File]) -> Dict[str, File]:
+        """
+        Returns the files of a project with references in place of their contents and identifiers. Files that are
+        already offloaded are returned as they are.
+
+        Args:
+            name: The name of the project.
+            files: The files of the project, by path.
+        """
+        self.directory.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        digest = hashlib.sha1()
+        offset = 0
+        # Ranges of the packed blob, resolved to its final path once it is written.
+        packed: Dict[str, Dict[str, FileRef]] = {}
+        offloaded: Dict[str, File] = {}
+        referenced = 0
+        try:
+            with os.fdopen(fd, "wb") as blob:
+                def pack(data: bytes) -> FileRef:
+                    nonlocal offset
+                    blob.write(data)
+                    digest.update(data)
+                    offset += len(data)
+                    return FileRef(path="", offset=offset - len(data), length=len(data))
+
+                for path, file in files.items():
+                    refs: Dict[str, FileRef] = {}
+                    if file.content:
+                        data = file.content.encode("utf-8")
+                        checkout = self._checkout(name, path, data)
+                        if checkout is not None:
+                            referenced += 1
+                            file = file.model_copy(update={"content": None, "content_ref": checkout})
+                        else:
+                            refs["content"] = pack(data)
+                    data = "\n".join(file.identifiers or []).encode("utf-8")
+                    if data:
+                        refs["identifiers"] = pack(data)
+                    packed[path] = refs
+                    offloaded[path] = file
+
+            blob_path = self.directory / f"{name.replace(os.sep, '_')}-{digest.hexdigest()[:16]}.blob"
+            if offset and not blob_path.exists():
+                os.replace(tmp, blob_path)
+        finally:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+
+        for path, refs in packed.items():
+            if refs:
+                update = {f"{field}_ref": ref.model_copy(update={"path": str(blob_path)}) for field, ref in refs.items()}
+                offloaded[path] = offloaded[path].model_copy(update={**{field: None for field in refs}, **update})
+
+        logger.info(f"Offloaded the files of {name}: {referenced} referenced in the repository, {offset} bytes packed"
+                    + (f" in {blob_path.name}" if offset else ""))
+        return offloaded
+
+    def _checkout(self, name: str, path: str, data: bytes) -> Optional[FileRef]:
+        """
+        Returns a reference to the checked-out file if it has the given content, None otherwise.
+        """
+        if self.repository_path is None:
+            return None
+        checkout = self.repository_path / name / path
+        try:
+            if checkout.stat().st_size != len(data) or checkout.read_bytes() != data:
+                return None
+        except OSError:
+            return None
+        return FileRef(path=str(checkout.resolve()), length=len(data), sha1=hashlib.sha1(data).hexdigest())
@@ -1,2 +1,12 @@
-from .interface import ProjectFinder
-from .github import GitHubFinder
\ No newline at end of file
+from typing import TYPE_CHECKING
+
+from lazy import attach
+
+__getattr__, __dir__, __all__ = attach(__name__, {
+    "ProjectFinder": ".interface",
+    "GitHubFinder": ".github",
+})
+
+if TYPE_CHECKING:
+    from .interface import ProjectFinder
+    from .github import GitHubFinder
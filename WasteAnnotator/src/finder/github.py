@@ -1,22 +1,28 @@
-from typing import List, Dict, Tuple
+import os
+from datetime import date, timedelta
+from typing import Dict, Iterator, List, Optional, Tuple
 
-import requests
 from loguru import logger
 
 from entities.entities import Project
+from httpclient import HTTPClient
 
+# The Search API never returns more than this many results for a single query.
+SEARCH_RESULTS_CAP = 1000
 
-def print_structure(repo_url: str):
+
+def print_structure(repo_url: str, client: Optional[HTTPClient] = None):
     """
     Print the structure of a GitHub repository.
 
     Args:
         repo_url (str): The URL of the GitHub repository.
+        client (HTTPClient, optional): The client used for the request.
     """
     # Parse the GitHub repository URL to extract owner and repo name
     _, _, _, owner, repo_name = repo_url.rstrip('/').split('/')
     contents_url = f"https://api.github.com/repos/{owner}/{repo_name}"
-    response = requests.get(contents_url)
+    response = (client or HTTPClient()).get(contents_url)
 
     if response.status_code == 200:
         contents = response.json()
@@ -34,7 +40,8 @@ class GitHubFinder(object):
     """
 
     def __init__(self, min_stars: int, last_pushed_date: str, language: str = "java",
-                 only_archived: bool = True):
+                 only_archived: bool = True, first_pushed_date: str = "2008-01-01", per_page: int = 100,
+                 token: Optional[str] = None, client: Optional[HTTPClient] = None):
         """
         Initializes the GitHubFinder instance.
 
@@ -42,65 +49,125 @@ class GitHubFinder(object):
             min_stars (int): The minimum number of stars a repository should have to be considered.
             last_pushed_date (str): The date until which repositories are considered for abandonment.
             language (str, optional): The programming language of the repositories (default is "java").
-            exclude_archived (bool, optional): Flag to exclude archived repositories (default is False).
+            only_archived (bool, optional): Flag to only consider archived repositories (default is True).
+            first_pushed_date (str, optional): The oldest push date searched (default is "2008-01-01").
+            per_page (int, optional): The number of results requested per page, at most 100 (default is 100).
+            token (str, optional): GitHub token used to authenticate, defaults to the GITHUB_TOKEN variable.
+            client (HTTPClient, optional): The client used for the requests. Defaults to a client limited to the
+                30 requests per minute allowed for authenticated searches.
         """
         self.base_url = "https://api.github.com/search/repositories"
         self.min_stars = min_stars
-        self.last_pushed_date = last_pushed_date
+        self.last_pushed_date = str(last_pushed_date)
+        self.first_pushed_date = str(first_pushed_date)
         self.language = language
         self.only_archived = only_archived
+        self.per_page = min(per_page, 100)
+        self.token = token or os.environ.get("GITHUB_TOKEN")
+        self.client = client or HTTPClient(rate=0.5, burst=10)
 
         logger.info(f"Initialized GitHubFinder")
 
-    def find_projects(self, amount: int = 10) -> List[Project]:
+    def find_projects(self, amount: Optional[int] = 10) -> Iterator[Project]:
+        """
+        Lazily retrieves abandoned projects, yielding them as soon as each page of results arrives.
+        The searched push dates are split in ranges small enough to stay under the 1000 results cap of the Search API.
+
+        Args:
+            amount (int, optional): The number of abandoned projects to retrieve, all of them if None (default is 10).
+
+        Returns:
+            Iterator[Project]: The abandoned projects.
         """
-        Retrieves abandoned projects.
+        if amount is not None and amount <= 0:
+            return
+
+        found = 0
+        start = date.fromisoformat(self.first_pushed_date)
+        end = date.fromisoformat(self.last_pushed_date) - timedelta(days=1)
+        for repo in self._search_range(start, end):
+            yield Project(name=repo["full_name"].replace("/", "|"), remote=repo["html_url"],
+                          description=repo["description"],
+                          stargazers_count=repo["stargazers_count"], language=repo["language"],
+                          archived=repo["archived"], pushed_at=repo["pushed_at"])
+            found += 1
+            if amount is not None and found >= amount:
+                return
+
+        logger.info(f"Found {found} projects on GitHub, {self.client.stats}")
+
+    def _search_range(self, start: date, end: date) -> Iterator[Dict]:
+        """
+        Yields the repositories pushed between start and end (both included), splitting the range in two halves
+        when the search matches more results than the API returns.
 
         Args:
-            amount (int): The number of abandoned projects to retrieve (default is 10).
+            start (date): The first push date of the range.
+            end (date): The last push date of the range.
 
         Returns:
-            List[Dict]: A list of dictionaries representing abandoned projects.
+            Iterator[Dict]: The repositories found, as returned by the API.
+        """
+        if start > end:
+            return
+
+        page = 1
+        total, items = self._search_page(start, end, page)
+        if total > SEARCH_RESULTS_CAP and start < end:
+            middle = start + (end - start) // 2
+            logger.debug(f"{total} results pushed between {start} and {end}, splitting the range")
+            yield from self._search_range(start, middle)
+            yield from self._search_range(middle + timedelta(days=1), end)
+            return
+
+        yield from items
+        while len(items) == self.per_page and page * self.per_page < min(total, SEARCH_RESULTS_CAP):
+            page += 1
+            total, items = self._search_page(start, end, page)
+            yield from items
+
+    def _search_page(self, start: date, end: date, page: int) -> Tuple[int, List[Dict]]:
         """
-        params, headers = self._create_request(amount)
+        Requests a single page of results of the search.
 
-        response = requests.get(self.base_url, params=params, headers=headers)
+        Args:
+            start (date): The first push date of the range.
+            end (date): The last push date of the range.
+            page (int): The number of the page, starting from 1.
 
-        projects = []
-        if response.status_code == 200:
-            res = response.json().get("items", [])
-            for repo in res:
-                projects.append(Project(name=repo["full_name"].replace("/", "|"), remote=repo["html_url"],
-                                        description=repo["description"],
-                                        stargazers_count=repo["stargazers_count"], language=repo["language"],
-                                        archived=repo["archived"], pushed_at=repo["pushed_at"]))
+        Returns:
+            Tuple[int, List[Dict]]: The total number of results of the search and the repositories in the page.
+        """
+        params, headers = self._create_request(start, end, page)
 
-        else:
+        response = self.client.get(self.base_url, params=params, headers=headers)
+        if response.status_code != 200:
             response.raise_for_status()
 
-        return projects
+        res = response.json()
+        return res.get("total_count", 0), res.get("items", [])
 
-    def _create_request(self, amount: int) -> Tuple[Dict, Dict]:
+    def _create_request(self, start: date, end: date, page: int) -> Tuple[Dict, Dict]:
         """
         Create request parameters and headers for GitHub repository search.
 
         Args:
-            amount (int): The number of results to retrieve.
+            start (date): The first push date of the range.
+            end (date): The last push date of the range.
+            page (int): The number of the page to retrieve.
 
         Returns:
             Tuple[Dict, Dict]: A tuple containing request parameters and headers.
         """
-        query = f"language:{self.language} stars:>={self.min_stars} pushed:<{self.last_pushed_date}"
+        query = f"language:{self.language} stars:>={self.min_stars} pushed:{start.isoformat()}..{end.isoformat()}"
         if self.only_archived:
             query += " archived:true"
 
-        # If above max results per page, adjust page num.
-        page_num = 1
-        if amount > 100:
-            page_num = int(amount / 100)
-
-        params = {"q": query, "per_page": amount, "page": page_num}
+        # Sort by a stable key, otherwise the pages of the same query can overlap.
+        params = {"q": query, "per_page": self.per_page, "page": page, "sort": "stars", "order": "desc"}
         headers = {"Accept": "application/vnd.github+json",
                    "X-GitHub-Api-Version": "2022-11-28"}
+        if self.token:
+            headers["Authorization"] = f"Bearer {self.token}"
 
         return params, headers
@@ -1,6 +1,8 @@
-from typing import Protocol
+from typing import Iterator, Optional, Protocol
+
+from entities import Project
 
 
 class ProjectFinder(Protocol):
-    def find_projects(self, amount: int):
+    def find_projects(self, amount: Optional[int]) -> Iterator[Project]:
         pass
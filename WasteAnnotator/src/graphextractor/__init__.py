@@ -1 +1,10 @@
-from .arcan import ArcanGraphExtractor
+from typing import TYPE_CHECKING
+
+from lazy import attach
+
+__getattr__, __dir__, __all__ = attach(__name__, {
+    "ArcanGraphExtractor": ".arcan",
+})
+
+if TYPE_CHECKING:
+    from .arcan import ArcanGraphExtractor
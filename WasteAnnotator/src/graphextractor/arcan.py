@@ -1,12 +1,23 @@
+import csv
+import fcntl
 import os
+import signal
+import threading
+import time
 from os.path import join, exists
-from subprocess import call
+from subprocess import DEVNULL, Popen, TimeoutExpired
+from typing import List, NamedTuple, Optional
 
-import networkx as nx
 from loguru import logger
 import shlex
 
 from entities import Project, GraphModel
+from graphextractor.cache import GraphCache
+from graphextractor.graphml import read_graphml
+
+# Serializes the writes to the report of the Arcan runs between the threads of a process, the file lock between
+# processes.
+_REPORT_LOCK = threading.Lock()
 
 
 def arcan_language_str(language: str) -> str:
@@ -43,23 +54,49 @@ def find_file_by_extension(directory: str, target_extension: str) -> str:
     Returns:
         str: The filename if a matching file is found, otherwise, an empty string.
     """
-    for filename in os.listdir(directory):
-        if filename.endswith(target_extension):
-            return filename
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.name.endswith(target_extension):
+                return entry.name
 
     raise ValueError(f"No file with extension {target_extension} found in {directory}")
 
 
+class ArcanRun(NamedTuple):
+    """
+    Outcome of an Arcan execution on a project.
+    """
+    name: str
+    returncode: Optional[int]
+    runtime: float
+    timed_out: bool
+    reused_checkout: bool
+
+    @property
+    def succeeded(self) -> bool:
+        return self.returncode == 0 and not self.timed_out
+
+
 class ArcanGraphExtractor:
     """
     The ArcanGraphExtractor class is responsible for extracting the dependency graph using Arcan.
     """
+    # Attributes left out of the fingerprint of the graph stage, as both readers build the same graph.
+    fingerprint_exclude = frozenset({"streaming"})
 
     def __init__(self, arcan_path: str = "/waste-annotator/src/arcan",
                  repository_path: str = "/waste-annotator/data/repository",
                  arcan_out: str = "/waste-annotator/data/",
                  logs_path: str = "/waste-annotator/data/arcan-log",
-                 force_run: bool = False
+                 force_run: bool = False,
+                 cache_dir: Optional[str] = None,
+                 cache_size_mb: float = 2048,
+                 timeout: Optional[float] = None,
+                 memory: Optional[str] = None,
+                 reuse_checkout: bool = True,
+                 node_keys: Optional[List[str]] = None,
+                 edge_keys: Optional[List[str]] = None,
+                 streaming: bool = True
                  ):
         """
         Initializes the ArcanGraphExtractor instance.
@@ -70,6 +107,15 @@ class ArcanGraphExtractor:
             arcan_out:
             logs_path:
             force_run:
+            cache_dir: Directory where the parsed graphs are cached, no caching if None.
+            cache_size_mb: Maximum size of the graph cache in MB.
+            timeout: Seconds after which an Arcan execution is killed, no limit if None.
+            memory: Maximum heap of the Arcan JVM (e.g. "8G"), defaults to the one set in arcan.sh.
+            reuse_checkout: Analyse the repository already cloned in repository_path instead of cloning it again.
+            node_keys: Node attributes of the GraphML file kept in the graph, all of them if None.
+            edge_keys: Edge attributes of the GraphML file kept in the graph, all of them if None.
+            streaming: Parse the GraphML file with the streaming reader instead of networkx, which builds the same
+                graph using much less memory.
         """
         self.arcan_script: str = arcan_path + "/run-arcan.sh"  # NOTE: arcan.bat should be run on Windows
         self.arcan_path: str = arcan_path
@@ -77,6 +123,13 @@ class ArcanGraphExtractor:
         self.arcan_out: str = arcan_out
         self.logs_path: str = logs_path
         self.force_run = force_run
+        self.cache: Optional[GraphCache] = GraphCache(cache_dir, cache_size_mb) if cache_dir else None
+        self.timeout = timeout
+        self.memory = memory
+        self.reuse_checkout = reuse_checkout
+        self.node_keys = list(node_keys) if node_keys is not None else None
+        self.edge_keys = list(edge_keys) if edge_keys is not None else None
+        self.streaming = streaming
 
         logger.info(f"Initialized ArcanGraphExtractor")
 
@@ -88,52 +141,95 @@ class ArcanGraphExtractor:
             nx.Graph: The dependency graph.
         """
         try:
-            dep_graph = self._init_dep_graph(project)
+            project.dep_graph = self._init_dep_graph(project)
         except:
             raise ValueError(
                 f"Failed to extract dependency graph for {project.name}. Arcan might have failed execution.")
 
-        project.dep_graph = GraphModel.from_graph(dep_graph)
         return project
 
-    def _init_dep_graph(self, project: Project) -> nx.Graph:
+    def _init_dep_graph(self, project: Project) -> GraphModel:
         directory: str = self.arcan_out + "arcanOutput/" + project.name + "/"
         if not exists(directory) or self.force_run:
             if self.force_run:
                 logger.info(f"Force running Arcan for {project.name}")
 
-            self._run_arcan(project.name, project.remote, arcan_language_str(project.language))
+            run = self._run_arcan(project.name, project.remote, arcan_language_str(project.language))
+            if not run.succeeded:
+                raise ValueError(f"Arcan failed for {project.name}: {run}")
 
         if not os.path.exists(directory):
             raise ValueError(
                 "ComponentExtractor illegal state -> project directory cannot be found. Arcan might have failed execution",
                 directory)
 
-        file = find_file_by_extension(directory, ".graphml")
-        dep_graph = nx.read_graphml(directory + file)
+        graphml = directory + find_file_by_extension(directory, ".graphml")
+        # Both readers build the same graph, only the attributes kept change the cached entry.
+        config = "" if self.node_keys is None and self.edge_keys is None else f"{self.node_keys}:{self.edge_keys}"
+        if self.cache:
+            dep_graph = self.cache.load(project.name, graphml, config)
+            if dep_graph is not None:
+                return dep_graph
+
+        if self.streaming:
+            dep_graph = read_graphml(graphml, self.node_keys, self.edge_keys)
+        else:
+            import networkx as nx
+
+            dep_graph = GraphModel.from_graph(nx.read_graphml(graphml), self.node_keys, self.edge_keys)
+        if self.cache:
+            self.cache.store(project.name, graphml, dep_graph, config)
         return dep_graph
 
-    def _run_arcan(self, name, url, language) -> None:
+    def _run_arcan(self, name, url, language) -> ArcanRun:
         """
-        Runs the script to extract the graphs using Arcan.
+        Runs the script to extract the graphs using Arcan, killing it if it exceeds the timeout.
+        The outcome of the run is appended to `arcan-runs.csv` in the logs folder.
         """
-
+        logs_path = join(self.logs_path, 'arcan')
+        os.makedirs(logs_path, exist_ok=True)
+
+        reused = self.reuse_checkout and exists(join(self.repository_path, name, ".git"))
+        # The script skips cloning when the remote is "-".
+        args = ["-" if reused else url, name, language,
+                self.arcan_path, self.repository_path, self.arcan_out, logs_path]
+        command = [self.arcan_script] + args
+
+        env = dict(os.environ)
+        if self.memory:
+            env["JAVA_MEMORY"] = self.memory
+
+        logger.info(f"Running command: {shlex.join(command)}")
+        start = time.perf_counter()
+        timed_out = False
         try:
-
-            command = [self.arcan_script]
-
-            args = [url, name, language,
-                    self.arcan_path, self.repository_path, self.arcan_out, join(self.logs_path, 'arcan')]
-
-            command.extend(args)
-
-            logger.info(f"Running command: {shlex.join(command)}")
-
-            call(shlex.join(command), shell=True)
-
-            logger.info(f"Finished to extract graph for {name}")
-
+            process = Popen(command, env=env, stdout=DEVNULL, stderr=DEVNULL, start_new_session=True)
+            try:
+                returncode = process.wait(timeout=self.timeout)
+            except TimeoutExpired:
+                # Kill the whole process group, otherwise the JVM started by the script keeps running.
+                os.killpg(process.pid, signal.SIGKILL)
+                returncode = process.wait()
+                timed_out = True
         except Exception as e:
             logger.error(f"Failed to extract graph for {name}")
             logger.error(f"{e}")
             raise e
+
+        run = ArcanRun(name, returncode, time.perf_counter() - start, timed_out, reused)
+        self._report(run)
+        if run.succeeded:
+            logger.info(f"Finished to extract graph for {name} in {run.runtime:.1f}s")
+        else:
+            logger.error(f"Arcan failed for {name} after {run.runtime:.1f}s (exit status {returncode}, "
+                         f"timed out: {timed_out})")
+        return run
+
+    def _report(self, run: ArcanRun):
+        report = join(self.logs_path, "arcan-runs.csv")
+        with _REPORT_LOCK, open(report, "a", newline="") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            writer = csv.writer(f)
+            if f.seek(0, os.SEEK_END) == 0:
+                writer.writerow(ArcanRun._fields)
+            writer.writerow([run.name, run.returncode, f"{run.runtime:.2f}", run.timed_out, run.reused_checkout])
@@ -0,0 +1,77 @@
+import hashlib
+import io
+import os
+from typing import Optional
+
+import numpy as np
+from loguru import logger
+
+from cache import DiskCache
+from entities import GraphModel
+
+# Bumped whenever the layout of the cached arrays changes, so that old entries are not read.
+CACHE_FORMAT = 2
+
+
+def encode_graph(graph: GraphModel) -> bytes:
+    """
+    Serializes a graph as compressed numpy arrays: the node id table, the source and target node index of each edge
+    and the attribute columns.
+    """
+    buffer = io.BytesIO()
+    np.savez_compressed(buffer, **graph.to_arrays())
+    return buffer.getvalue()
+
+
+def decode_graph(data: bytes) -> GraphModel:
+    with np.load(io.BytesIO(data)) as arrays:
+        return GraphModel.from_arrays({key: arrays[key] for key in arrays.files})
+
+
+class GraphCache:
+    """
+    Persistent cache of the dependency graphs parsed from the Arcan GraphML files, so that re-runs do not parse the
+    XML again. Entries are keyed by the project name and by the modification time and size of the GraphML file (or by
+    its content hash), so a new Arcan run invalidates them.
+    """
+
+    def __init__(self, directory: str, max_size_mb: Optional[float] = 2048, hash_content: bool = False):
+        """
+        Initializes the GraphCache instance.
+
+        Args:
+            directory: The directory containing the cached graphs.
+            max_size_mb: Maximum size of the cache in MB, least recently used graphs are evicted first.
+            hash_content: Key the graphs by the hash of the GraphML file instead of its modification time and size.
+        """
+        self.cache = DiskCache(directory, max_size_mb, suffix=".npz")
+        self.hash_content = hash_content
+
+    def key(self, name: str, graphml: str, config: str = "") -> str:
+        """
+        Returns the key of the graph of a project, `config` describes the options of the parsing (e.g. the attributes
+        kept) so that graphs parsed with other options are not reused.
+        """
+        if config:
+            return f"{self.key(name, graphml)}:{config}"
+        if self.hash_content:
+            digest = hashlib.sha1()
+            with open(graphml, "rb") as f:
+                for chunk in iter(lambda: f.read(1 << 20), b""):
+                    digest.update(chunk)
+            return f"{CACHE_FORMAT}:{name}:{digest.hexdigest()}"
+
+        stat = os.stat(graphml)
+        return f"{CACHE_FORMAT}:{name}:{stat.st_mtime_ns}:{stat.st_size}"
+
+    def load(self, name: str, graphml: str, config: str = "") -> Optional[GraphModel]:
+        data = self.cache.get(self.key(name, graphml, config))
+        if data is None:
+            logger.info(f"Graph cache miss for {name} ({self.cache})")
+            return None
+
+        logger.info(f"Graph cache hit for {name} ({self.cache})")
+        return decode_graph(data)
+
+    def store(self, name: str, graphml: str, graph: GraphModel, config: str = ""):
+        self.cache.set(self.key(name, graphml, config), encode_graph(graph))
@@ -0,0 +1,174 @@
+from typing import Any, Callable, Dict, List, Optional
+from xml.etree.ElementTree import iterparse
+
+import numpy as np
+
+from entities import Column, GraphModel
+
+BOOLEANS = {"true": True, "false": False, "0": False, "0.0": False, "1": True, "1.0": True}
+TYPES: Dict[str, Callable[[str], Any]] = {
+    "boolean": lambda text: BOOLEANS[text.lower()],
+    "int": int,
+    "long": int,
+    "float": float,
+    "double": float,
+    "string": str,
+}
+
+
+def _tag(element) -> str:
+    return element.tag.rpartition("}")[2]
+
+
+class _Key:
+    __slots__ = ("name", "convert", "kept")
+
+    def __init__(self, name: str, convert: Callable[[str], Any], kept: bool):
+        self.name = name
+        self.convert = convert
+        self.kept = kept
+
+
+def read_graphml(path, node_keys: Optional[List[str]] = None, edge_keys: Optional[List[str]] = None) -> GraphModel:
+    """
+    Reads a GraphML file (e.g. written by Arcan) into a GraphModel, streaming over its elements instead of building the
+    XML tree and a networkx graph. Node ids are interned in a single table, only the requested attributes are decoded,
+    and elements are dropped once read, so memory stays proportional to the arrays of the graph.
+    The graph is the same as `GraphModel.from_graph(nx.read_graphml(path), node_keys, edge_keys)`: same node order
+    (declared nodes first, then the ones only referenced by edges), same edge order and orientation, and parallel edges
+    are kept as networkx keeps them in a multigraph. Only the first graph of the file is read, yFiles data is ignored.
+
+    Args:
+        path: The path of the GraphML file.
+        node_keys: Node attributes to keep, all of them if None.
+        edge_keys: Edge attributes to keep, all of them if None.
+    """
+    keys: Dict[str, _Key] = {}
+    index: Dict[str, int] = {}
+    nodes: List[str] = []
+    declared: List[int] = []
+    node_data: Dict[str, Dict[int, Any]] = {}
+    src: List[int] = []
+    dst: List[int] = []
+    edge_ids: List[Optional[str]] = []
+    # One value per edge, None when missing.
+    edge_data: Dict[str, List[Any]] = {}
+    # Repeated attribute values (e.g. node and edge types) share one string object.
+    strings: Dict[str, str] = {}
+    directed = False
+    graph = None
+    depth = 0
+
+    def node_index(node_id: str) -> int:
+        i = index.get(node_id)
+        if i is None:
+            i = index[node_id] = len(nodes)
+            nodes.append(node_id)
+        return i
+
+    def decode(element) -> Dict[str, Any]:
+        values = {}
+        for data in element:
+            if _tag(data) != "data":
+                continue
+            key = keys.get(data.get("key"))
+            if key is None:
+                raise ValueError(f"Bad GraphML data: no key {data.get('key')}")
+            if not key.kept or data.text is None or len(data):
+                continue
+            value = key.convert(data.text)
+            if type(value) is str:
+                value = strings.setdefault(value, value)
+            values[key.name] = value
+        return values
+
+    for event, element in iterparse(path, events=("start", "end")):
+        tag = _tag(element)
+        if event == "start":
+            if tag == "graph":
+                depth += 1
+                if graph is None:
+                    graph = element
+                    directed = element.get("edgedefault") == "directed"
+            continue
+        if tag == "graph":
+            depth -= 1
+            if depth == 0:
+                break
+        elif depth != 1:
+            # Keys are declared outside of the graph, nested graphs are not read.
+            if tag == "key" and depth == 0:
+                if element.get("yfiles.type") is not None:
+                    keys[element.get("id")] = _Key(element.get("yfiles.type"), str, False)
+                    continue
+                name = element.get("attr.name")
+                if name is None:
+                    raise ValueError(f"Unknown key for id {element.get('id')}")
+                kept = [wanted is None or name in wanted for domain, wanted in [("node", node_keys), ("edge", edge_keys)]
+                        if element.get("for") in (domain, "all", None)]
+                keys[element.get("id")] = _Key(name, TYPES[element.get("attr.type") or "string"], any(kept))
+            continue
+        elif tag == "node":
+            i = node_index(element.get("id"))
+            declared.append(i)
+            for name, value in decode(element).items():
+                node_data.setdefault(name, {})[i] = value
+            graph.clear()
+        elif tag == "edge":
+            if element.get("directed") == ("false" if directed else "true"):
+                raise ValueError(f"directed={element.get('directed')} edge found in a graph with other edges")
+            values = decode(element)
+            for name, column in edge_data.items():
+                column.append(values.pop(name, None))
+            for name, value in values.items():
+                edge_data[name] = [None] * len(src) + [value]
+            src.append(node_index(element.get("source")))
+            dst.append(node_index(element.get("target")))
+            edge_ids.append(element.get("id") or None)
+            graph.clear()
+        elif tag == "hyperedge":
+            raise ValueError("GraphML hyperedges are not supported")
+
+    return _build(nodes, declared, node_data, np.array(src, dtype=np.int64), np.array(dst, dtype=np.int64),
+                  edge_ids, edge_data, directed, node_keys, edge_keys)
+
+
+def _build(nodes: List[str], declared: List[int], node_data: Dict[str, Dict[int, Any]], src: np.ndarray,
+           dst: np.ndarray, edge_ids: List[Optional[str]], edge_data: Dict[str, List[Any]], directed: bool,
+           node_keys: Optional[List[str]], edge_keys: Optional[List[str]]) -> GraphModel:
+    """
+    Orders the nodes and edges as networkx does and builds the columns of the graph.
+    """
+    # networkx adds the declared nodes first, then the nodes only referenced by edges in the order they appear.
+    first = dict.fromkeys(declared)
+    order = np.array(list(first) + [i for i in range(len(nodes)) if i not in first], dtype=np.int64)
+    position = np.empty(len(nodes), dtype=np.int64)
+    position[order] = np.arange(len(nodes))
+    src, dst = position[src], position[dst]
+    if not directed:
+        # Undirected edges are listed from the endpoint that comes first.
+        src, dst = np.minimum(src, dst), np.maximum(src, dst)
+
+    # networkx lists the edges by source node, then by the first appearance of their (source, target) pair; parallel
+    # edges stay next to each other in file order.
+    _, pair, inverse = np.unique(src * max(len(nodes), 1) + dst, return_index=True, return_inverse=True)
+    pair_first = pair[inverse.ravel()]
+    edge_order = np.lexsort((pair_first, src))
+    multigraph = len(pair) < len(src)
+
+    node_columns = {name: [values.get(i) for i in order.tolist()] for name, values in node_data.items()}
+    edge_columns = {name: [values[i] for i in edge_order.tolist()] for name, values in edge_data.items()}
+    if not multigraph and any(edge_ids) and (edge_keys is None or "id" in edge_keys):
+        # Without parallel edges networkx keeps the GraphML edge ids as an `id` attribute.
+        edge_columns["id"] = [edge_ids[i] for i in edge_order.tolist()]
+
+    # As in GraphModel.from_graph, the requested attributes are kept in the given order, even if no element has them.
+    node_keys = sorted(node_columns) if node_keys is None else node_keys
+    edge_keys = sorted(edge_columns) if edge_keys is None else edge_keys
+    return GraphModel(
+        nodes=[nodes[i] for i in order.tolist()],
+        src=src[edge_order].astype(np.int32),
+        dst=dst[edge_order].astype(np.int32),
+        node_attrs={name: Column.from_values(node_columns.get(name) or [None] * len(nodes)) for name in node_keys},
+        edge_attrs={name: Column.from_values(edge_columns.get(name) or [None] * len(src)) for name in edge_keys},
+    )
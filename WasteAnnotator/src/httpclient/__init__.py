@@ -0,0 +1,12 @@
+from typing import TYPE_CHECKING
+
+from lazy import attach
+
+__getattr__, __dir__, __all__ = attach(__name__, {
+    "HTTPClient": ".client",
+    "TokenBucket": ".ratelimit",
+})
+
+if TYPE_CHECKING:
+    from .client import HTTPClient
+    from .ratelimit import TokenBucket
@@ -0,0 +1,246 @@
+import threading
+import time
+from collections import OrderedDict
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, Optional, Tuple
+
+import requests
+from loguru import logger
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+
+from httpclient.ratelimit import TokenBucket
+
+RETRY_STATUS = {429, 500, 502, 503, 504}
+# Methods whose requests can be sent again without side effects. The other ones (e.g. a POST submitting an AutoFL job)
+# are only retried when the server did not receive them: connection failures and rate limits.
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE", "TRACE"}
+
+
+def _unsent(exc: requests.RequestException) -> bool:
+    """
+    Returns whether a request failed before it was sent, when the connection could not be established.
+    """
+    if isinstance(exc, requests.ConnectTimeout):
+        return True
+    reason = getattr(exc.args[0], "reason", None) if exc.args else None
+    return isinstance(exc, requests.ConnectionError) and isinstance(reason, NewConnectionError)
+
+
+class RequestStats:
+    """
+    Counters describing the cost of the requests made by a client.
+    """
+
+    def __init__(self):
+        self.requests = 0
+        self.retries = 0
+        self.not_modified = 0
+        self.bytes = 0
+        self.elapsed = 0.0
+        self.throttled = 0.0
+
+    def __str__(self):
+        return (f"{self.requests} requests ({self.retries} retries, {self.not_modified} not modified), "
+                f"{self.bytes / 1e6:.1f} MB in {self.elapsed:.1f}s, {self.throttled:.1f}s throttled")
+
+
+class HTTPClient:
+    """
+    HTTP client shared by the components that call remote services (GitHub, AutoFL).
+    It keeps connections alive in a pool, applies timeouts, retries failed requests with exponential backoff (only the
+    ones the server did not receive for non-idempotent methods such as POST), honours the `Retry-After` and
+    `X-RateLimit-*` headers, spaces requests with a token bucket and revalidates GET requests with their ETag so that
+    unchanged resources do not count against the quota.
+    """
+
+    def __init__(self, connect_timeout: float = 10, read_timeout: float = 60, max_retries: int = 5,
+                 backoff_factor: float = 1.0, max_backoff: float = 300, pool_size: int = 10,
+                 rate: Optional[float] = None, burst: Optional[float] = None, min_remaining: int = 1,
+                 etag_cache_size: int = 1024, headers: Optional[Dict[str, str]] = None):
+        """
+        Initializes the HTTPClient instance.
+
+        Args:
+            connect_timeout: Seconds to wait for the connection to be established.
+            read_timeout: Seconds to wait for the server to send data.
+            max_retries: Number of times a failed request is retried.
+            backoff_factor: Base of the exponential backoff, the n-th retry waits backoff_factor * 2^n seconds.
+            max_backoff: Maximum number of seconds to wait before a retry.
+            pool_size: Number of connections kept alive per host.
+            rate: Maximum number of requests per second, unlimited if None.
+            burst: Number of requests that can be made at once before the rate applies.
+            min_remaining: Requests are paused until the quota reset when the remaining quota reaches this value.
+            etag_cache_size: Number of GET responses kept to make conditional requests, 0 to disable them.
+            headers: Headers sent with every request.
+        """
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.pool_size = pool_size
+        self.rate = rate
+        self.burst = burst
+        self.min_remaining = min_remaining
+        self.etag_cache_size = etag_cache_size
+        self.headers = dict(headers or {})
+        self._setup()
+
+    def _setup(self):
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.bucket = TokenBucket(self.rate, self.burst)
+        self.stats = RequestStats()
+        self._etags: OrderedDict[Tuple, requests.Response] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        # Sessions and locks cannot be sent to worker processes, they are recreated on the other side.
+        state = self.__dict__.copy()
+        for key in ["session", "bucket", "stats", "_etags", "_lock"]:
+            del state[key]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._setup()
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+    def request(self, method: str, url: str, params: Optional[Dict[str, Any]] = None,
+                headers: Optional[Dict[str, str]] = None, timeout: Optional[Tuple[float, float]] = None,
+                **kwargs) -> requests.Response:
+        """
+        Sends a request, retrying it on connection errors, timeouts, rate limits and server errors. Requests with a
+        non-idempotent method are only retried when the connection failed or the server answered with a rate limit, as
+        the server may otherwise have processed them.
+
+        Args:
+            method: The HTTP method.
+            url: The URL of the request.
+            params: The query parameters.
+            headers: Additional headers of the request.
+            timeout: The (connect, read) timeouts, defaults to the ones of the client.
+            **kwargs: Further arguments of `requests.Session.request` (e.g. json, stream).
+
+        Returns:
+            The response of the last attempt. For a GET revalidated with a 304, the cached response.
+
+        Raises:
+            requests.RequestException: If the request still fails after all the retries.
+        """
+        headers = dict(headers or {})
+        timeout = timeout or (self.connect_timeout, self.read_timeout)
+        key = (url, tuple(sorted((params or {}).items())), tuple(sorted(headers.items())))
+        cached = self._cached(key) if method == "GET" else None
+        if cached is not None:
+            headers["If-None-Match"] = cached.headers["ETag"]
+
+        attempt = 0
+        while True:
+            self.stats.throttled += self.bucket.acquire()
+            start = time.perf_counter()
+            try:
+                response = self.session.request(method, url, params=params, headers=headers, timeout=timeout,
+                                                **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as exc:
+                if attempt >= self.max_retries or (method not in IDEMPOTENT_METHODS and not _unsent(exc)):
+                    raise
+                delay = self._backoff(attempt)
+                logger.warning(f"{method} {url} failed ({exc}), retrying in {delay:.1f}s")
+                attempt += 1
+                self.stats.retries += 1
+                time.sleep(delay)
+                continue
+            finally:
+                self.stats.requests += 1
+                self.stats.elapsed += time.perf_counter() - start
+
+            if kwargs.get("stream"):
+                size = int(response.headers.get("Content-Length", 0) or 0)
+            else:
+                size = len(response.content)
+            self.stats.bytes += size
+            logger.debug(f"{method} {url} -> {response.status_code} in {response.elapsed.total_seconds():.2f}s "
+                         f"({size} bytes)")
+            self._update_quota(response)
+
+            if response.status_code == 304 and cached is not None:
+                self.stats.not_modified += 1
+                return cached
+
+            delay = self._retry_delay(response, attempt, method in IDEMPOTENT_METHODS)
+            if delay is None:
+                break
+            logger.warning(f"{method} {url} returned {response.status_code}, retrying in {delay:.1f}s")
+            attempt += 1
+            self.stats.retries += 1
+            self.bucket.pause(delay)
+
+        if method == "GET" and response.status_code == 200 and "ETag" in response.headers:
+            self._store(key, response)
+        return response
+
+    def _retry_delay(self, response: requests.Response, attempt: int, idempotent: bool = True) -> Optional[float]:
+        """
+        Returns the number of seconds to wait before retrying the request, or None if it should not be retried.
+        Requests with a non-idempotent method are only retried on rate limits.
+        """
+        rate_limited = response.status_code == 403 and (response.headers.get("X-RateLimit-Remaining") == "0"
+                                                        or "Retry-After" in response.headers)
+        retried = rate_limited or response.status_code == 429 or (idempotent and response.status_code in RETRY_STATUS)
+        if not retried or attempt >= self.max_retries:
+            return None
+
+        retry_after = response.headers.get("Retry-After")
+        if retry_after:
+            try:
+                return min(float(retry_after), self.max_backoff)
+            except ValueError:
+                return min(max(parsedate_to_datetime(retry_after).timestamp() - time.time(), 0), self.max_backoff)
+
+        reset = response.headers.get("X-RateLimit-Reset")
+        if rate_limited and reset:
+            return min(max(float(reset) - time.time(), 0) + 1, self.max_backoff)
+
+        return self._backoff(attempt)
+
+    def _update_quota(self, response: requests.Response):
+        """
+        Pauses the requests until the quota resets when the remaining quota is exhausted.
+        """
+        remaining = response.headers.get("X-RateLimit-Remaining")
+        reset = response.headers.get("X-RateLimit-Reset")
+        if remaining is None or reset is None or int(remaining) > self.min_remaining:
+            return
+
+        delay = max(float(reset) - time.time(), 0) + 1
+        logger.info(f"Rate limit quota exhausted, pausing requests for {delay:.0f}s")
+        self.bucket.pause(delay)
+
+    def _backoff(self, attempt: int) -> float:
+        return min(self.backoff_factor * 2 ** attempt, self.max_backoff)
+
+    def _cached(self, key: Tuple) -> Optional[requests.Response]:
+        with self._lock:
+            response = self._etags.get(key)
+            if response is not None:
+                self._etags.move_to_end(key)
+            return response
+
+    def _store(self, key: Tuple, response: requests.Response):
+        if not self.etag_cache_size:
+            return
+        with self._lock:
+            self._etags[key] = response
+            self._etags.move_to_end(key)
+            while len(self._etags) > self.etag_cache_size:
+                self._etags.popitem(last=False)
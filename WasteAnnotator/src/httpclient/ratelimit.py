@@ -0,0 +1,60 @@
+import threading
+import time
+from typing import Optional
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket used to space out requests. Tokens are refilled at a constant rate up to the capacity of
+    the bucket, and each request consumes one token, waiting for it if the bucket is empty.
+    The bucket can also be paused until a given time, e.g. until the reset of a server side quota.
+    """
+
+    def __init__(self, rate: Optional[float] = None, capacity: Optional[float] = None):
+        """
+        Initializes the TokenBucket instance.
+
+        Args:
+            rate: Number of tokens added per second. If None, only pauses are enforced.
+            capacity: Maximum number of tokens in the bucket, defaults to the rate (one second of burst).
+        """
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate or 1.0, 1.0)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """
+        Takes a token from the bucket, blocking until one is available.
+
+        Returns:
+            The time spent waiting, in seconds.
+        """
+        waited = 0.0
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                delay = self.paused_until - now
+                if delay <= 0 and self.rate:
+                    self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                    self.updated = now
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        return waited
+                    delay = (1 - self.tokens) / self.rate
+                elif delay <= 0:
+                    return waited
+            time.sleep(delay)
+            waited += delay
+
+    def pause(self, seconds: float):
+        """
+        Stops handing out tokens for the given number of seconds.
+
+        Args:
+            seconds: The duration of the pause.
+        """
+        with self.lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
@@ -0,0 +1,28 @@
+import sys
+from importlib import import_module
+from typing import Any, Callable, Dict, List, Tuple
+
+
+def attach(package: str, exports: Dict[str, str]) -> Tuple[Callable[[str], Any], Callable[[], List[str]], List[str]]:
+    """
+    Returns the `__getattr__`, `__dir__` and `__all__` of a package re-exporting names of its submodules (PEP 562), so
+    that importing the package does not import the modules of all its components. A submodule is imported the first
+    time one of its names is accessed, e.g. when hydra instantiates a `_target_`.
+
+    Args:
+        package: The name of the package, i.e. its `__name__`.
+        exports: The submodule (relative to the package) defining each name.
+    """
+
+    def __getattr__(name: str) -> Any:
+        if name not in exports:
+            raise AttributeError(f"module {package!r} has no attribute {name!r}")
+        value = getattr(import_module(exports[name], package), name)
+        # Later accesses find the name in the package without calling __getattr__.
+        setattr(sys.modules[package], name, value)
+        return value
+
+    def __dir__() -> List[str]:
+        return sorted({*vars(sys.modules[package]), *exports})
+
+    return __getattr__, __dir__, list(exports)
@@ -1,31 +1,73 @@
-from typing import List
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
 
 import hydra
 from hydra.utils import instantiate
+from loguru import logger
 from omegaconf import DictConfig
 
-from annotator import Annotator
-from community import CommunityExtractor
-from exporter import ProjectExporter
-from finder import ProjectFinder
-from graphextractor.interface import GraphExtractor
-from pipeline import CompletePipeline
+if TYPE_CHECKING:
+    # The components are imported when they are instantiated, so that a command only imports the ones it uses.
+    from finder import ProjectFinder
+    from pipeline import CompletePipeline
+
+# Config groups of the components each command instantiates, besides the finder and the pipeline, and the stages it
+# runs (all of them if None). The stages whose outputs they use are resumed from the state store of the pipeline.
+COMMANDS: Dict[str, Tuple[List[str], Optional[List[str]]]] = {
+    "run": (["graphextractor", "annotator", "community", "exporter"], None),
+    "find": ([], []),
+    "enqueue": ([], []),
+    "extract": (["graphextractor"], ["graph"]),
+    "annotate": (["annotator"], ["annotation"]),
+    "community": (["community"], ["community"]),
+    "export": (["exporter"], ["export"]),
+}
+
+# Argument of the pipeline receiving the component of each config group.
+ARGUMENTS = {
+    "graphextractor": "graph_extractor",
+    "annotator": "semantic_annotator",
+    "community": "community_extractor",
+    "exporter": "project_exporter",
+}
+
+
+def _instantiate(cfg: DictConfig, group: str):
+    """
+    Instantiates the component of a config group. The exporter group holds one config per selected exporter (e.g.
+    `exporter: [json, index]`), keyed by its name, and gives the list of these exporters.
+    """
+    if group == "exporter":
+        return [instantiate(exporter) for exporter in cfg.exporter.values()
+                if isinstance(exporter, DictConfig) and "_target_" in exporter]
+    return instantiate(cfg[group])
 
 
 @hydra.main(config_path="../config/", config_name="main.yaml", version_base='1.3')
 def run(cfg: DictConfig):
-    finder: ProjectFinder = instantiate(cfg.finder)
-    graph_extractor: GraphExtractor = instantiate(cfg.graphextractor)
-    semantic_annotator: Annotator = instantiate(cfg.annotator)
-    community_extractor: CommunityExtractor = instantiate(cfg.community)
-    exporter: List[ProjectExporter] = instantiate(cfg.exporter)
-    CompletePipeline(
-        finder,
-        graph_extractor,
-        semantic_annotator,
-        community_extractor,
-        exporter,
-    ).run()
+    command = cfg.get("command", "run")
+    if command not in COMMANDS:
+        raise ValueError(f"Unknown command {command}, the commands are {list(COMMANDS)}")
+    groups, stages = COMMANDS[command]
+
+    finder: 'ProjectFinder' = instantiate(cfg.finder)
+    if command == "find":
+        for project in finder.find_projects(cfg.num_projects):
+            print(f"{project.name}\t{project.remote}")
+        return
+    if command == "enqueue":
+        # Only for the distributed pipeline, whose workers are then started with `pipeline.enqueue=false`.
+        from pipeline.distributed import DistributedPipeline
+
+        pipeline = instantiate(cfg.pipeline, project_finder=finder)
+        if not isinstance(pipeline, DistributedPipeline):
+            raise ValueError(f"The enqueue command needs the distributed pipeline (pipeline=distributed), not "
+                             f"{type(pipeline).__name__}")
+        pipeline.enqueue_projects(cfg.num_projects)
+        return
+
+    components = {ARGUMENTS[group]: _instantiate(cfg, group) for group in groups}
+    pipeline: 'CompletePipeline' = instantiate(cfg.pipeline, project_finder=finder, **components)
+    pipeline.run(cfg.num_projects, stages)
 
 
 if __name__ == "__main__":
@@ -1 +1,20 @@
-from .complete import CompletePipeline
\ No newline at end of file
+from typing import TYPE_CHECKING
+
+from lazy import attach
+
+__getattr__, __dir__, __all__ = attach(__name__, {
+    "CompletePipeline": ".complete",
+    "ConcurrentPipeline": ".concurrent",
+    "DistributedPipeline": ".distributed",
+    "StateStore": ".state",
+    "MetricsRecorder": ".metrics",
+    "WorkQueue": ".workqueue",
+})
+
+if TYPE_CHECKING:
+    from .complete import CompletePipeline
+    from .concurrent import ConcurrentPipeline
+    from .distributed import DistributedPipeline
+    from .state import StateStore
+    from .metrics import MetricsRecorder
+    from .workqueue import WorkQueue
@@ -1,13 +1,35 @@
-from typing import List
-from urllib.error import HTTPError
+import hashlib
+import time
+from concurrent.futures import Executor
+from functools import partial
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterator, List, Optional, Tuple
 
 from loguru import logger
 
-from annotator import Annotator
-from community import CommunityExtractor
-from exporter import ProjectExporter
-from finder import ProjectFinder
-from graphextractor.interface import GraphExtractor
+from entities import Project
+from pipeline.metrics import MetricsRecorder, measure
+from pipeline.state import StateStore, config_of, fingerprint
+
+if TYPE_CHECKING:
+    # Only imported for the annotations, the components are imported when hydra instantiates them.
+    from annotator import Annotator
+    from communityextractor import CommunityExtractor
+    from exporter import ProjectExporter
+    from finder import ProjectFinder
+    from graphextractor.interface import GraphExtractor
+
+
+def _submit(executor: Executor, stage: Callable[[Project], Any], project: Project) -> Any:
+    return executor.submit(stage, project).result()
+
+
+def _cache_counters(component: Any) -> Tuple[int, int]:
+    """
+    Returns the hits and misses of the disk cache of a component (e.g. the GraphCache of the ArcanGraphExtractor or the
+    AnnotationCache of the AutoFLAnnotator), zeros if it has none.
+    """
+    disk = getattr(getattr(component, "cache", None), "cache", None)
+    return getattr(disk, "hits", 0), getattr(disk, "misses", 0)
 
 
 class CompletePipeline:
@@ -15,12 +37,29 @@ class CompletePipeline:
     The CompletePipeline class is responsible for running the complete pipeline to annotate projects.
     """
 
+    # Fields of the project set by each stage, restored from the state store when the stage is skipped.
+    STAGE_FIELDS: Dict[str, List[str]] = {
+        "graph": ["dep_graph"],
+        "annotation": ["files", "taxonomy"],
+        "community": ["communities"],
+        "export": [],
+    }
+    # Stages whose outputs each stage uses, resumed from the state store when only the later stage runs.
+    STAGE_INPUTS: Dict[str, List[str]] = {
+        "graph": [],
+        "annotation": [],
+        "community": ["graph"],
+        "export": ["graph", "annotation", "community"],
+    }
+
     def __init__(self,
-                 project_finder: ProjectFinder,
-                 graph_extractor: GraphExtractor,
-                 semantic_annotator: Annotator,
-                 community_extractor: CommunityExtractor,
-                 project_exporter: List[ProjectExporter]
+                 project_finder: 'ProjectFinder',
+                 graph_extractor: Optional['GraphExtractor'] = None,
+                 semantic_annotator: Optional['Annotator'] = None,
+                 community_extractor: Optional['CommunityExtractor'] = None,
+                 project_exporter: Optional[List['ProjectExporter']] = None,
+                 state_store: Optional[StateStore] = None,
+                 metrics: Optional[MetricsRecorder] = None
                  ):
         """
 
@@ -30,50 +69,239 @@ class CompletePipeline:
             semantic_annotator:
             community_extractor:
             project_exporter:
+                The components of the stages that are not run (see `run`) can be None.
+            state_store: Store of the completed stages. If given, stages whose inputs did not change since they last
+                completed are skipped.
+            metrics: Recorder of the time, memory and cache metrics of each stage, summarized at the end of the run.
         """
 
-        self.project_finder: ProjectFinder = project_finder
-        self.graph_extractor: GraphExtractor = graph_extractor
-        self.semantic_annotator: Annotator = semantic_annotator
-        self.community_extractor: CommunityExtractor = community_extractor
-        self.project_exporter: List[ProjectExporter] = project_exporter
+        self.project_finder: 'ProjectFinder' = project_finder
+        self.graph_extractor: Optional['GraphExtractor'] = graph_extractor
+        self.semantic_annotator: Optional['Annotator'] = semantic_annotator
+        self.community_extractor: Optional['CommunityExtractor'] = community_extractor
+        self.project_exporter: List['ProjectExporter'] = project_exporter or []
+        self.state_store: Optional[StateStore] = state_store
+        self.metrics: Optional[MetricsRecorder] = metrics
 
         logger.info(f"Initialized ComponentAnnotator")
 
-    def run(self, num_proj: int = 10):
-        abandoned_projects = []
+    def run(self, num_proj: Optional[int] = 10, stages: Optional[List[str]] = None):
+        """
+        Runs the stages of the pipeline on the projects returned by the finder.
+
+        Args:
+            num_proj: The number of projects to process, all of them if None.
+            stages: The stages to run, all of them if None. The stages whose outputs they use are not run again, their
+                outputs are restored from the state store, so they must have completed in a previous run.
+        """
+        plan = self.plan(stages)
+        for project in self.find_projects(num_proj):
+            try:
+                context = {}
+                for name, run in plan:
+                    if run:
+                        project, context = self.run_stage(name, project, context)
+                    else:
+                        project, context = self.resume_stage(name, project, context)
+            except RuntimeError as exc:
+                logger.error(f"{exc}")
+                continue
+            except ValueError as exc:
+                logger.error(f"{exc}")
+                continue
+        if self.metrics is not None:
+            self.metrics.summary()
+
+    def find_projects(self, num_proj: Optional[int]) -> Iterator[Project]:
+        """
+        Lazily retrieves the projects to process using the project finder, so that the first projects can be
+        processed while the next ones are still being retrieved. Stops at the first failed request.
+
+        Args:
+            num_proj: The number of projects to retrieve, all of them if None.
+
+        Returns:
+            The projects to process.
+        """
+        logger.info("Starting to retrieve abandoned projects from GitHub")
         try:
-            logger.info("Starting to retrieve abandoned projects from GitHub")
-            abandoned_projects = self.project_finder.find_projects(num_proj)
+            yield from self.project_finder.find_projects(num_proj)
             logger.info("Finished retrieving abandoned projects from GitHub")
-        except HTTPError as exc:
-            logger.error("Failed to retrieve abandoned projects from GitHub")
+        except OSError as exc:
+            logger.error(f"Failed to retrieve abandoned projects from GitHub: {exc}")
 
-        for project in abandoned_projects:
+    def stages(self) -> List[Tuple[str, Callable[[Project], Project]]]:
+        """
+        Returns the stages of the pipeline, in execution order, as (name, function) pairs.
+        """
+        return [
+            ("graph", self.extract_graph),
+            ("annotation", self.annotate),
+            ("community", self.extract_communities),
+            ("export", self.export),
+        ]
 
-            try:
-                logger.info(f"Starting to extract dependency graph for project `{project.name}`")
-                project = self.graph_extractor.extract_graph(project)
-                logger.info(f"Finished extracting dependency graph for project `{project.name}`")
+    def plan(self, stages: Optional[List[str]] = None) -> List[Tuple[str, bool]]:
+        """
+        Returns the given stages and the stages whose outputs they use, in execution order, with whether each one runs
+        (or is resumed from the state store).
+        """
+        names = [name for name, _ in self.stages()]
+        if stages is None:
+            return [(name, True) for name in names]
+        unknown = set(stages) - set(names)
+        if unknown:
+            raise ValueError(f"Unknown stages {sorted(unknown)}, the stages are {names}")
+        if not stages:
+            raise ValueError("No stage to run")
+        inputs = {name for stage in stages for name in self.STAGE_INPUTS[stage]}
+        return [(name, name in stages) for name in names if name in stages or name in inputs]
 
-                logger.info(f"Starting to annotate project `{project.name}`")
-                project = self.semantic_annotator.annotate_project(project)
-                logger.info(f"Finished annotating project `{project.name}`")
+    def resume_stage(self, name: str, project: Project, context: Dict[str, Any]) -> Tuple[Project, Dict[str, Any]]:
+        """
+        Takes the output of a stage that is not run from the state store, where it must have completed before. As for
+        skipped stages, the fields it set are only restored when a later stage runs.
+        """
+        record = self.state_store.get(project.name, name) if self.state_store is not None else None
+        if record is None:
+            raise ValueError(f"Stage `{name}` never completed for project `{project.name}`, it must run before the "
+                             f"next stages")
+        context.setdefault("outputs", {})[name] = record.output_fingerprint
+        context.setdefault("pending", []).append(name)
+        return project, context
 
-                logger.info(f"Starting to extract community information for project `{project.name}`")
-                project = self.community_extractor.extract(project)
-                logger.info(f"Finished extracting community information for project `{project.name}`")
+    def run_stage(self, name: str, project: Project, context: Dict[str, Any],
+                  executor: Optional[Executor] = None) -> Tuple[Project, Dict[str, Any]]:
+        """
+        Runs a stage on a project, unless the state store shows that it already completed with the same inputs.
+        The fields set by skipped stages are restored from the store only when a later stage has to run.
 
-                logger.info(f"Starting to export project `{project.name}`")
-                for exporter in self.project_exporter:
-                    logger.info(f"Exporting project `{project.name}` using {exporter.__class__.__name__}")
-                    exporter.export(project)
-                logger.info(f"Finished exporting project `{project.name}`")
+        Args:
+            name: The name of the stage.
+            project: The project.
+            context: State carried between the stages of the project, empty for the first stage.
+            executor: Executor in which the stage runs, in the calling thread if None. The state store is only
+                accessed from the calling thread.
 
+        Returns:
+            The project after the stage and the context to pass to the next stage.
+        """
+        stage = self._measured(name, dict(self.stages())[name], project)
+        if executor is not None:
+            stage = partial(_submit, executor, stage)
+        if self.state_store is None:
+            return self._call(name, stage, project), context
 
-            except RuntimeError as exc:
-                logger.error(f"{exc}")
-                continue
-            except ValueError as exc:
-                logger.error(f"{exc}")
-                continue
+        outputs = context.setdefault("outputs", {})
+        pending = context.setdefault("pending", [])
+        input_fp = self.input_fingerprint(name, project, outputs)
+        record = self.state_store.get(project.name, name)
+        if record is not None and record.input_fingerprint == input_fp and not self._forced(name):
+            logger.info(f"Skipping stage `{name}` for project `{project.name}`, its inputs did not change")
+            outputs[name] = record.output_fingerprint
+            pending.append(name)
+            if self.metrics is not None:
+                self.metrics.record(project, name, "skipped")
+            return project, context
+
+        for skipped in pending:
+            project = self.state_store.restore(project, skipped, self.STAGE_FIELDS[skipped])
+        pending.clear()
+
+        project = self._call(name, stage, project)
+        outputs[name] = self.output_fingerprint(name, project)
+        self.state_store.save(project, name, input_fp, outputs[name], self.STAGE_FIELDS[name])
+        return project, context
+
+    def _measured(self, name: str, stage: Callable[[Project], Project], project: Project) -> Callable[[Project], Any]:
+        """
+        Wraps the stage so that it is measured where it runs (the worker process for process pool stages), returning
+        the project together with its metrics. The stage is returned as is when no metrics are recorded.
+        """
+        if self.metrics is None:
+            return stage
+        return partial(measure, stage, cache_counters=partial(_cache_counters, self._component(name)),
+                       profile_path=self.metrics.profile_path(project, name))
+
+    def _call(self, name: str, stage: Callable[[Project], Any], project: Project) -> Project:
+        """
+        Calls a stage wrapped by `_measured` and records its metrics, or only its wall time if it fails.
+        """
+        if self.metrics is None:
+            return stage(project)
+        start = time.perf_counter()
+        try:
+            result, sample = stage(project)
+        except Exception:
+            self.metrics.record(project, name, "failed", {"wall_time": time.perf_counter() - start})
+            raise
+        self.metrics.record(result, name, "ok", sample)
+        return result
+
+    def input_fingerprint(self, name: str, project: Project, outputs: Dict[str, str]) -> str:
+        """
+        Returns the fingerprint of the inputs of a stage: the repository version for graph extraction and annotation,
+        the outputs of the previous stages for the others, and the configuration of the components.
+        """
+        if name == "graph":
+            return fingerprint(project.remote, project.pushed_at, config_of(self.graph_extractor))
+        if name == "annotation":
+            return fingerprint(project.remote, project.pushed_at, config_of(self.semantic_annotator))
+        if name == "community":
+            reducer = getattr(self.community_extractor, "reducer", None)
+            return fingerprint(outputs["graph"], config_of(self.community_extractor),
+                               config_of(reducer) if reducer is not None else None)
+        if name == "export":
+            return fingerprint(outputs["annotation"], outputs["community"],
+                               [config_of(exporter) for exporter in self.project_exporter])
+        raise ValueError(f"Unknown stage {name}")
+
+    @staticmethod
+    def output_fingerprint(name: str, project: Project) -> str:
+        if name == "graph":
+            return project.dep_graph.fingerprint()
+        if name == "annotation":
+            return fingerprint({path: file.annotation.model_dump() if file.annotation else None
+                                for path, file in (project.files or {}).items()})
+        if name == "community":
+            digest = hashlib.sha1()
+            for algo, membership in sorted((project.communities or {}).items()):
+                digest.update(algo.encode())
+                digest.update(membership.labels.tobytes())
+                if membership.offsets is not None:
+                    digest.update(membership.offsets.tobytes())
+            return digest.hexdigest()
+        return ""
+
+    def _component(self, name: str) -> Any:
+        return {"graph": self.graph_extractor, "annotation": self.semantic_annotator,
+                "community": self.community_extractor}.get(name)
+
+    def _forced(self, name: str) -> bool:
+        return bool(getattr(self._component(name), "force_run", False))
+
+    def extract_graph(self, project: Project) -> Project:
+        logger.info(f"Starting to extract dependency graph for project `{project.name}`")
+        project = self.graph_extractor.extract_graph(project)
+        logger.info(f"Finished extracting dependency graph for project `{project.name}`")
+        return project
+
+    def annotate(self, project: Project) -> Project:
+        logger.info(f"Starting to annotate project `{project.name}`")
+        project = self.semantic_annotator.annotate_project(project)
+        logger.info(f"Finished annotating project `{project.name}`")
+        return project
+
+    def extract_communities(self, project: Project) -> Project:
+        logger.info(f"Starting to extract community information for project `{project.name}`")
+        project = self.community_extractor.extract(project)
+        logger.info(f"Finished extracting community information for project `{project.name}`")
+        return project
+
+    def export(self, project: Project) -> Project:
+        logger.info(f"Starting to export project `{project.name}`")
+        for exporter in self.project_exporter:
+            logger.info(f"Exporting project `{project.name}` using {exporter.__class__.__name__}")
+            exporter.export(project)
+        logger.info(f"Finished exporting project `{project.name}`")
+        return project
@@ -0,0 +1,161 @@
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor
+from queue import Queue
+from typing import TYPE_CHECKING, Dict, List, Optional
+
+from loguru import logger
+
+from entities import Project
+from pipeline.complete import CompletePipeline
+from pipeline.metrics import MetricsRecorder
+from pipeline.state import StateStore
+
+if TYPE_CHECKING:
+    # Only imported for the annotations, the components are imported when hydra instantiates them.
+    from annotator import Annotator
+    from communityextractor import CommunityExtractor
+    from exporter import ProjectExporter
+    from finder import ProjectFinder
+    from graphextractor.interface import GraphExtractor
+
+_DONE = object()
+
+DEFAULT_WORKERS = {"graph": 2, "annotation": 8, "community": 2, "export": 2}
+
+
+class _StageCounter:
+    """
+    Counts the workers of a stage that are still running, so that the last one to finish can signal the end of the
+    stream to the next stage.
+    """
+
+    def __init__(self, workers: int):
+        self.running = workers
+        self.lock = threading.Lock()
+
+    def finish(self) -> bool:
+        with self.lock:
+            self.running -= 1
+            return self.running == 0
+
+
+class ConcurrentPipeline(CompletePipeline):
+    """
+    The ConcurrentPipeline runs the same stages as the CompletePipeline, but pipelines them: each stage has its own
+    pool of workers and is connected to the next one by a bounded queue, so that while Arcan runs on a project, other
+    projects can be annotated, clustered and exported.
+    CPU bound stages (by default graph extraction and community detection) run in a process pool, the others in
+    threads.
+    """
+
+    def __init__(self,
+                 project_finder: 'ProjectFinder',
+                 graph_extractor: Optional['GraphExtractor'] = None,
+                 semantic_annotator: Optional['Annotator'] = None,
+                 community_extractor: Optional['CommunityExtractor'] = None,
+                 project_exporter: Optional[List['ProjectExporter']] = None,
+                 state_store: Optional[StateStore] = None,
+                 metrics: Optional[MetricsRecorder] = None,
+                 workers: Optional[Dict[str, int]] = None,
+                 process_stages: Optional[List[str]] = None,
+                 queue_size: int = 16
+                 ):
+        """
+        Initializes the ConcurrentPipeline instance.
+
+        Args:
+            project_finder:
+            graph_extractor:
+            semantic_annotator:
+            community_extractor:
+            project_exporter:
+            state_store: Store of the completed stages, see CompletePipeline.
+            metrics: Recorder of the metrics of each stage, see CompletePipeline. Under concurrency the cache counters
+                of thread stages may include the hits of other projects running the same stage.
+            workers: Number of workers for each stage (graph, annotation, community, export).
+            process_stages: Stages that run in a process pool instead of threads.
+            queue_size: Maximum number of projects waiting between two stages.
+        """
+        super().__init__(project_finder, graph_extractor, semantic_annotator, community_extractor, project_exporter,
+                         state_store, metrics)
+        self.workers: Dict[str, int] = {**DEFAULT_WORKERS, **(workers or {})}
+        self.process_stages: List[str] = list(process_stages) if process_stages is not None else ["graph", "community"]
+        self.queue_size: int = queue_size
+
+    def run(self, num_proj: Optional[int] = 10, stages: Optional[List[str]] = None):
+        """
+        Runs the stages of the pipeline on the projects returned by the finder, see CompletePipeline.run.
+        """
+        plan = self.plan(stages)
+        # Resuming a stage only reads the state store, a single worker is enough.
+        workers = [self.workers[name] if run else 1 for name, run in plan]
+        queues: List[Queue] = [Queue(maxsize=self.queue_size) for _ in plan]
+        executors: Dict[str, Executor] = {name: ProcessPoolExecutor(max_workers=self.workers[name])
+                                          for name, run in plan if run and name in self.process_stages}
+        failed: List[str] = []
+
+        threads = [threading.Thread(target=self._feed, args=(num_proj, queues[0], workers[0]), name="finder")]
+        for i, (name, run) in enumerate(plan):
+            out_queue = queues[i + 1] if i + 1 < len(plan) else None
+            downstream = workers[i + 1] if out_queue else 0
+            counter = _StageCounter(workers[i])
+            for n in range(workers[i]):
+                threads.append(threading.Thread(
+                    target=self._work,
+                    args=(name, run, queues[i], out_queue, downstream, counter, executors.get(name), failed),
+                    name=f"{name}-{n}"))
+
+        logger.info(f"Starting concurrent pipeline with workers {self.workers}")
+        try:
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            for executor in executors.values():
+                executor.shutdown()
+
+        logger.info(f"Finished concurrent pipeline, {len(failed)} projects failed")
+        if self.metrics is not None:
+            self.metrics.summary()
+
+    def _feed(self, num_proj: Optional[int], out_queue: Queue, downstream: int):
+        """
+        Puts the projects returned by the finder in the queue of the first stage.
+        """
+        try:
+            for project in self.find_projects(num_proj):
+                out_queue.put((project, {}))
+        except Exception as exc:
+            logger.error(f"Failed to retrieve projects: {exc}")
+        finally:
+            for _ in range(downstream):
+                out_queue.put(_DONE)
+
+    def _work(self, name: str, run: bool, in_queue: Queue, out_queue: Optional[Queue], downstream: int,
+              counter: _StageCounter, executor: Optional[Executor], failed: List[str]):
+        """
+        Worker loop of a stage: takes projects (with their stage context) from the input queue, runs the stage on them
+        (in the executor if given) or resumes it if `run` is False, and forwards them to the next stage. A failing
+        project is logged and dropped.
+        """
+        while True:
+            item = in_queue.get()
+            if item is _DONE:
+                break
+            project, context = item
+            try:
+                if run:
+                    item = self.run_stage(name, project, context, executor)
+                else:
+                    item = self.resume_stage(name, project, context)
+            except Exception as exc:
+                logger.error(f"Stage `{name}` failed for project `{project.name}`: {exc}")
+                failed.append(project.name)
+                continue
+            if out_queue is not None:
+                out_queue.put(item)
+
+        if counter.finish() and out_queue is not None:
+            for _ in range(downstream):
+                out_queue.put(_DONE)
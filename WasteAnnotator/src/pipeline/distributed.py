@@ -0,0 +1,211 @@
+import os
+import socket
+import sqlite3
+import threading
+import time
+from typing import TYPE_CHECKING, List, Optional, Tuple
+
+from loguru import logger
+
+from entities import Project
+from pipeline.complete import CompletePipeline
+from pipeline.metrics import MetricsRecorder
+from pipeline.state import StateStore
+from pipeline.workqueue import Lease, WorkQueue
+
+if TYPE_CHECKING:
+    # Only imported for the annotations, the components are imported when hydra instantiates them.
+    from annotator import Annotator
+    from communityextractor import CommunityExtractor
+    from exporter import ProjectExporter
+    from finder import ProjectFinder
+    from graphextractor.interface import GraphExtractor
+
+
+class LeaseLost(Exception):
+    """
+    Raised when a worker no longer holds the lease of the project it is processing.
+    """
+
+
+class DistributedPipeline(CompletePipeline):
+    """
+    The DistributedPipeline runs the stages of the CompletePipeline on projects shared with other nodes through a
+    WorkQueue: the projects returned by the finder are enqueued, then the workers of the node lease projects from the
+    queue and process them until the queue is drained. Any number of nodes (machines or containers mounting the same
+    volume) can run it with the same queue and state store, each project being processed by one worker at a time.
+    While a worker processes a project it renews its lease with heartbeats. A failed project is retried by any worker
+    up to `max_attempts` times, and the project of a worker that stopped sending heartbeats is leased again.
+    """
+
+    def __init__(self,
+                 project_finder: 'ProjectFinder',
+                 work_queue: WorkQueue,
+                 graph_extractor: Optional['GraphExtractor'] = None,
+                 semantic_annotator: Optional['Annotator'] = None,
+                 community_extractor: Optional['CommunityExtractor'] = None,
+                 project_exporter: Optional[List['ProjectExporter']] = None,
+                 state_store: Optional[StateStore] = None,
+                 metrics: Optional[MetricsRecorder] = None,
+                 workers: int = 1,
+                 enqueue: bool = True,
+                 reset: bool = False,
+                 wait: bool = True,
+                 poll_interval: float = 30,
+                 heartbeat_interval: Optional[float] = None
+                 ):
+        """
+        Initializes the DistributedPipeline instance.
+
+        Args:
+            project_finder:
+            work_queue: The queue shared by the nodes.
+            graph_extractor:
+            semantic_annotator:
+            community_extractor:
+            project_exporter:
+            state_store: Store of the completed stages, see CompletePipeline. It must be shared by the nodes too.
+            metrics: Recorder of the metrics of each stage, see CompletePipeline.
+            workers: Number of projects the node processes at once.
+            enqueue: Enqueue the projects returned by the finder before processing the queue. Projects already in the
+                queue are not added again, so every node can enqueue them.
+            reset: Put the projects returned by the finder back in the queue if they are done or failed.
+            wait: Wait for the projects leased by other nodes or waiting for a retry, in case they are put back in the
+                queue, instead of stopping as soon as no project is ready.
+            poll_interval: Maximum number of seconds between two attempts to lease a project while waiting.
+            heartbeat_interval: Seconds between two heartbeats, a third of the lease duration if None.
+        """
+        super().__init__(project_finder, graph_extractor, semantic_annotator, community_extractor, project_exporter,
+                         state_store, metrics)
+        self.work_queue: WorkQueue = work_queue
+        self.workers: int = workers
+        self.enqueue: bool = enqueue
+        self.reset: bool = reset
+        self.wait: bool = wait
+        self.poll_interval: float = poll_interval
+        self.heartbeat_interval: float = heartbeat_interval or work_queue.lease_seconds / 3
+        self._stopping = threading.Event()
+
+    def run(self, num_proj: Optional[int] = 10, stages: Optional[List[str]] = None):
+        """
+        Enqueues the projects returned by the finder (if `enqueue` is set) and processes the queue, see
+        CompletePipeline.run.
+        """
+        plan = self.plan(stages)
+        if self.enqueue:
+            self.enqueue_projects(num_proj)
+
+        prefix = f"{socket.gethostname()}-{os.getpid()}"
+        threads = [threading.Thread(target=self._work, args=(plan, f"{prefix}-{n}"), name=f"worker-{n}")
+                   for n in range(self.workers)]
+        logger.info(f"Starting distributed pipeline with {self.workers} workers on {prefix}")
+        for thread in threads:
+            thread.start()
+        try:
+            for thread in threads:
+                thread.join()
+        except KeyboardInterrupt:
+            logger.warning("Stopping, the workers finish their current stage and put their project back in the queue")
+            self._stopping.set()
+            for thread in threads:
+                thread.join()
+            raise
+
+        logger.info(f"Finished distributed pipeline, projects in the queue: {self.work_queue.counts()}")
+        if self.metrics is not None:
+            self.metrics.summary()
+
+    def enqueue_projects(self, num_proj: Optional[int] = 10) -> int:
+        """
+        Adds the projects returned by the finder to the queue and returns the number of projects added.
+        """
+        added = self.work_queue.enqueue(self.find_projects(num_proj), self.reset)
+        logger.info(f"Enqueued {added} projects, projects in the queue: {self.work_queue.counts()}")
+        return added
+
+    def _work(self, plan: List[Tuple[str, bool]], worker: str):
+        """
+        Worker loop: leases projects and processes them until no project is left (or ready, without `wait`).
+        When the queue cannot be reached (e.g. its database stays locked), the worker tries again after the poll
+        interval. A project whose outcome could not be reported stays leased until its lease expires.
+        """
+        while not self._stopping.is_set():
+            try:
+                lease = self.work_queue.lease(worker)
+                if lease is not None:
+                    self._process(lease, plan)
+                    continue
+                ready = self.work_queue.next_ready()
+            except sqlite3.OperationalError as exc:
+                logger.warning(f"Worker {worker} could not reach the work queue ({exc}), retrying in "
+                               f"{self.poll_interval}s")
+                self._stopping.wait(self.poll_interval)
+                continue
+            if ready is None or not self.wait:
+                break
+            self._stopping.wait(min(self.poll_interval, max(ready - time.time(), 1)))
+
+    def _process(self, lease: Lease, plan: List[Tuple[str, bool]]):
+        """
+        Runs the stages on a leased project, renewing the lease from a background thread, and reports the outcome to
+        the queue. The stages are abandoned if the lease is lost, or if it could not be renewed before it expires.
+        """
+        project: Project = lease.project
+        logger.info(f"Worker {lease.worker} leased project `{project.name}` (attempt {lease.attempt})")
+        done = threading.Event()
+        lost = threading.Event()
+
+        def heartbeat():
+            expires_at = lease.expires_at
+            while not done.wait(self.heartbeat_interval):
+                now = time.time()
+                try:
+                    renewed = self.work_queue.heartbeat(lease)
+                except sqlite3.OperationalError as exc:
+                    # Retried at the next heartbeat while the lease lasts, otherwise another worker may lease the
+                    # project while this one still processes it.
+                    if time.time() + self.heartbeat_interval < expires_at:
+                        logger.warning(f"Failed to renew the lease of project `{project.name}` ({exc}), retrying")
+                        continue
+                    logger.error(f"Failed to renew the lease of project `{project.name}` before it expires ({exc})")
+                    renewed = False
+                if not renewed:
+                    lost.set()
+                    return
+                expires_at = now + self.work_queue.lease_seconds
+
+        beating = threading.Thread(target=heartbeat, name=f"heartbeat-{lease.worker}", daemon=True)
+        beating.start()
+        try:
+            context = {}
+            for name, run in plan:
+                if lost.is_set():
+                    raise LeaseLost(f"Lost the lease of project `{project.name}` before stage `{name}`")
+                if self._stopping.is_set():
+                    self.work_queue.release(lease)
+                    logger.info(f"Put project `{project.name}` back in the queue")
+                    return
+                if run:
+                    project, context = self.run_stage(name, project, context)
+                else:
+                    project, context = self.resume_stage(name, project, context)
+        except LeaseLost as exc:
+            logger.warning(f"{exc}, another worker processes it")
+            return
+        except Exception as exc:
+            retried = lease.attempt < self.work_queue.max_attempts
+            logger.error(f"Project `{project.name}` failed (attempt {lease.attempt}/{self.work_queue.max_attempts}"
+                         f"{', will be retried' if retried else ''}): {exc}")
+            self.work_queue.fail(lease, f"{type(exc).__name__}: {exc}")
+            return
+        except BaseException:
+            self.work_queue.release(lease)
+            raise
+        finally:
+            done.set()
+            beating.join()
+
+        if lost.is_set() or not self.work_queue.complete(lease):
+            logger.warning(f"Lost the lease of project `{project.name}` while processing it")
+        else:
+            logger.info(f"Worker {lease.worker} completed project `{project.name}`")
@@ -0,0 +1,227 @@
+import cProfile
+import csv
+import json
+import os
+import resource
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+from loguru import logger
+
+from entities import Project
+
+FIELDS = ["project", "stage", "status", "started_at", "wall_time", "cpu_time", "children_cpu_time", "max_rss_mb",
+          "children_max_rss_mb", "nodes", "edges", "files", "communities", "cache_hits", "cache_misses"]
+
+
+def _children_cpu() -> float:
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+def _rss() -> Optional[int]:
+    """
+    Returns the current resident set size of the process in bytes, None where /proc is not available.
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _max_rss() -> int:
+    # ru_maxrss is in KB on Linux.
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class PeakRSS:
+    """
+    Measures the peak RSS of the process while a stage runs. ru_maxrss is the peak of the whole lifetime of the process,
+    so it only tells the peak of the stage when the stage raised it. Otherwise the peak is the largest RSS sampled by a
+    background thread every `interval` seconds, which may miss spikes shorter than the interval.
+    Stages running at the same time in the threads of a process share its memory, so each of them sees their combined
+    peak.
+    """
+
+    def __init__(self, interval: float = 0.05):
+        self.interval = interval
+        self.peak: Optional[int] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lifetime_peak = 0
+
+    def __enter__(self) -> 'PeakRSS':
+        self._lifetime_peak = _max_rss()
+        self.peak = _rss()
+        if self.peak is not None:
+            self._thread = threading.Thread(target=self._sample, name="rss-sampler", daemon=True)
+            self._thread.start()
+        return self
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, _rss() or 0)
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self.peak = max(self.peak, _rss() or 0)
+        lifetime_peak = _max_rss()
+        if lifetime_peak > self._lifetime_peak or self.peak is None:
+            self.peak = lifetime_peak
+
+
+def measure(stage: Callable[[Project], Project], project: Project,
+            cache_counters: Callable[[], Tuple[int, int]] = lambda: (0, 0),
+            profile_path: Optional[str] = None) -> Tuple[Project, Dict[str, Any]]:
+    """
+    Runs a stage on a project and measures it, in the thread (or worker process) running the stage.
+    The CPU time is the one of the calling thread, the children CPU time the one of the subprocesses (e.g. Arcan) that
+    terminated during the stage. The peak RSS is the one of the process during the stage (see PeakRSS), the children
+    peak RSS the one of its largest subprocess so far.
+
+    Args:
+        stage: The stage.
+        project: The project.
+        cache_counters: Returns the hits and misses of the caches used by the stage.
+        profile_path: If given, the stage runs under cProfile and the profile is saved to this file.
+
+    Returns:
+        The project after the stage and its measurements.
+    """
+    hits, misses = cache_counters()
+    children_cpu = _children_cpu()
+    started_at = time.time()
+    start, cpu = time.perf_counter(), time.thread_time()
+
+    with PeakRSS() as rss:
+        if profile_path is None:
+            project = stage(project)
+        else:
+            profiler = cProfile.Profile()
+            project = profiler.runcall(stage, project)
+            profiler.dump_stats(profile_path)
+
+    wall, cpu = time.perf_counter() - start, time.thread_time() - cpu
+    hits_after, misses_after = cache_counters()
+    graph = project.dep_graph
+    sample = {
+        "started_at": started_at,
+        "wall_time": wall,
+        "cpu_time": cpu,
+        "children_cpu_time": _children_cpu() - children_cpu,
+        "max_rss_mb": rss.peak / 2 ** 20,
+        # ru_maxrss is in KB on Linux.
+        "children_max_rss_mb": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024,
+        "nodes": graph.num_nodes if graph is not None else None,
+        "edges": graph.num_edges if graph is not None else None,
+        "files": len(project.files) if project.files is not None else None,
+        "communities": sum(m.num_communities for m in project.communities.values())
+        if project.communities is not None else None,
+        "cache_hits": hits_after - hits,
+        "cache_misses": misses_after - misses,
+    }
+    return project, sample
+
+
+class MetricsRecorder:
+    """
+    Records a row of metrics for every stage run on a project (wall time, CPU time, peak RSS, size of the graph and
+    number of files and communities after the stage, cache hits) and appends it to a CSV or JSON Lines file as soon
+    as the stage completes. At the end of a run it logs a summary of each stage, to size the workers of the
+    ConcurrentPipeline and spot regressions.
+    Optionally each stage runs under cProfile, with the profiles saved as `<project>.<stage>.prof` files.
+    """
+
+    def __init__(self, path: str, profile_dir: Optional[str] = None):
+        """
+        Initializes the MetricsRecorder instance.
+
+        Args:
+            path: The metrics file, JSON Lines if it ends with `.jsonl` or `.json`, CSV otherwise.
+            profile_dir: The directory where the cProfile profiles are saved, no profiling if None.
+        """
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.profile_dir = Path(profile_dir) if profile_dir else None
+        if self.profile_dir:
+            self.profile_dir.mkdir(parents=True, exist_ok=True)
+        self.rows: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        # Only the parent process records rows, worker processes use the profile directory.
+        return {**self.__dict__, "rows": [], "_lock": None}
+
+    def profile_path(self, project: Project, stage: str) -> Optional[str]:
+        if self.profile_dir is None:
+            return None
+        return str(self.profile_dir / f"{project.name.replace('/', '_')}.{stage}.prof")
+
+    def record(self, project: Project, stage: str, status: str, sample: Optional[Dict[str, Any]] = None):
+        """
+        Records the metrics of a stage.
+
+        Args:
+            project: The project.
+            stage: The name of the stage.
+            status: `ok`, `skipped` or `failed`.
+            sample: The measurements returned by `measure`.
+        """
+        row = {field: None for field in FIELDS}
+        row.update(sample or {})
+        row.update(project=project.name, stage=stage, status=status)
+        with self._lock:
+            self.rows.append(row)
+            self._append(row)
+
+    def _append(self, row: Dict[str, Any]):
+        if self.path.suffix in (".jsonl", ".json"):
+            with open(self.path, "a") as f:
+                f.write(json.dumps(row) + "\n")
+            return
+
+        new = not self.path.exists() or self.path.stat().st_size == 0
+        with open(self.path, "a", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=FIELDS)
+            if new:
+                writer.writeheader()
+            writer.writerow(row)
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Returns, for each stage, the number of runs by status and statistics of the completed runs, and logs them.
+        """
+        stats: Dict[str, Dict[str, Any]] = {}
+        with self._lock:
+            rows = list(self.rows)
+        for stage in dict.fromkeys(row["stage"] for row in rows):
+            stage_rows = [row for row in rows if row["stage"] == stage]
+            done = [row for row in stage_rows if row["status"] == "ok"]
+            wall = np.array([row["wall_time"] for row in done], dtype=float)
+            stats[stage] = {
+                **{status: sum(row["status"] == status for row in stage_rows) for status in ["ok", "skipped", "failed"]},
+                "wall_total": float(wall.sum()),
+                "wall_mean": float(wall.mean()) if len(wall) else None,
+                "wall_p95": float(np.percentile(wall, 95)) if len(wall) else None,
+                "wall_max": float(wall.max()) if len(wall) else None,
+                "cpu_total": float(sum(row["cpu_time"] + row["children_cpu_time"] for row in done)),
+                "max_rss_mb": max((row["max_rss_mb"] for row in done), default=None),
+                "cache_hits": sum(row["cache_hits"] for row in done),
+                "cache_misses": sum(row["cache_misses"] for row in done),
+            }
+
+        for stage, s in stats.items():
+            if s["ok"]:
+                logger.info(f"Stage `{stage}`: {s['ok']} ok, {s['skipped']} skipped, {s['failed']} failed, "
+                            f"wall {s['wall_total']:.1f}s (mean {s['wall_mean']:.1f}s, p95 {s['wall_p95']:.1f}s, "
+                            f"max {s['wall_max']:.1f}s), cpu {s['cpu_total']:.1f}s, peak rss {s['max_rss_mb']:.0f} MB, "
+                            f"cache {s['cache_hits']} hits / {s['cache_misses']} misses")
+            else:
+                logger.info(f"Stage `{stage}`: {s['skipped']} skipped, {s['failed']} failed")
+        return stats
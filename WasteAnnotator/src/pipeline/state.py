@@ -0,0 +1,156 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import zlib
+from collections.abc import Mapping
+from pathlib import Path
+from typing import Any, List, NamedTuple, Optional
+
+from entities import Project
+
+
+def fingerprint(*parts: Any) -> str:
+    """
+    Returns a stable hash of JSON-serializable values.
+    """
+    return hashlib.sha1(json.dumps(parts, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def config_of(component: Any) -> Any:
+    """
+    Returns the configuration of a pipeline component: its class and the public attributes holding plain values
+    (numbers, strings, paths, lists, sets and mappings of them). Other objects, e.g. clients or caches, are left out, and so are the
+    attributes listed in the `fingerprint_exclude` of the component's class, which only change how the component runs
+    (e.g. its number of workers) and not its output.
+    """
+
+    def plain(value):
+        if value is None or isinstance(value, (str, int, float, bool)):
+            return value
+        if isinstance(value, Path):
+            return str(value)
+        if isinstance(value, Mapping):
+            return {str(k): plain(v) for k, v in value.items()}
+        if isinstance(value, (list, tuple)) or type(value).__name__ == "ListConfig":
+            return [plain(v) for v in value]
+        if isinstance(value, (set, frozenset)):
+            return sorted((plain(v) for v in value), key=str)
+        return "<object>"
+
+    excluded = getattr(component, "fingerprint_exclude", ())
+    attributes = {k: plain(v) for k, v in vars(component).items() if not k.startswith("_") and k not in excluded}
+    return {"class": type(component).__qualname__,
+            "attributes": {k: v for k, v in attributes.items() if v != "<object>"}}
+
+
+class StageRecord(NamedTuple):
+    """
+    A stage completed for a project, with the fingerprint of its inputs and of its output.
+    """
+    input_fingerprint: str
+    output_fingerprint: str
+    completed_at: float
+
+
+class StateStore:
+    """
+    SQLite store of the pipeline stages completed for each project. For each stage it records the fingerprint of its
+    inputs, the fingerprint of its output and a compressed snapshot of the fields of the project it produced, so that a
+    later run can skip the stages whose inputs did not change and resume after the last completed stage.
+    """
+
+    def __init__(self, path: str, wal: bool = True):
+        """
+        Initializes the StateStore instance.
+
+        Args:
+            path: The path of the SQLite database, created if missing.
+            wal: Use write-ahead logging, which lets readers and a writer run at the same time. WAL needs memory
+                shared by all the processes using the database, so it must be disabled when processes on several
+                machines use it (e.g. the DistributedPipeline on a network volume).
+        """
+        self.path = path
+        self.wal = wal
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _connection(self) -> sqlite3.Connection:
+        # Opened on first use, so that copies of the store sent to worker processes do not hold a connection.
+        if self._conn is not None:
+            return self._conn
+        self._conn = sqlite3.connect(self.path, timeout=60, check_same_thread=False, isolation_level=None)
+        self._conn.execute(f"PRAGMA journal_mode={'WAL' if self.wal else 'DELETE'}")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS stage_state (
+                project      TEXT NOT NULL,
+                stage        TEXT NOT NULL,
+                input_fp     TEXT NOT NULL,
+                output_fp    TEXT NOT NULL,
+                snapshot     BLOB,
+                completed_at REAL NOT NULL,
+                PRIMARY KEY (project, stage)
+            )""")
+        return self._conn
+
+    def __getstate__(self):
+        # Connections cannot be sent to worker processes.
+        return {"path": self.path, "wal": self.wal}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def get(self, project: str, stage: str) -> Optional[StageRecord]:
+        with self._lock:
+            row = self._connection().execute("SELECT input_fp, output_fp, completed_at FROM stage_state "
+                                             "WHERE project = ? AND stage = ?", (project, stage)).fetchone()
+        return StageRecord(*row) if row else None
+
+    def save(self, project: Project, stage: str, input_fp: str, output_fp: str, fields: List[str]):
+        """
+        Records the completion of a stage.
+
+        Args:
+            project: The project, after the stage.
+            stage: The name of the stage.
+            input_fp: The fingerprint of the inputs of the stage.
+            output_fp: The fingerprint of the output of the stage.
+            fields: The fields of the project set by the stage, stored in the snapshot.
+        """
+        snapshot = None
+        if fields:
+            data = project.model_dump_json(include={"name", "remote", *fields})
+            snapshot = zlib.compress(data.encode(), 3)
+        with self._lock:
+            self._connection().execute("INSERT OR REPLACE INTO stage_state VALUES (?, ?, ?, ?, ?, ?)",
+                                       (project.name, stage, input_fp, output_fp, snapshot, time.time()))
+
+    def restore(self, project: Project, stage: str, fields: List[str]) -> Project:
+        """
+        Sets the fields of the project produced by a completed stage from its snapshot.
+
+        Args:
+            project: The project to update.
+            stage: The name of the stage.
+            fields: The fields of the project set by the stage.
+        """
+        if not fields:
+            return project
+        with self._lock:
+            row = self._connection().execute("SELECT snapshot FROM stage_state WHERE project = ? AND stage = ?",
+                                             (project.name, stage)).fetchone()
+        if row is None or row[0] is None:
+            raise ValueError(f"No snapshot of stage {stage} for project {project.name}")
+
+        restored = Project.model_validate_json(zlib.decompress(row[0]))
+        for field in fields:
+            setattr(project, field, getattr(restored, field))
+        return project
+
+    def clear(self, project: str):
+        with self._lock:
+            self._connection().execute("DELETE FROM stage_state WHERE project = ?", (project,))
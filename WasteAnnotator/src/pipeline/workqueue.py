@@ -0,0 +1,205 @@
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterable, NamedTuple, Optional
+
+from entities import Project
+
+PENDING = "pending"
+LEASED = "leased"
+DONE = "done"
+FAILED = "failed"
+
+
+class Lease(NamedTuple):
+    """
+    A project leased by a worker, until `expires_at` unless the worker renews it.
+    """
+    project: Project
+    worker: str
+    attempt: int
+    expires_at: float
+
+
+class WorkQueue:
+    """
+    SQLite queue of the projects to process, shared by the workers of a DistributedPipeline running on one or several
+    machines that mount the same volume. A worker leases a project for `lease_seconds` and renews the lease with
+    heartbeats while it processes it. When the worker completes the project it is marked done. A failed project is
+    retried after a delay, up to `max_attempts` times. A project whose lease expired (e.g. its worker crashed) is
+    leased again by another worker, which counts as a failed attempt.
+    Transactions take the database lock before reading, so two workers never lease the same project. Leases are
+    compared to the clock of each machine, so the clocks must agree to well within `lease_seconds`.
+    """
+
+    def __init__(self, path: str, lease_seconds: float = 900, max_attempts: int = 3, retry_delay: float = 60):
+        """
+        Initializes the WorkQueue instance.
+
+        Args:
+            path: The path of the SQLite database, created if missing.
+            lease_seconds: Seconds a lease lasts without heartbeat.
+            max_attempts: Number of times a project is leased before it is marked failed.
+            retry_delay: Seconds before a failed project is leased again, doubled after each attempt.
+        """
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _connection(self) -> sqlite3.Connection:
+        # Opened on first use, so that copies of the queue sent to worker processes do not hold a connection.
+        if self._conn is not None:
+            return self._conn
+        self._conn = sqlite3.connect(self.path, timeout=60, check_same_thread=False, isolation_level=None)
+        # WAL needs shared memory, which processes on different machines do not have.
+        self._conn.execute("PRAGMA journal_mode=DELETE")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS work_queue (
+                project      TEXT PRIMARY KEY,
+                data         TEXT NOT NULL,
+                status       TEXT NOT NULL,
+                attempts     INTEGER NOT NULL DEFAULT 0,
+                worker       TEXT,
+                lease_until  REAL,
+                not_before   REAL NOT NULL DEFAULT 0,
+                error        TEXT,
+                enqueued_at  REAL NOT NULL,
+                updated_at   REAL NOT NULL
+            )""")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS work_queue_status ON work_queue (status, not_before)")
+        return self._conn
+
+    def __getstate__(self):
+        # Connections cannot be sent to worker processes.
+        return {k: v for k, v in self.__dict__.items() if k not in ("_lock", "_conn")}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _write(self, sql: str, params: tuple) -> int:
+        with self._lock:
+            return self._connection().execute(sql, params).rowcount
+
+    def enqueue(self, projects: Iterable[Project], reset: bool = False) -> int:
+        """
+        Adds projects to the queue, ignoring the ones already in it, so that several nodes can enqueue the projects
+        returned by their finder.
+
+        Args:
+            projects: The projects to add.
+            reset: Put the projects already done or failed back in the queue, with their attempts reset.
+
+        Returns:
+            The number of projects added or put back.
+        """
+        added = 0
+        for project in projects:
+            now = time.time()
+            data = project.model_dump_json(exclude={"files", "dep_graph", "communities"})
+            added += self._write("INSERT OR IGNORE INTO work_queue (project, data, status, enqueued_at, updated_at) "
+                                 "VALUES (?, ?, ?, ?, ?)", (project.name, data, PENDING, now, now))
+            if reset:
+                added += self._write("UPDATE work_queue SET data = ?, status = ?, attempts = 0, worker = NULL, "
+                                     "lease_until = NULL, not_before = 0, error = NULL, updated_at = ? "
+                                     "WHERE project = ? AND status IN (?, ?)",
+                                     (data, PENDING, now, project.name, DONE, FAILED))
+        return added
+
+    def lease(self, worker: str) -> Optional[Lease]:
+        """
+        Leases the next project ready to be processed, or returns None if there is none right now. Projects whose lease
+        expired are leased again, or marked failed if they used all their attempts.
+        """
+        with self._lock:
+            conn = self._connection()
+            now = time.time()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute("UPDATE work_queue SET status = ?, error = 'lease expired', worker = NULL, updated_at = ? "
+                             "WHERE status = ? AND lease_until < ? AND attempts >= ?",
+                             (FAILED, now, LEASED, now, self.max_attempts))
+                row = conn.execute("SELECT project, data, attempts FROM work_queue "
+                                   "WHERE (status = ? AND not_before <= ?) OR (status = ? AND lease_until < ?) "
+                                   "ORDER BY enqueued_at, project LIMIT 1",
+                                   (PENDING, now, LEASED, now)).fetchone()
+                if row is None:
+                    conn.execute("COMMIT")
+                    return None
+                name, data, attempts = row
+                expires_at = now + self.lease_seconds
+                conn.execute("UPDATE work_queue SET status = ?, attempts = ?, worker = ?, lease_until = ?, "
+                             "updated_at = ? WHERE project = ?",
+                             (LEASED, attempts + 1, worker, expires_at, now, name))
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        return Lease(Project.model_validate_json(data), worker, attempts + 1, expires_at)
+
+    def heartbeat(self, lease: Lease) -> bool:
+        """
+        Renews a lease. Returns False if the worker lost it, e.g. because it expired and another worker leased the
+        project, in which case the worker must stop processing the project.
+        """
+        now = time.time()
+        return self._write("UPDATE work_queue SET lease_until = ?, updated_at = ? "
+                           "WHERE project = ? AND status = ? AND worker = ? AND attempts = ?",
+                           (now + self.lease_seconds, now, lease.project.name, LEASED, lease.worker,
+                            lease.attempt)) == 1
+
+    def complete(self, lease: Lease) -> bool:
+        """
+        Marks the project of a lease done. Returns False if the worker no longer held the lease.
+        """
+        return self._finish(lease, DONE, None, 0)
+
+    def fail(self, lease: Lease, error: str) -> bool:
+        """
+        Puts the project of a lease back in the queue after the retry delay, or marks it failed if it used all its
+        attempts. Returns False if the worker no longer held the lease.
+        """
+        if lease.attempt >= self.max_attempts:
+            return self._finish(lease, FAILED, error, 0)
+        return self._finish(lease, PENDING, error, time.time() + self.retry_delay * 2 ** (lease.attempt - 1))
+
+    def release(self, lease: Lease) -> bool:
+        """
+        Puts the project of a lease back in the queue without counting the attempt, e.g. when the worker stops.
+        """
+        return self._write("UPDATE work_queue SET status = ?, attempts = attempts - 1, worker = NULL, "
+                           "lease_until = NULL, updated_at = ? "
+                           "WHERE project = ? AND status = ? AND worker = ? AND attempts = ?",
+                           (PENDING, time.time(), lease.project.name, LEASED, lease.worker, lease.attempt)) == 1
+
+    def _finish(self, lease: Lease, status: str, error: Optional[str], not_before: float) -> bool:
+        return self._write("UPDATE work_queue SET status = ?, error = ?, not_before = ?, worker = NULL, "
+                           "lease_until = NULL, updated_at = ? "
+                           "WHERE project = ? AND status = ? AND worker = ? AND attempts = ?",
+                           (status, error, not_before, time.time(), lease.project.name, LEASED, lease.worker,
+                            lease.attempt)) == 1
+
+    def counts(self) -> Dict[str, int]:
+        """
+        Returns the number of projects in each status.
+        """
+        with self._lock:
+            rows = self._connection().execute("SELECT status, COUNT(*) FROM work_queue GROUP BY status").fetchall()
+        return {PENDING: 0, LEASED: 0, DONE: 0, FAILED: 0, **dict(rows)}
+
+    def next_ready(self) -> Optional[float]:
+        """
+        Returns the time at which a project can next be leased: now if one is ready, the end of a retry delay or of a
+        lease otherwise, and None if every project is done or failed.
+        """
+        with self._lock:
+            row = self._connection().execute(
+                "SELECT MIN(CASE status WHEN ? THEN not_before ELSE lease_until END) FROM work_queue "
+                "WHERE status IN (?, ?)", (PENDING, PENDING, LEASED)).fetchone()
+        return row[0]
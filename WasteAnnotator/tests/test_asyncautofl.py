@@ -0,0 +1,82 @@
+import json
+import threading
+from concurrent.futures import TimeoutError
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from annotator.asyncautofl import AsyncAutoFLAnnotator
+from entities import Project
+
+RESULT = {
+    "versions": [{"files": {"src/A.java": {"path": "src/A.java", "language": "java",
+                                           "annotation": {"distribution": [0.25, 0.75], "unannotated": False}}}}],
+    "taxonomy": {"0": "ui", "1": "db"},
+}
+
+
+class StandInAutoFL(BaseHTTPRequestHandler):
+    """
+    Local stand-in of AutoFL: the batch endpoint only answers for `good` (the other projects are then requested one by
+    one) and the single endpoint answers `good` with a result and any other project with a malformed body.
+    """
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        if self.path == "/label/batch":
+            lines = [json.dumps({"name": p["name"], "result": RESULT}) for p in body["projects"] if p["name"] == "good"]
+            self._send("\n".join(lines) + "\n")
+        elif body["name"] == "good":
+            self._send(json.dumps({"result": RESULT}))
+        else:
+            self._send(json.dumps({"unexpected": True}))
+
+    def _send(self, text: str):
+        data = text.encode()
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), StandInAutoFL)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{httpd.server_port}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def project(name: str) -> Project:
+    return Project(name=name, remote=f"https://github.com/test/{name}", language="JAVA")
+
+
+@pytest.mark.parametrize("batched", [True, False])
+def test_malformed_answer_fails_the_project(server, batched):
+    annotator = AsyncAutoFLAnnotator(endpoint=f"{server}/label/files",
+                                     batch_endpoint=f"{server}/label/batch" if batched else None,
+                                     batch_wait=0.05, timeout=None)
+    try:
+        good, bad = annotator.submit(project("good")), annotator.submit(project("bad"))
+        assert good.result(timeout=10).files["src/A.java"].annotation.distribution == [0.25, 0.75]
+        with pytest.raises(RuntimeError, match="malformed answer for project bad"):
+            bad.result(timeout=10)
+    except TimeoutError:
+        pytest.fail("The annotation of the malformed project never completed")
+    finally:
+        annotator.close()
+
+
+def test_annotate_projects_skips_failed_projects(server):
+    annotator = AsyncAutoFLAnnotator(endpoint=f"{server}/label/files", batch_endpoint=f"{server}/label/batch",
+                                     batch_wait=0.05, timeout=10)
+    try:
+        annotated = list(annotator.annotate_projects([project("bad"), project("good")]))
+    finally:
+        annotator.close()
+    assert [p.name for p in annotated] == ["good"]
+    assert annotated[0].taxonomy == RESULT["taxonomy"]
@@ -0,0 +1,34 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import networkx as nx
+
+from communityextractor import CommunityExtractor
+from entities import GraphModel, Project
+
+# Both projects are in the algorithm at the same time, so that each run overlaps the other one.
+BARRIER = threading.Barrier(2)
+
+
+def connected_components(graph: nx.Graph) -> SimpleNamespace:
+    BARRIER.wait(timeout=10)
+    time.sleep(0.05)
+    return SimpleNamespace(communities=[list(c) for c in nx.connected_components(graph)])
+
+
+def project(name: str, num_nodes: int) -> Project:
+    graph = nx.path_graph([f"{name}{i}" for i in range(num_nodes)])
+    return Project(name=name, remote=f"https://example.com/{name}", dep_graph=GraphModel.from_graph(graph))
+
+
+def test_concurrent_projects_use_their_own_graph():
+    extractor = CommunityExtractor({"components": {"function": f"{__name__}.connected_components"}})
+    projects = [project("small", 15), project("large", 35)]
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        list(pool.map(extractor.extract, projects))
+
+    for p, num_nodes in zip(projects, [15, 35]):
+        membership = p.communities["components"]
+        assert membership.labels.tolist() == [0] * num_nodes
@@ -0,0 +1,62 @@
+import networkx as nx
+import pytest
+
+from entities import GraphModel
+from graphextractor.graphml import read_graphml
+
+KEYS = """
+  <key id="d0" for="node" attr.name="name" attr.type="string"/>
+  <key id="d1" for="node" attr.name="size" attr.type="int"/>
+  <key id="d2" for="edge" attr.name="dependencyType" attr.type="string"/>
+  <key id="d3" for="edge" attr.name="weight" attr.type="double"/>
+  <key id="d4" for="all" attr.name="external" attr.type="boolean"/>
+"""
+
+# Parallel edges, edges in both directions and nodes only referenced by edges (c, then d).
+DIRECTED = f"""<?xml version="1.0" encoding="UTF-8"?>
+<graphml xmlns="http://graphml.graphdrawing.org/xmlns">{KEYS}
+  <graph id="G" edgedefault="directed">
+    <node id="b"><data key="d0">B</data><data key="d1">2</data></node>
+    <node id="a"><data key="d0">A</data><data key="d4">true</data></node>
+    <edge id="e0" source="a" target="b"><data key="d2">calls</data><data key="d3">1.5</data></edge>
+    <edge id="e1" source="b" target="c"><data key="d2">imports</data></edge>
+    <edge id="e2" source="a" target="b"><data key="d2">extends</data><data key="d4">false</data></edge>
+    <edge id="e3" source="b" target="a"><data key="d3">2</data></edge>
+    <edge id="e4" source="d" target="a"><data key="d2">calls</data></edge>
+  </graph>
+</graphml>
+"""
+
+# Edges listed from either endpoint, without parallel edges so that networkx keeps their ids.
+UNDIRECTED = f"""<?xml version="1.0" encoding="UTF-8"?>
+<graphml xmlns="http://graphml.graphdrawing.org/xmlns">{KEYS}
+  <graph id="G" edgedefault="undirected">
+    <node id="c"><data key="d1">3</data></node>
+    <node id="a"><data key="d0">A</data></node>
+    <edge id="e0" source="c" target="a"><data key="d2">calls</data></edge>
+    <edge id="e1" source="b" target="c"><data key="d3">0.5</data></edge>
+    <edge id="e2" source="a" target="b"><data key="d2">imports</data></edge>
+  </graph>
+</graphml>
+"""
+
+
+def as_dict(graph: GraphModel) -> dict:
+    return {
+        "nodes": graph.nodes,
+        "src": graph.src.tolist(),
+        "dst": graph.dst.tolist(),
+        "node_attrs": {name: column.to_list() for name, column in graph.node_attrs.items()},
+        "edge_attrs": {name: column.to_list() for name, column in graph.edge_attrs.items()},
+    }
+
+
+@pytest.mark.parametrize("document", [DIRECTED, UNDIRECTED], ids=["directed", "undirected"])
+@pytest.mark.parametrize("node_keys, edge_keys", [(None, None), (["size"], ["weight", "id"]), ([], ["missing"])],
+                         ids=["all", "filtered", "none"])
+def test_read_graphml_matches_networkx(tmp_path, document, node_keys, edge_keys):
+    path = tmp_path / "graph.graphml"
+    path.write_text(document)
+
+    expected = GraphModel.from_graph(nx.read_graphml(path), node_keys, edge_keys)
+    assert as_dict(read_graphml(path, node_keys, edge_keys)) == as_dict(expected)
@@ -0,0 +1,71 @@
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from httpclient import HTTPClient
+
+
+class Flaky(BaseHTTPRequestHandler):
+    """
+    Answers /error with a server error, /slow after a delay and /limited with a rate limit, and counts the requests.
+    """
+    received = []
+
+    def _answer(self):
+        self.received.append((self.command, self.path))
+        if self.headers.get("Content-Length"):
+            self.rfile.read(int(self.headers["Content-Length"]))
+        if self.path == "/slow":
+            time.sleep(0.5)
+        status = {"/error": 503, "/limited": 429}.get(self.path, 200)
+        self.send_response(status)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    do_GET = do_POST = _answer
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    Flaky.received = []
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Flaky)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{httpd.server_port}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def client() -> HTTPClient:
+    return HTTPClient(read_timeout=0.2, max_retries=2, backoff_factor=0)
+
+
+def test_get_is_retried_on_server_errors_and_timeouts(server):
+    assert client().get(f"{server}/error").status_code == 503
+    with pytest.raises(requests.Timeout):
+        client().get(f"{server}/slow")
+    assert Flaky.received == [("GET", "/error")] * 3 + [("GET", "/slow")] * 3
+
+
+def test_post_is_not_sent_again_once_received(server):
+    assert client().post(f"{server}/error", json={}).status_code == 503
+    with pytest.raises(requests.Timeout):
+        client().post(f"{server}/slow", json={})
+    assert client().post(f"{server}/limited", json={}).status_code == 429
+    assert Flaky.received == [("POST", "/error"), ("POST", "/slow")] + [("POST", "/limited")] * 3
+
+
+def test_post_is_retried_when_the_connection_fails():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    http = client()
+    with pytest.raises(requests.ConnectionError):
+        http.post(f"http://127.0.0.1:{port}/label", json={})
+    assert http.stats.retries == 2
@@ -0,0 +1,31 @@
+from pathlib import Path
+
+from pipeline import CompletePipeline
+from pipeline.state import config_of
+from entities import Project
+
+
+class Component:
+    fingerprint_exclude = frozenset({"workers"})
+
+    def __init__(self, out_dir: str, exclude_keys=(), workers: int = 1):
+        self.out_dir = Path(out_dir)
+        self.exclude_keys = set(exclude_keys)
+        self.workers = workers
+        self.client = object()
+
+
+def test_config_of_keeps_paths_and_sets():
+    config = config_of(Component("/out", {"files", "communities"}, workers=4))
+    assert config == {"class": "Component",
+                      "attributes": {"out_dir": "/out", "exclude_keys": ["communities", "files"]}}
+    assert config_of(Component("/out")) != config_of(Component("/other"))
+    assert config_of(Component("/out", {"files"})) != config_of(Component("/out"))
+    assert config_of(Component("/out", workers=1)) == config_of(Component("/out", workers=8))
+
+
+def test_graph_fingerprint_depends_on_the_extractor():
+    project = Project(name="p", remote="https://example.com/p", pushed_at="2024-01-01")
+    first = CompletePipeline(None, graph_extractor=Component("/a"))
+    second = CompletePipeline(None, graph_extractor=Component("/b"))
+    assert first.input_fingerprint("graph", project, {}) != second.input_fingerprint("graph", project, {})
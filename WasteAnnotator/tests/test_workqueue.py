@@ -0,0 +1,168 @@
+import sqlite3
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from entities import Project
+from pipeline import workqueue
+from pipeline.distributed import DistributedPipeline
+from pipeline.workqueue import DONE, FAILED, LEASED, PENDING, WorkQueue
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(workqueue, "time", SimpleNamespace(time=clock.time))
+    return clock
+
+
+@pytest.fixture
+def queue(tmp_path, clock):
+    queue = WorkQueue(str(tmp_path / "queue.sqlite"), lease_seconds=100, max_attempts=2, retry_delay=10)
+    queue.enqueue(project(name) for name in ["a", "b"])
+    return queue
+
+
+def project(name: str) -> Project:
+    return Project(name=name, remote=f"https://github.com/test/{name}")
+
+
+def test_enqueue_ignores_queued_projects_unless_reset(queue):
+    assert queue.enqueue([project("a"), project("c")]) == 1
+    queue.complete(queue.lease("w1"))
+    assert queue.enqueue([project("a")]) == 0
+    assert queue.enqueue([project("a")], reset=True) == 1
+    assert queue.counts() == {PENDING: 3, LEASED: 0, DONE: 0, FAILED: 0}
+
+
+def test_lease_is_exclusive_until_it_expires(queue, clock):
+    first, second = queue.lease("w1"), queue.lease("w2")
+    assert (first.project.name, second.project.name) == ("a", "b")
+    assert queue.lease("w3") is None
+    assert queue.next_ready() == first.expires_at
+
+    clock.now += 60
+    assert queue.heartbeat(first)
+    clock.now += 60
+    # Only the lease of `b` expired, `a` was renewed.
+    again = queue.lease("w3")
+    assert (again.project.name, again.attempt) == ("b", 2)
+    assert not queue.heartbeat(second)
+    assert not queue.complete(second)
+    assert queue.complete(again)
+    assert queue.complete(first)
+    assert queue.counts()[DONE] == 2
+    assert queue.next_ready() is None
+
+
+def test_expired_lease_fails_after_the_last_attempt(queue, clock):
+    queue.lease("w1"), queue.lease("w1")
+    clock.now += 101
+    queue.lease("w2"), queue.lease("w2")
+    clock.now += 101
+    assert queue.lease("w3") is None
+    assert queue.counts() == {PENDING: 0, LEASED: 0, DONE: 0, FAILED: 2}
+
+
+def test_failed_project_is_retried_after_the_delay(queue, clock):
+    lease = queue.lease("w1")
+    assert queue.fail(lease, "boom")
+    assert queue.lease("w1").project.name == "b"
+    assert queue.lease("w1") is None
+    assert queue.next_ready() == clock.now + 10
+
+    clock.now += 10
+    retry = queue.lease("w2")
+    assert (retry.project.name, retry.attempt) == ("a", 2)
+    assert queue.fail(retry, "boom")
+    assert queue.counts()[FAILED] == 1
+
+
+def test_release_does_not_count_the_attempt(queue):
+    lease = queue.lease("w1")
+    assert queue.release(lease)
+    assert not queue.complete(lease)
+    assert queue.lease("w2").attempt == 1
+
+
+class LockedQueue(WorkQueue):
+    """
+    Queue whose heartbeats fail with a locked database `failures` times.
+    """
+
+    def __init__(self, path: str, failures: int):
+        super().__init__(path, lease_seconds=0.5)
+        self.failures = failures
+        self.renewed = 0
+
+    def heartbeat(self, lease) -> bool:
+        if self.failures > 0:
+            self.failures -= 1
+            raise sqlite3.OperationalError("database is locked")
+        renewed = super().heartbeat(lease)
+        self.renewed += renewed
+        return renewed
+
+
+class Stage:
+    def __init__(self, seconds: float = 0):
+        self.seconds = seconds
+        self.calls = 0
+
+    def extract_graph(self, project: Project) -> Project:
+        self.calls += 1
+        threading.Event().wait(self.seconds)
+        return project
+
+    annotate_project = extract_graph
+
+
+def run(queue: WorkQueue, graph: Stage, annotation: Stage):
+    pipeline = DistributedPipeline(None, queue, graph_extractor=graph, semantic_annotator=annotation, enqueue=False,
+                                   wait=False, heartbeat_interval=0.1)
+    queue.enqueue([project("a")])
+    pipeline.run(stages=["graph", "annotation"])
+
+
+def test_heartbeat_is_retried_while_the_lease_lasts(tmp_path):
+    queue = LockedQueue(str(tmp_path / "queue.sqlite"), failures=2)
+    graph, annotation = Stage(0.6), Stage()
+    run(queue, graph, annotation)
+    assert queue.renewed > 0
+    assert (graph.calls, annotation.calls) == (1, 1)
+    assert queue.counts()[DONE] == 1
+
+
+def test_project_is_abandoned_when_the_lease_cannot_be_renewed(tmp_path):
+    queue = LockedQueue(str(tmp_path / "queue.sqlite"), failures=100)
+    graph, annotation = Stage(0.6), Stage()
+    run(queue, graph, annotation)
+    # Each attempt outlives its lease and is abandoned after the graph stage, until the project used its attempts.
+    assert (graph.calls, annotation.calls) == (queue.max_attempts, 0)
+    assert queue.counts()[FAILED] == 1
+
+
+def test_worker_survives_a_locked_queue(tmp_path):
+    class Queue(WorkQueue):
+        locked = True
+
+        def lease(self, worker):
+            if self.locked:
+                self.locked = False
+                raise sqlite3.OperationalError("database is locked")
+            return super().lease(worker)
+
+    queue = Queue(str(tmp_path / "queue.sqlite"))
+    pipeline = DistributedPipeline(None, queue, graph_extractor=Stage(), enqueue=False, wait=False, poll_interval=0.01)
+    queue.enqueue([project("a")])
+    pipeline.run(stages=["graph"])
+    assert queue.counts()[DONE] == 1
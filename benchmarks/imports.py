@@ -0,0 +1,117 @@
+"""
+Import time benchmark of the commands of the pipeline.
+
+Each command of `WasteAnnotator/src/main.py` imports the entry point and the modules of the components it
+instantiates with the default configuration. This benchmark imports them in fresh interpreters (`python -X importtime`)
+and records the median import time of each command and the heavy libraries it pulled in. Compared with a previous run,
+it fails if a command got slower than `--max-ratio` times its previous import time, so that an eager import does not
+slip back into the entry point or the package `__init__`s:
+
+    python benchmarks/imports.py --compare benchmarks/results/imports-<previous>.json
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+from run import ROOT, environment
+
+SRC = ROOT / "WasteAnnotator" / "src"
+
+from main import COMMANDS  # noqa: E402
+
+# Module of the `_target_` of each config group in the default configuration.
+TARGETS = {
+    "finder": "finder.github",
+    "pipeline": "pipeline.complete",
+    "graphextractor": "graphextractor.arcan",
+    "annotator": "annotator.autofl",
+    "community": "communityextractor.communityextractor",
+    "exporter": "exporter.json",
+}
+
+# Libraries worth reporting when a command imports them.
+HEAVY = ["networkx", "pandas", "scipy", "igraph", "cdlib", "sqlalchemy", "requests", "git", "numpy", "pydantic"]
+
+
+def modules_of(command: str) -> List[str]:
+    groups, _ = COMMANDS[command]
+    if command == "find":
+        return ["main", TARGETS["finder"]]
+    if command == "enqueue":
+        return ["main", TARGETS["finder"], "pipeline.distributed"]
+    return ["main", TARGETS["finder"], TARGETS["pipeline"], *(TARGETS[group] for group in groups)]
+
+
+def import_time(modules: List[str]) -> Dict[str, Any]:
+    """
+    Imports the modules in a fresh interpreter and returns the total import time in seconds and the heavy libraries
+    that were imported.
+    """
+    out = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {', '.join(modules)}"], cwd=SRC,
+                         capture_output=True, text=True, check=True).stderr
+    total = 0
+    imported = set()
+    for line in out.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if not cumulative.strip().isdigit():
+            continue
+        if not name.startswith("  "):
+            # Top level imports, their cumulative time includes the imports they triggered.
+            total += int(cumulative)
+        imported.add(name.strip())
+    return {"time": total / 1e6, "heavy": [module for module in HEAVY if module in imported]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--commands", nargs="+", default=list(COMMANDS), choices=list(COMMANDS))
+    parser.add_argument("--repeat", type=int, default=7, help="Number of fresh interpreters per command.")
+    parser.add_argument("--out", type=Path, default=Path(__file__).parent / "results",
+                        help="Directory of the results.")
+    parser.add_argument("--compare", type=Path, help="Results of a previous run to compare with.")
+    parser.add_argument("--max-ratio", type=float, default=1.25,
+                        help="Fail if a command is slower than this ratio of its previous import time.")
+    args = parser.parse_args()
+
+    results = []
+    for command in args.commands:
+        modules = modules_of(command)
+        runs = [import_time(modules) for _ in range(args.repeat)]
+        times = [run["time"] for run in runs]
+        results.append({"command": command, "modules": modules, "median": statistics.median(times),
+                        "min": min(times), "heavy": runs[-1]["heavy"]})
+
+    env = environment()
+    args.out.mkdir(parents=True, exist_ok=True)
+    path = args.out / f"imports-{time.strftime('%Y%m%d-%H%M%S')}-{(env['commit'] or 'unknown')[:8]}.json"
+    path.write_text(json.dumps({"created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"), "environment": env,
+                                "results": results}, indent=2))
+    print(f"Saved the results to {path}")
+
+    baseline = {}
+    if args.compare:
+        baseline = {r["command"]: r for r in json.loads(args.compare.read_text())["results"]}
+    regressions = []
+    print(f"{'command':<12} {'baseline':>10} {'current':>10} {'ratio':>7}  heavy imports")
+    for r in results:
+        before = baseline.get(r["command"])
+        ratio = r["median"] / before["median"] if before else None
+        if ratio is not None and ratio > args.max_ratio:
+            regressions.append(r["command"])
+        print(f"{r['command']:<12} {before['median'] if before else float('nan'):>10.3f} {r['median']:>10.3f} "
+              f"{ratio if ratio is not None else float('nan'):>7.2f}  {', '.join(r['heavy'])}")
+
+    if regressions:
+        print(f"Import time regressed over {args.max_ratio}x for {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
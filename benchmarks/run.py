@@ -0,0 +1,270 @@
+"""
+Benchmarks of the pipeline stages on synthetic projects.
+
+Generates Arcan-like GraphML files and AutoFL responses of several sizes and times each stage on them: parsing the
+GraphML into a GraphModel (with the streaming reader and with networkx), converting it to networkx, annotating the
+files, every community detection algorithm of a CommunityExtractor configuration, the JSON export, building the
+component index and the Analysis stats (from the JSON and from the index). Arcan and AutoFL are not called: the
+extractor reads the generated GraphML as if Arcan had produced it and the annotator receives the generated response
+from a stub client, so the benchmarks run offline.
+
+The results are saved as a JSON file with the environment they were measured in, and can be compared with a previous
+run:
+
+    python benchmarks/run.py --sizes small medium --compare benchmarks/results/<previous>.json
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import warnings
+from importlib import metadata
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path[:0] = [str(ROOT / "WasteAnnotator" / "src"), str(ROOT / "Analysis" / "src"), str(Path(__file__).parent)]
+
+from hydra import compose, initialize_config_dir  # noqa: E402
+from hydra.utils import instantiate  # noqa: E402
+from loguru import logger  # noqa: E402
+
+from annotator.autofl import AutoFLAnnotator  # noqa: E402
+from communityextractor import CommunityExtractor  # noqa: E402
+from communityextractor.reduction import GraphReducer  # noqa: E402
+from entities import ComponentIndex, GraphModel, Project  # noqa: E402
+from exporter.json import JSONProjectExporter  # noqa: E402
+from graphextractor.arcan import ArcanGraphExtractor  # noqa: E402
+from stats.simple import SimpleStats  # noqa: E402
+from synthetic import SIZES, Size, annotated_project, autofl_response, generate, write_graphml  # noqa: E402
+
+PACKAGES = ["numpy", "networkx", "pydantic", "cdlib", "igraph", "infomap", "scipy", "pandas"]
+
+
+class StubResponse:
+    def __init__(self, body: bytes):
+        self.status_code = 200
+        self.body = body
+
+    def json(self) -> Any:
+        # Decoded on every call, as requests does, so the benchmark includes the parsing of the response.
+        return json.loads(self.body)
+
+
+class StubClient:
+    """
+    Stands in for the HTTPClient of the AutoFL annotator, answering every request with the same response.
+    """
+
+    def __init__(self, body: bytes):
+        self.body = body
+
+    def post(self, url: str, **kwargs) -> StubResponse:
+        return StubResponse(self.body)
+
+
+class OfflineArcanGraphExtractor(ArcanGraphExtractor):
+    """
+    Reads the GraphML files already in the Arcan output folder, failing instead of starting Arcan.
+    """
+
+    def _run_arcan(self, name, url, language):
+        raise RuntimeError(f"Arcan must not run in the benchmarks (project {name})")
+
+
+def measure(fn: Callable[[Any], Any], setup: Callable[[], Any], repeat: int) -> Dict[str, float]:
+    """
+    Times `fn(setup())` `repeat` times, excluding the setup, and returns statistics of the times in seconds.
+    """
+    times = []
+    for _ in range(repeat):
+        arg = setup()
+        gc.collect()
+        start = time.perf_counter()
+        fn(arg)
+        times.append(time.perf_counter() - start)
+    return {"repeat": repeat, "min": min(times), "median": statistics.median(times), "mean": statistics.fmean(times),
+            "stdev": statistics.stdev(times) if len(times) > 1 else 0.0}
+
+
+def community_config(config: str) -> Dict[str, Any]:
+    """
+    Returns the arguments of a CommunityExtractor configuration of `WasteAnnotator/config/community` that affect its
+    running time: the algorithms, the graph reducer (without cache) and the warm starts. The community cache is left
+    out, so that the algorithms run every time.
+    """
+    with warnings.catch_warnings():
+        # The community configurations have no `_self_` in their defaults list.
+        warnings.simplefilter("ignore", UserWarning)
+        with initialize_config_dir(config_dir=str(ROOT / "WasteAnnotator" / "config"), version_base=None):
+            cfg = compose(config_name=f"community/{config}")
+    algorithms = cfg.community.algorithms
+    reducer = None
+    if cfg.community.get("reducer"):
+        reducer = instantiate(cfg.community.reducer, cache_dir=None)
+    return {"algorithms": {name: dict(algorithms[name]) for name in algorithms}, "reducer": reducer,
+            "warm_start": bool(cfg.community.get("warm_start", False))}
+
+
+def bench_size(name: str, size: Size, work_dir: Path, community: Dict[str, Any], repeat: int,
+               seed: int) -> List[Dict[str, Any]]:
+    project_name = f"bench-{name}"
+    synthetic = generate(size, seed)
+    arcan_out = work_dir / "arcan"
+    graph_dir = arcan_out / "arcanOutput" / project_name
+    graph_dir.mkdir(parents=True)
+    write_graphml(synthetic, graph_dir / f"{project_name}.graphml", seed)
+    body = json.dumps(autofl_response(synthetic, seed)).encode()
+
+    def new_project() -> Project:
+        return Project(name=project_name, remote=f"https://github.com/bench/{project_name}", language="JAVA")
+
+    extractor = OfflineArcanGraphExtractor(arcan_out=f"{arcan_out}/", logs_path=str(work_dir / "logs"))
+    networkx_extractor = OfflineArcanGraphExtractor(arcan_out=f"{arcan_out}/", logs_path=str(work_dir / "logs"),
+                                                    streaming=False)
+    cached_extractor = OfflineArcanGraphExtractor(arcan_out=f"{arcan_out}/", logs_path=str(work_dir / "logs"),
+                                                  cache_dir=str(work_dir / "graph-cache"))
+    annotator = AutoFLAnnotator(endpoint="http://auto-fl.invalid/label/files", client=StubClient(body))
+    exporter = JSONProjectExporter(work_dir / "export")
+    exporter.out_dir.mkdir()
+
+    project = annotator.annotate_project(extractor.extract_graph(new_project()))
+    cached_extractor.extract_graph(new_project())
+    arrays = project.dep_graph.to_arrays()
+    reducer: Optional[GraphReducer] = community["reducer"]
+
+    def fresh_graph() -> GraphModel:
+        # Conversions are cached on the GraphModel, each run gets a new instance.
+        return GraphModel.from_arrays(arrays)
+
+    def converted_project() -> Project:
+        # The (reduced) graph is converted before the timed call, as the CommunityExtractor shares its conversions
+        # between the algorithms.
+        graph = fresh_graph()
+        detected = reducer.reduce(graph).graph if reducer is not None else graph
+        detected.to_graph()
+        detected.to_igraph()
+        return project.model_copy(update={"dep_graph": graph, "communities": None})
+
+    stages: Dict[str, tuple] = {
+        "graph": (extractor.extract_graph, new_project),
+        "graph_networkx": (networkx_extractor.extract_graph, new_project),
+        "graph_cached": (cached_extractor.extract_graph, new_project),
+        "to_graph": (GraphModel.to_graph, fresh_graph),
+        "annotation": (annotator.annotate_project, new_project),
+    }
+    if reducer is not None:
+        stages["reduction"] = (reducer.reduce, fresh_graph)
+
+    for algo, cfg in community["algorithms"].items():
+        community_extractor = CommunityExtractor(algorithms={algo: cfg}, force_run=True, reducer=reducer,
+                                                 warm_start=community["warm_start"])
+        stages[f"community:{algo}"] = (community_extractor.extract, converted_project)
+        project = community_extractor.extract(project)
+    stages["export"] = (exporter.export, lambda: project)
+    labels = project.label_matrix().top_labels()
+    stats_input = annotated_project(synthetic, labels)
+    stages["stats"] = (SimpleStats.stats, lambda: stats_input)
+    stages["component_index"] = (ComponentIndex.build, lambda: project)
+    index_arrays = ComponentIndex.build(project).to_arrays()
+    stages["stats_index"] = (SimpleStats.index_stats, lambda: index_arrays)
+
+    results = []
+    for stage, (fn, setup) in stages.items():
+        logger.info(f"Running `{stage}` on {name} ({size.files} files, {size.edges} edges)")
+        results.append({"size": name, "files": size.files, "edges": size.edges,
+                        "nodes": project.dep_graph.num_nodes, "graph_edges": project.dep_graph.num_edges,
+                        "stage": stage, **measure(fn, setup, repeat)})
+    return results
+
+
+def environment() -> Dict[str, Any]:
+    def git(*args) -> Optional[str]:
+        try:
+            return subprocess.run(["git", *args], cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    versions = {}
+    for package in PACKAGES:
+        try:
+            versions[package] = metadata.version(package if package != "igraph" else "python-igraph")
+        except metadata.PackageNotFoundError:
+            try:
+                versions[package] = metadata.version(package)
+            except metadata.PackageNotFoundError:
+                versions[package] = None
+    return {"commit": git("rev-parse", "HEAD"), "dirty": bool(git("status", "--porcelain", "--untracked-files=no")),
+            "python": platform.python_version(), "platform": platform.platform(), "machine": platform.machine(),
+            "cpus": os.cpu_count(), "packages": versions}
+
+
+def compare(results: List[Dict[str, Any]], baseline_path: Path):
+    """
+    Prints the median time of each stage next to the one of a previous run.
+    """
+    baseline = {(r["size"], r["stage"]): r for r in json.loads(baseline_path.read_text())["results"]}
+    print(f"{'size':<8} {'stage':<24} {'baseline':>10} {'current':>10} {'ratio':>7}")
+    for r in results:
+        before = baseline.get((r["size"], r["stage"]))
+        if before is None:
+            print(f"{r['size']:<8} {r['stage']:<24} {'-':>10} {r['median']:>10.4f} {'-':>7}")
+            continue
+        print(f"{r['size']:<8} {r['stage']:<24} {before['median']:>10.4f} {r['median']:>10.4f} "
+              f"{r['median'] / before['median']:>7.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", nargs="+", default=["small", "medium"], choices=list(SIZES),
+                        help="Sizes of the synthetic projects.")
+    parser.add_argument("--files", type=int, help="Number of files of a custom size, used with --edges.")
+    parser.add_argument("--edges", type=int, help="Number of dependencies of a custom size, used with --files.")
+    parser.add_argument("--community", default="default",
+                        help="CommunityExtractor configuration whose algorithms are benchmarked.")
+    parser.add_argument("--repeat", type=int, default=5, help="Number of timed runs of each stage.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", type=Path, default=Path(__file__).parent / "results",
+                        help="Directory of the results.")
+    parser.add_argument("--compare", type=Path, help="Results of a previous run to compare with.")
+    args = parser.parse_args()
+
+    logger.remove()
+    logger.add(sys.stderr, level="INFO", filter=lambda record: record["name"] == "__main__")
+
+    sizes = {name: SIZES[name] for name in args.sizes}
+    if args.files and args.edges:
+        sizes = {f"{args.files}x{args.edges}": Size(args.files, args.edges)}
+    community = community_config(args.community)
+
+    results = []
+    for name, size in sizes.items():
+        work_dir = Path(tempfile.mkdtemp(prefix=f"bench-{name}-"))
+        try:
+            results.extend(bench_size(name, size, work_dir, community, args.repeat, args.seed))
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    env = environment()
+    args.out.mkdir(parents=True, exist_ok=True)
+    path = args.out / f"{time.strftime('%Y%m%d-%H%M%S')}-{(env['commit'] or 'unknown')[:8]}.json"
+    path.write_text(json.dumps({"created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"), "environment": env,
+                                "seed": args.seed, "community": args.community, "results": results}, indent=2))
+    logger.info(f"Saved the results to {path}")
+
+    if args.compare:
+        compare(results, args.compare)
+    else:
+        for r in results:
+            print(f"{r['size']:<8} {r['stage']:<24} median {r['median']:.4f}s  min {r['min']:.4f}s")
+
+
+if __name__ == "__main__":
+    main()
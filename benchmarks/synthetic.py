@@ -0,0 +1,133 @@
+"""
+Generators of synthetic inputs for the benchmarks: Arcan-like GraphML dependency graphs and AutoFL responses, built
+from a seeded random generator so that the same size always produces the same data.
+"""
+from typing import Any, Dict, NamedTuple
+from xml.sax.saxutils import quoteattr
+
+import numpy as np
+
+# Share of the dependencies between files of the same package, so that the graphs have communities to find.
+INTRA_PACKAGE = 0.8
+FILES_PER_PACKAGE = 25
+LABELS = 16
+
+
+class Size(NamedTuple):
+    files: int
+    edges: int
+
+
+SIZES: Dict[str, Size] = {
+    "small": Size(files=100, edges=1_000),
+    "medium": Size(files=5_000, edges=50_000),
+    "large": Size(files=50_000, edges=500_000),
+}
+
+
+class SyntheticProject(NamedTuple):
+    """
+    The files of a synthetic project, their package and the dependencies between them.
+    """
+    paths: list
+    packages: np.ndarray
+    src: np.ndarray
+    dst: np.ndarray
+
+    @property
+    def num_packages(self) -> int:
+        return int(self.packages.max()) + 1
+
+
+def generate(size: Size, seed: int = 0) -> SyntheticProject:
+    """
+    Generates a project with `size.files` files grouped in packages and about `size.edges` dependencies between them
+    (fewer if the graph is too small to have that many distinct dependencies), most of them within a package.
+    """
+    rng = np.random.default_rng(seed)
+    num_packages = max(1, size.files // FILES_PER_PACKAGE)
+    packages = np.sort(rng.integers(num_packages, size=size.files))
+    # Packages may be empty, they are renumbered so that package ids are contiguous.
+    _, packages = np.unique(packages, return_inverse=True)
+    starts = np.searchsorted(packages, np.arange(packages.max() + 2))
+    paths = [f"src/main/java/org/bench/p{p}/C{i}.java" for i, p in enumerate(packages.tolist())]
+
+    # Drawn with some slack, as self loops and duplicate pairs are removed.
+    draws = int(size.edges * 1.3) + 16
+    src = rng.integers(size.files, size=draws)
+    pkg = packages[src]
+    local = starts[pkg] + (rng.random(draws) * (starts[pkg + 1] - starts[pkg])).astype(np.int64)
+    dst = np.where(rng.random(draws) < INTRA_PACKAGE, local, rng.integers(size.files, size=draws))
+    keep = src != dst
+    pairs = np.unique(src[keep] * size.files + dst[keep])
+    pairs = rng.permutation(pairs)[:size.edges]
+    return SyntheticProject(paths, packages, (pairs // size.files).astype(np.int32),
+                            (pairs % size.files).astype(np.int32))
+
+
+def write_graphml(project: SyntheticProject, path, seed: int = 0):
+    """
+    Writes the project as an Arcan-like GraphML file: a `unit` node per file and a `container` node per package, with
+    `isChildOf` edges from the units to their container and weighted `dependsOn` edges between units.
+    The file is written line by line, as networkx is too slow to write the largest graphs.
+    """
+    rng = np.random.default_rng(seed + 1)
+    weights = rng.integers(1, 20, size=len(project.src)).tolist()
+    num_files = len(project.paths)
+    with open(path, "w", encoding="utf-8") as out:
+        out.write('<?xml version="1.0" encoding="UTF-8"?>\n'
+                  '<graphml xmlns="http://graphml.graphdrawing.org/xmlns">\n'
+                  '<key id="labelV" for="node" attr.name="labelV" attr.type="string"/>\n'
+                  '<key id="name" for="node" attr.name="name" attr.type="string"/>\n'
+                  '<key id="filePathRelative" for="node" attr.name="filePathRelative" attr.type="string"/>\n'
+                  '<key id="labelE" for="edge" attr.name="labelE" attr.type="string"/>\n'
+                  '<key id="weight" for="edge" attr.name="weight" attr.type="int"/>\n'
+                  '<graph id="G" edgedefault="directed">\n')
+        for i, file in enumerate(project.paths):
+            name = file.rsplit("/", 1)[-1][:-len(".java")]
+            out.write(f'<node id="{i}"><data key="labelV">unit</data><data key="name">{name}</data>'
+                      f'<data key="filePathRelative">{quoteattr(file)[1:-1]}</data></node>\n')
+        for p in range(project.num_packages):
+            out.write(f'<node id="{num_files + p}"><data key="labelV">container</data>'
+                      f'<data key="name">org.bench.p{p}</data></node>\n')
+        for i, p in enumerate(project.packages.tolist()):
+            out.write(f'<edge source="{i}" target="{num_files + p}"><data key="labelE">isChildOf</data></edge>\n')
+        for u, v, w in zip(project.src.tolist(), project.dst.tolist(), weights):
+            out.write(f'<edge source="{u}" target="{v}"><data key="labelE">dependsOn</data>'
+                      f'<data key="weight">{w}</data></edge>\n')
+        out.write('</graph>\n</graphml>\n')
+
+
+def autofl_response(project: SyntheticProject, seed: int = 0) -> Dict[str, Any]:
+    """
+    Returns the body of an AutoFL answer for the project: a label distribution per file (skewed towards a label per
+    package) and the taxonomy of the labels.
+    """
+    rng = np.random.default_rng(seed + 2)
+    package_labels = rng.integers(LABELS, size=project.num_packages)
+    distributions = rng.dirichlet(np.full(LABELS, 0.3), size=len(project.paths))
+    distributions[np.arange(len(project.paths)), package_labels[project.packages]] += 1
+    distributions /= distributions.sum(axis=1, keepdims=True)
+    unannotated = rng.random(len(project.paths)) < 0.05
+
+    files = {}
+    for i, path in enumerate(project.paths):
+        files[path] = {
+            "path": path,
+            "language": "java",
+            "package": f"org.bench.p{project.packages[i]}",
+            "annotation": {"distribution": [0.0] * LABELS if unannotated[i] else distributions[i].round(4).tolist(),
+                           "unannotated": bool(unannotated[i])},
+        }
+    return {"result": {"versions": [{"files": files}],
+                       "taxonomy": {str(i): f"label-{i}" for i in range(LABELS)}}}
+
+
+def annotated_project(project: SyntheticProject, labels: list) -> Dict[str, Dict[str, Any]]:
+    """
+    Returns the project in the format of the annotated projects read by the Analysis stats, with the package of each
+    file as its component.
+    """
+    return {path: {"label": labels[i], "component": int(project.packages[i]),
+                   "package": f"org.bench.p{project.packages[i]}"}
+            for i, path in enumerate(project.paths)}